@@ -0,0 +1,35 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the DailyProductSales table from SalesRecords'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start-date',
+            help='First day to rebuild, YYYY-MM-DD (default: the first sale)',
+        )
+        parser.add_argument(
+            '--end-date',
+            help='Last day to rebuild, YYYY-MM-DD (default: the last sale)',
+        )
+
+    def handle(self, *args, **options):
+        from api.ml_models.daily_sales import backfill_daily_sales
+
+        try:
+            start_date = date.fromisoformat(options['start_date']) if options['start_date'] else None
+            end_date = date.fromisoformat(options['end_date']) if options['end_date'] else None
+        except ValueError as e:
+            raise CommandError(f'Invalid date: {e}')
+        if start_date and end_date and start_date > end_date:
+            raise CommandError('--start-date must not be after --end-date')
+
+        started = time.perf_counter()
+        written = backfill_daily_sales(start_date, end_date)
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} daily product sales rows in {time.perf_counter() - started:.2f}s'
+        ))
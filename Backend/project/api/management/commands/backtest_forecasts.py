@@ -0,0 +1,106 @@
+import json
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ml_models.registry import model_registry
+
+
+class Command(BaseCommand):
+    help = 'Walk-forward backtest of the forecast models: accuracy and latency per horizon'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            choices=['synthetic', 'database'],
+            default='synthetic',
+            help='Replay seeded synthetic history (default) or the DailyProductSales table',
+        )
+        parser.add_argument(
+            '--products',
+            nargs='+',
+            type=int,
+            default=[100, 1000],
+            help='Synthetic catalog sizes to run (default: 100 1000)',
+        )
+        parser.add_argument(
+            '--history-days',
+            type=int,
+            default=400,
+            help='Days of history to replay (default: 400)',
+        )
+        parser.add_argument(
+            '--end-date',
+            help='Last day of database history, YYYY-MM-DD (default: yesterday)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed of the synthetic history (default: 0)',
+        )
+        parser.add_argument(
+            '--horizons',
+            nargs='+',
+            choices=list(model_registry),
+            default=list(model_registry),
+            help='Horizons to backtest (default: all)',
+        )
+        parser.add_argument(
+            '--cutoffs',
+            type=int,
+            default=12,
+            help='Walk-forward cutoffs per horizon, the most recent complete periods (default: 12)',
+        )
+        parser.add_argument(
+            '--output',
+            help='Also write the results as JSON to this file, e.g. to compare before and after a change',
+        )
+
+    def handle(self, *args, **options):
+        from api.ml_models.backtest import backtest_horizon
+        from api.ml_models.synthetic_data import synthetic_history
+        from api.ml_models.training import LOOKBACK_DAYS, load_training_history
+
+        if options['history_days'] <= LOOKBACK_DAYS:
+            raise CommandError(f'--history-days must be more than the {LOOKBACK_DAYS}-day lookback')
+        if options['cutoffs'] < 1:
+            raise CommandError('--cutoffs must be at least 1')
+
+        if options['source'] == 'database':
+            try:
+                end_date = date.fromisoformat(options['end_date']) if options['end_date'] else None
+            except ValueError as e:
+                raise CommandError(f'Invalid date: {e}')
+            end_date = end_date or date.today() - timedelta(days=1)
+            history = load_training_history(end_date - timedelta(days=options['history_days'] - 1), end_date)
+            if history.empty:
+                raise CommandError('No sales history in the range; run backfill_daily_sales first')
+            datasets = [(f"database ({history['Product ID'].nunique()} products)", history)]
+        else:
+            datasets = (
+                (f'{n_products} products', synthetic_history(n_products, options['history_days'], seed=options['seed']))
+                for n_products in options['products']
+            )
+
+        results = []
+        for label, history in datasets:
+            self.stdout.write(f"{label}, {options['history_days']} days of history")
+            for time_horizon in options['horizons']:
+                result = backtest_horizon(model_registry.get(time_horizon), time_horizon, history, options['cutoffs'])
+                results.append(dict(result, dataset=label, time_horizon=time_horizon))
+                features, predict = result['feature_ms'], result['predict_ms']
+                self.stdout.write(
+                    f"{time_horizon:>8}: {result['cutoffs']} cutoffs, {result['predictions']} predictions, "
+                    f"MAE {result['mae']}, MAPE {result['mape']}%"
+                )
+                self.stdout.write(
+                    f"{'':>8}  features p50/p95/p99 {features['p50']}/{features['p95']}/{features['p99']} ms, "
+                    f"predict p50/p95/p99 {predict['p50']}/{predict['p95']}/{predict['p99']} ms"
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+        self.stdout.write(self.style.SUCCESS('Backtest complete'))
@@ -0,0 +1,73 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.ml_models.multi_model_predictor import predictor
+from api.ml_models.synthetic_data import synthetic_history
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the recursive multi-step forecast on synthetic data'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--products',
+            type=int,
+            default=1000,
+            help='Number of synthetic products (default: 1000)',
+        )
+        parser.add_argument(
+            '--history-days',
+            type=int,
+            default=90,
+            help='Days of synthetic history per product (default: 90)',
+        )
+        parser.add_argument(
+            '--horizons',
+            nargs='+',
+            choices=list(predictor.models),
+            default=['daily'],
+            help='Forecast horizons to benchmark (default: daily)',
+        )
+        parser.add_argument(
+            '--steps',
+            nargs='+',
+            type=int,
+            default=[1, 7, 30],
+            help='Numbers of forecast steps to time (default: 1 7 30)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Runs per measurement; the fastest one is reported (default: 3)',
+        )
+
+    def handle(self, *args, **options):
+        history = synthetic_history(options['products'], options['history_days'])
+        last_known = history['Date'].max()
+        self.stdout.write(
+            f"Recursive forecast for {options['products']} products "
+            f"with {options['history_days']} days of history (best of {options['repeat']})"
+        )
+
+        for time_horizon in options['horizons']:
+            for steps in options['steps']:
+                dates = predictor.forecast_dates(last_known, time_horizon, steps)
+                elapsed = self._best_time(time_horizon, history, dates, options['repeat'])
+                predictions = options['products'] * steps
+                self.stdout.write(
+                    f'{time_horizon:>8} {steps:>4} steps: {elapsed * 1000:9.1f} ms total, '
+                    f'{elapsed * 1000 / steps:7.1f} ms/step, {predictions / elapsed:10.0f} predictions/s'
+                )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    def _best_time(self, time_horizon, history, dates, repeat):
+        best = None
+        for _ in range(max(repeat, 1)):
+            started = time.perf_counter()
+            predictor.recursive_forecast(time_horizon, history, dates)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,93 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter: sets Django up, imports the URLconf (and with it
+# every view) and optionally preloads the models, then reports its timings
+STARTUP_SCRIPT = """
+import json, time
+started = time.perf_counter()
+import django
+django.setup()
+import {urlconf}
+from api.ml_models.registry import model_registry
+ready = time.perf_counter()
+if {preload}:
+    model_registry.preload()
+done = time.perf_counter()
+print(json.dumps({{
+    "setup": ready - started,
+    "preload": done - ready,
+    "load_times": model_registry.load_times(),
+}}))
+"""
+
+
+class Command(BaseCommand):
+    help = 'Measure process startup time with lazily loaded models against eager preloading'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Fresh processes per measurement; the fastest one is reported (default: 5)',
+        )
+        parser.add_argument(
+            '--command',
+            default='check',
+            help='manage.py command to time end to end (default: check)',
+        )
+
+    def handle(self, *args, **options):
+        repeat = max(options['repeat'], 1)
+
+        lazy = self._best_of(repeat, lambda: self._startup(preload=False))
+        eager = self._best_of(repeat, lambda: self._startup(preload=True))
+        command_time = min(self._time_command(options['command']) for _ in range(repeat))
+
+        self.stdout.write(f'Startup timings, best of {repeat} fresh processes:')
+        self.stdout.write(f"  django.setup() + URLconf, models lazy:   {lazy['total'] * 1000:8.1f} ms")
+        self.stdout.write(f"  django.setup() + URLconf, models eager:  {eager['total'] * 1000:8.1f} ms")
+        # The first horizon loaded also pays for importing pandas, sklearn and xgboost
+        for time_horizon, seconds in eager['load_times'].items():
+            self.stdout.write(f'    first use of {time_horizon:<8} model:          {seconds * 1000:8.1f} ms')
+        self.stdout.write(f"  manage.py {options['command']} end to end:       {command_time * 1000:8.1f} ms")
+        self.stdout.write(self.style.SUCCESS(
+            f"Lazy loading saves {(eager['total'] - lazy['total']) * 1000:.1f} ms per process "
+            f"that does not forecast"
+        ))
+
+    def _best_of(self, repeat, run):
+        return min((run() for _ in range(repeat)), key=lambda result: result['total'])
+
+    def _startup(self, preload):
+        script = STARTUP_SCRIPT.format(urlconf=settings.ROOT_URLCONF, preload=preload)
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, '-c', script],
+            cwd=settings.BASE_DIR, env=self._env(), capture_output=True, text=True, check=True
+        ).stdout
+        total = time.perf_counter() - started
+        result = json.loads(output.strip().splitlines()[-1])
+        result['total'] = total
+        return result
+
+    def _time_command(self, command):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, 'manage.py', command],
+            cwd=settings.BASE_DIR, env=self._env(), capture_output=True, check=True
+        )
+        return time.perf_counter() - started
+
+    def _env(self):
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+        env['PYTHONWARNINGS'] = 'ignore'
+        return env
@@ -0,0 +1,82 @@
+import time
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from api.ml_models.registry import model_registry
+from api.ml_models.synthetic_data import synthetic_history
+from api.ml_models.tree_engine import CompiledTreeEnsemble
+
+
+class Command(BaseCommand):
+    help = 'Compare the NumPy tree engine with native XGBoost predict across batch sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horizons',
+            nargs='+',
+            choices=list(model_registry),
+            default=list(model_registry),
+            help='Models to benchmark (default: all)',
+        )
+        parser.add_argument(
+            '--batch-sizes',
+            nargs='+',
+            type=int,
+            default=[1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024],
+            help='Numbers of rows per predict call (default: powers of two up to 1024)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Calls per measurement; the fastest one is reported (default: 20)',
+        )
+
+    def handle(self, *args, **options):
+        batch_sizes = sorted(options['batch_sizes'])
+        history = synthetic_history(max(batch_sizes), 400)
+        target_date = history['Date'].max() + pd.Timedelta(days=1)
+
+        for time_horizon in options['horizons']:
+            model = model_registry.get(time_horizon)
+            features = model.prepare_features(history, target_date)
+
+            started = time.perf_counter()
+            compiled = CompiledTreeEnsemble.from_model(model.model)
+            compile_time = time.perf_counter() - started
+
+            difference = np.abs(compiled.predict(features) - model.model.predict(features)).max()
+            self.stdout.write(
+                f'{time_horizon}: {compiled.n_trees} trees, depth {compiled.max_depth}, '
+                f'compiled in {compile_time * 1000:.1f} ms, max difference {difference:.2e}'
+            )
+
+            crossover = None
+            for batch_size in batch_sizes:
+                batch = features.iloc[:batch_size]
+                native = self._best_time(model.model.predict, batch, options['repeat'])
+                engine = self._best_time(compiled.predict, batch, options['repeat'])
+                if engine >= native and crossover is None:
+                    crossover = batch_size
+                self.stdout.write(
+                    f'{batch_size:>8} rows: xgboost {native * 1000:8.2f} ms, numpy {engine * 1000:8.2f} ms '
+                    f'({native / engine:5.1f}x)'
+                )
+
+            if crossover is None:
+                self.stdout.write('  NumPy engine is faster at every measured batch size')
+            else:
+                self.stdout.write(f'  XGBoost is as fast or faster from {crossover} rows')
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    def _best_time(self, predict, batch, repeat):
+        best = None
+        for _ in range(max(repeat, 1)):
+            started = time.perf_counter()
+            predict(batch)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,108 @@
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ml_models.artifacts import load_artifact, pickle_path, save_artifact
+from api.ml_models.registry import MODEL_CLASSES
+
+
+class Command(BaseCommand):
+    help = 'Convert the pickled forecast models to native XGBoost artifacts with a versioned manifest'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horizons',
+            nargs='+',
+            choices=list(MODEL_CLASSES),
+            default=list(MODEL_CLASSES),
+            help='Horizons to convert (default: all)',
+        )
+        parser.add_argument(
+            '--store-id',
+            type=int,
+            default=1,
+            help='Store whose models are converted (default: 1)',
+        )
+        parser.add_argument(
+            '--format',
+            choices=['ubj', 'json'],
+            default='ubj',
+            help='Booster format: ubj (binary, default) or json',
+        )
+        parser.add_argument(
+            '--no-verify',
+            action='store_true',
+            help='Skip checking that the converted model predicts exactly like the pickle',
+        )
+
+    def handle(self, *args, **options):
+        store_id = options['store_id']
+        for time_horizon in options['horizons']:
+            model, feature_info, encoder = self._load_pickles(time_horizon, store_id)
+            manifest = save_artifact(
+                time_horizon, store_id, model, feature_info, encoder, booster_format=options['format']
+            )
+            self.stdout.write(
+                f"{time_horizon}: wrote {manifest['booster']['file']} "
+                f"({manifest['booster']['size'] / 1024:.0f} KiB, version {manifest['model_version']})"
+            )
+
+            artifact = load_artifact(time_horizon, store_id)
+            if not options['no_verify']:
+                self._verify(time_horizon, model, encoder, artifact)
+
+            pickle_time = self._best_time(lambda: self._load_pickles(time_horizon, store_id))
+            native_time = self._best_time(lambda: load_artifact(time_horizon, store_id))
+            self.stdout.write(
+                f'{time_horizon}: load time {pickle_time * 1000:.1f} ms from pickles, '
+                f'{native_time * 1000:.1f} ms from the native artifact'
+            )
+
+        self.stdout.write(self.style.SUCCESS('Models converted'))
+
+    def _load_pickles(self, time_horizon, store_id):
+        components = []
+        for component in ('model', 'features', 'encoder'):
+            path = pickle_path(time_horizon, store_id, component)
+            if not path.exists():
+                raise CommandError(f'{path} not found')
+            with open(path, 'rb') as f:
+                components.append(pickle.load(f))
+        return components
+
+    def _verify(self, time_horizon, model, encoder, artifact):
+        """
+        Compare predictions and encodings of the pickled and the converted model
+        """
+        rng = np.random.default_rng(0)
+        columns = artifact.feature_info['processed_feature_columns_list']
+        X = pd.DataFrame(rng.uniform(0, 50, size=(500, len(columns))), columns=columns)
+        if not np.array_equal(model.predict(X), artifact.model.predict(X)):
+            raise CommandError(f'{time_horizon}: converted model predicts differently from the pickle')
+
+        if not isinstance(encoder, dict):
+            sample = pd.DataFrame(
+                [[values[i % len(values)] for values in encoder.categories_] for i in range(30)] +
+                [['Unknown'] * len(encoder.categories_)],
+                columns=encoder.feature_names_in_
+            ).astype(str)
+            same_output = np.array_equal(encoder.transform(sample), artifact.encoder.transform(sample))
+            same_names = list(encoder.get_feature_names_out()) == list(artifact.encoder.get_feature_names_out())
+            if not (same_output and same_names):
+                raise CommandError(f'{time_horizon}: rebuilt encoder differs from the pickle')
+        elif encoder != artifact.encoder:
+            raise CommandError(f'{time_horizon}: encoder categories differ from the pickle')
+
+        self.stdout.write(f'{time_horizon}: predictions and encoding match the pickle')
+
+    def _best_time(self, load, repeat=3):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            load()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,69 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Bring the daily-partitioned training dataset up to date, extracting only new and changed days'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output-dir',
+            help='Dataset directory (default: model_files/processed)',
+        )
+        parser.add_argument(
+            '--format',
+            choices=['parquet', 'arrow', 'csv'],
+            default='parquet',
+            help='Partition file format (default: parquet)',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='Days of history to keep (default: 365)',
+        )
+        parser.add_argument(
+            '--end-date',
+            help='Last day to extract, YYYY-MM-DD (default: yesterday)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=50000,
+            help='Rows per written chunk (default: 50000)',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Ignore the watermark and extract every day again',
+        )
+
+    def handle(self, *args, **options):
+        from api.ml_models.data_preparation import DataPreparation
+        from api.ml_models.training_dataset import TrainingDataset
+
+        try:
+            end_date = date.fromisoformat(options['end_date']) if options['end_date'] else None
+        except ValueError as e:
+            raise CommandError(f'Invalid date: {e}')
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+
+        preparation = DataPreparation()
+        output_dir = options['output_dir'] or preparation.model_dir / 'processed'
+        dataset = TrainingDataset(output_dir, options['format'], preparation)
+
+        started = time.perf_counter()
+        try:
+            summary = dataset.refresh(
+                end_date, days=options['days'], chunk_size=options['chunk_size'], full=options['full']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Appended {summary['appended_days']} day(s), re-extracted {summary['re_extracted_days']}, "
+            f"dropped {summary['dropped_days']}; {summary['rows']} rows in {dataset.path} "
+            f"({time.perf_counter() - started:.2f}s)"
+        ))
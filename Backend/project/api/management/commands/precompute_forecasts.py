@@ -0,0 +1,143 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+DEFAULT_PERIODS = {
+    'daily': 7,
+    'weekly': 4,
+    'monthly': 3,
+}
+
+
+def _init_worker(settings_module):
+    """
+    Prepare a worker process: set up Django and drop database connections
+    inherited from the parent so every worker opens its own.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+    from django.db import connections
+    connections.close_all()
+
+
+def _forecast_shard(time_horizon, periods, product_ids):
+    """
+    Run one horizon for one shard of products
+
+    Returns:
+        tuple: (time the shard's history was read from, summary records)
+    """
+    from api.ml_models.multi_model_predictor import predictor
+
+    started = timezone.now()
+    records = predictor.forecast(
+        product_ids=product_ids,
+        time_horizon=time_horizon,
+        n_periods=periods
+    ).summary_records()
+    return started, records
+
+
+class Command(BaseCommand):
+    help = 'Precompute daily, weekly and monthly forecasts for all products into ForecastSnapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horizons',
+            nargs='+',
+            choices=list(DEFAULT_PERIODS),
+            default=list(DEFAULT_PERIODS),
+            help='Forecast horizons to precompute (default: all)',
+        )
+        parser.add_argument(
+            '--periods',
+            type=int,
+            help='Number of periods to forecast (default: 7 daily, 4 weekly, 3 monthly, as served by the API)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of products per shard (default: 500)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of worker processes; 1 runs everything in this process (default: CPU count)',
+        )
+
+    def handle(self, *args, **options):
+        from api.models import Products
+        from api.ml_models.forecast_snapshots import save_snapshots
+
+        batch_size = options['batch_size']
+        workers = options['workers']
+        if batch_size < 1 or workers < 1:
+            raise CommandError('--batch-size and --workers must be at least 1')
+
+        product_ids = list(Products.objects.order_by('product_id').values_list('product_id', flat=True))
+        if not product_ids:
+            self.stdout.write(self.style.WARNING('No products found, nothing to precompute.'))
+            return
+
+        shards = [product_ids[i:i + batch_size] for i in range(0, len(product_ids), batch_size)]
+        tasks = [
+            (time_horizon, options['periods'] or DEFAULT_PERIODS[time_horizon], shard)
+            for time_horizon in options['horizons']
+            for shard in shards
+        ]
+        self.stdout.write(
+            f'Precomputing {len(options["horizons"])} horizon(s) for {len(product_ids)} products '
+            f'in {len(tasks)} shard(s) with {workers} worker(s)...'
+        )
+
+        started = time.perf_counter()
+        written = 0
+        failed = 0
+        for task, result, error in self._run(tasks, workers):
+            time_horizon, periods, shard = task
+            if error is not None:
+                failed += 1
+                self.stdout.write(self.style.ERROR(
+                    f'{time_horizon} shard starting at {shard[0]} failed: {error}'
+                ))
+                continue
+            started_at, records = result
+            written += save_snapshots(records, time_horizon, periods, computed_at=started_at)
+
+        elapsed = time.perf_counter() - started
+        message = f'Wrote {written} forecast snapshots in {elapsed:.2f}s'
+        if failed:
+            self.stdout.write(self.style.WARNING(f'{message} ({failed} shard(s) failed)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
+
+    def _run(self, tasks, workers):
+        """
+        Yield (task, result, error) for every task, in completion order
+        """
+        if workers == 1:
+            for task in tasks:
+                try:
+                    yield task, _forecast_shard(*task), None
+                except Exception as e:
+                    yield task, None, e
+            return
+
+        settings_module = os.environ.get('DJANGO_SETTINGS_MODULE', 'project.settings')
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(tasks)),
+            initializer=_init_worker,
+            initargs=(settings_module,)
+        ) as executor:
+            futures = {executor.submit(_forecast_shard, *task): task for task in tasks}
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as e:
+                    yield futures[future], None, e
@@ -0,0 +1,43 @@
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Run the pool of forecast inference worker processes the web workers send forecasts to'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--address',
+            help='Unix socket path or host:port to listen on (default: settings.ML_INFERENCE_ADDRESS)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Number of worker processes (default: settings.ML_INFERENCE_WORKERS or the CPU count)',
+        )
+
+    def handle(self, *args, **options):
+        from api.ml_models.inference import InferenceServer, inference_address, parse_address
+
+        address = parse_address(options['address']) if options['address'] else inference_address()
+        if address is None:
+            raise CommandError('Pass --address or set ML_INFERENCE_ADDRESS')
+        if options['workers'] is not None and options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+
+        server = InferenceServer(address=address, workers=options['workers'])
+        self.stdout.write(f'Starting {server.workers} inference worker(s)...')
+        server.start()
+
+        def shutdown(signum, frame):
+            server.stop()
+        signal.signal(signal.SIGTERM, shutdown)
+
+        self.stdout.write(self.style.SUCCESS(f'Serving forecasts at {address}'))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stop()
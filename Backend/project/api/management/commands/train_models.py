@@ -0,0 +1,164 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ml_models.artifacts import MODEL_DIR, save_artifact
+from api.ml_models.registry import MODEL_CLASSES, model_registry
+
+
+class Command(BaseCommand):
+    help = 'Retrain the forecast models from the sales history in the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horizons',
+            nargs='+',
+            choices=list(MODEL_CLASSES),
+            default=list(MODEL_CLASSES),
+            help='Horizons to train (default: all)',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='Days of training periods, ending yesterday or at --end-date (default: 365)',
+        )
+        parser.add_argument(
+            '--end-date',
+            type=date.fromisoformat,
+            help='Last day of history to train on, YYYY-MM-DD (default: yesterday)',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Total XGBoost threads, shared by the horizons trained in parallel (default: CPU count)',
+        )
+        parser.add_argument(
+            '--n-estimators',
+            type=int,
+            default=1000,
+            help='Maximum boosting rounds per model (default: 1000)',
+        )
+        parser.add_argument(
+            '--early-stopping-rounds',
+            type=int,
+            default=20,
+            help='Stop after this many rounds without validation improvement (default: 20)',
+        )
+        parser.add_argument(
+            '--validation-fraction',
+            type=float,
+            default=0.2,
+            help='Share of the most recent periods held out for validation (default: 0.2)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=50000,
+            help='Daily sales rows fetched from the database per chunk (default: 50000)',
+        )
+        parser.add_argument(
+            '--store-id',
+            type=int,
+            default=1,
+            help='Store whose models are trained (default: 1)',
+        )
+        parser.add_argument(
+            '--output-dir',
+            default=str(MODEL_DIR),
+            help='Directory the artifacts are written to (default: the served model directory)',
+        )
+        parser.add_argument(
+            '--format',
+            choices=['ubj', 'json'],
+            default='ubj',
+            help='Booster format: ubj (binary, default) or json',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Write the new models even where they validate worse than the current ones',
+        )
+
+    def handle(self, *args, **options):
+        from api.ml_models.training import load_training_history, train_horizon, training_periods, training_window
+
+        if options['days'] < 2:
+            raise CommandError('--days must be at least 2')
+        if options['threads'] < 1:
+            raise CommandError('--threads must be at least 1')
+        if not 0 < options['validation_fraction'] < 1:
+            raise CommandError('--validation-fraction must be between 0 and 1')
+
+        horizons = options['horizons']
+        end_date = options['end_date'] or date.today() - timedelta(days=1)
+        history_start, first_period = training_window(end_date, options['days'])
+
+        started = time.perf_counter()
+        history = load_training_history(history_start, end_date, chunk_size=options['chunk_size'])
+        extract_time = time.perf_counter() - started
+        self.stdout.write(
+            f'Extracted {len(history)} daily rows from {history_start} to {end_date} in {extract_time:.1f}s'
+        )
+        if history.empty:
+            raise CommandError('No sales history in the training window; run backfill_daily_sales first')
+
+        # Horizons train concurrently; XGBoost releases the GIL, so the threads share the budget
+        n_jobs = max(1, options['threads'] // len(horizons))
+        models = {time_horizon: model_registry.get(time_horizon) for time_horizon in horizons}
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(horizons)) as executor:
+            futures = {
+                time_horizon: executor.submit(
+                    train_horizon,
+                    models[time_horizon],
+                    time_horizon,
+                    history,
+                    training_periods(time_horizon, first_period, end_date),
+                    n_jobs=n_jobs,
+                    n_estimators=options['n_estimators'],
+                    early_stopping_rounds=options['early_stopping_rounds'],
+                    validation_fraction=options['validation_fraction'],
+                )
+                for time_horizon in horizons
+            }
+        train_time = time.perf_counter() - started
+
+        written = 0
+        for time_horizon, future in futures.items():
+            try:
+                result = future.result()
+            except ValueError as e:
+                self.stderr.write(self.style.WARNING(f'{time_horizon}: skipped, {e}'))
+                continue
+
+            metrics = result.metrics
+            metrics['timings']['extract_seconds'] = round(extract_time, 3)
+            previous = metrics['previous_model']['validation']
+            self.stdout.write(
+                f"{time_horizon}: {metrics['train_rows']} training and {metrics['validation_rows']} validation rows, "
+                f"best iteration {metrics['best_iteration']}, "
+                f"features {metrics['timings']['features_seconds']:.1f}s, fit {metrics['timings']['fit_seconds']:.1f}s"
+            )
+            self.stdout.write(
+                f"{time_horizon}: validation MAE {metrics['validation']['mae']} (current model {previous['mae']}), "
+                f"RMSE {metrics['validation']['rmse']} (current model {previous['rmse']})"
+            )
+
+            if not result.improved and not options['force']:
+                self.stdout.write(f'{time_horizon}: not written, the current model validates better (use --force)')
+                continue
+            manifest = save_artifact(
+                time_horizon, options['store_id'], result.model, result.feature_info, result.encoder,
+                booster_format=options['format'], model_dir=options['output_dir'], training=metrics
+            )
+            written += 1
+            self.stdout.write(f"{time_horizon}: wrote {manifest['booster']['file']} (version {manifest['model_version']})")
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Trained {len(horizons)} horizon(s) in {extract_time + train_time:.1f}s, wrote {written} model(s)'
+        ))
@@ -11,3 +11,27 @@ class DisableCSRFForAPIMiddleware(MiddlewareMixin):
         if request.path.startswith('/api/'):
             setattr(request, '_dont_enforce_csrf_checks', True)
         return None
+
+
+class ServerTimingMiddleware:
+    """
+    Time the forecast stages of API requests (see api.ml_models.timing)
+
+    Responses of requests that ran a timed stage get a Server-Timing header,
+    and their stage durations are added to the rolling histograms served at
+    /api/forecast-timing/stats/.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.path.startswith('/api/'):
+            return self.get_response(request)
+
+        from .ml_models.timing import record_timings
+
+        with record_timings() as timings:
+            response = self.get_response(request)
+        if timings.seconds:
+            response['Server-Timing'] = timings.server_timing()
+        return response
@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-16 20:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_alter_purchaseorders_po_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastSnapshot',
+            fields=[
+                ('snapshot_id', models.CharField(default=uuid.uuid4, editable=False, max_length=50, primary_key=True, serialize=False)),
+                ('time_horizon', models.CharField(max_length=10)),
+                ('periods', models.IntegerField()),
+                ('as_of_date', models.DateField()),
+                ('total_predicted_units', models.IntegerField(default=0)),
+                ('forecast_days', models.IntegerField(default=0)),
+                ('computed_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='forecast_snapshots', to='api.products')),
+            ],
+            options={
+                'verbose_name_plural': 'Forecast Snapshots',
+                'unique_together': {('product', 'time_horizon', 'periods')},
+            },
+        ),
+    ]
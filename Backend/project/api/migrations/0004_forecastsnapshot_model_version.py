@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-16 21:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_forecastsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forecastsnapshot',
+            name='model_version',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2 on 2026-10-16 22:29
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_sales(apps, schema_editor):
+    SalesRecords = apps.get_model('api', 'SalesRecords')
+    DailyProductSales = apps.get_model('api', 'DailyProductSales')
+    totals = SalesRecords.objects.annotate(day=TruncDate('transaction_date')).values('product_id', 'day').annotate(
+        units=Sum('quantity_sold'),
+        revenue=Sum(F('quantity_sold') * F('unit_price_at_sale')),
+        discount=Sum('discount_applied'),
+        transactions=Count('pk'),
+        promotions=Count('pk', filter=Q(promotion_marker=True)),
+    ).order_by()
+    DailyProductSales.objects.bulk_create(
+        [
+            DailyProductSales(
+                daily_sales_id=str(uuid.uuid4()),
+                product_id=row['product_id'],
+                date=row['day'],
+                units_sold=row['units'] or 0,
+                revenue=row['revenue'] or 0.0,
+                discount=row['discount'] or 0.0,
+                transactions=row['transactions'],
+                promotion=row['promotions'] > 0,
+            )
+            for row in totals.iterator()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_forecastsnapshot_model_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('daily_sales_id', models.CharField(default=uuid.uuid4, editable=False, max_length=50, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('units_sold', models.IntegerField(default=0)),
+                ('revenue', models.FloatField(default=0.0)),
+                ('discount', models.FloatField(default=0.0)),
+                ('transactions', models.IntegerField(default=0)),
+                ('promotion', models.BooleanField(default=False)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='api.products')),
+            ],
+            options={
+                'verbose_name_plural': 'Daily Product Sales',
+                'indexes': [models.Index(fields=['date'], name='api_dailypr_date_b43d5c_idx')],
+                'unique_together': {('product', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_sales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-16 22:53
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_dailyproductsales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastJob',
+            fields=[
+                ('job_id', models.CharField(default=uuid.uuid4, editable=False, max_length=50, primary_key=True, serialize=False)),
+                ('request_key', models.CharField(db_index=True, max_length=64)),
+                ('time_horizon', models.CharField(max_length=10)),
+                ('periods', models.IntegerField()),
+                ('last_date', models.DateField(blank=True, null=True)),
+                ('product_ids', models.JSONField(default=list)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('completed_products', models.IntegerField(default=0)),
+                ('results', models.JSONField(default=list)),
+                ('source', models.CharField(blank=True, default='', max_length=10)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name_plural': 'Forecast Jobs',
+                'indexes': [models.Index(fields=['expires_at'], name='api_forecas_expires_4b4c86_idx')],
+            },
+        ),
+    ]
@@ -1,5 +1,18 @@
-# Import get_product_sales_prediction from the multi-model predictor
-from .multi_model_predictor import get_product_sales_prediction
-from .daily_model import daily_model
-from .weekly_model import weekly_model
-from .monthly_model import monthly_model
\ No newline at end of file
+# Everything here is imported lazily: importing the package must not load pandas,
+# xgboost or the pickled models (see registry.py)
+_LAZY_ATTRIBUTES = {
+    "get_product_sales_prediction": ".multi_model_predictor",
+    "model_registry": ".registry",
+    "daily_model": ".daily_model",
+    "weekly_model": ".weekly_model",
+    "monthly_model": ".monthly_model",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        import importlib
+        return getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,260 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = Path(__file__).resolve().parent / 'models'
+
+# Bump when the manifest layout changes in a way older code cannot read
+ARTIFACT_FORMAT_VERSION = 1
+
+MANIFEST_NAME = 'inventory_xgb_{time_horizon}_store_{store_id}_manifest.json'
+BOOSTER_NAME = 'inventory_xgb_{time_horizon}_store_{store_id}_model.{booster_format}'
+PICKLE_NAME = 'inventory_xgb_{time_horizon}_store_{store_id}_{component}.pkl'
+
+
+class ModelArtifactError(Exception):
+    """
+    Raised when a native model artifact is unreadable, from an unsupported
+    format version, or fails its checksum.
+    """
+
+
+class ModelArtifact:
+    """
+    A loaded native model artifact: the XGBoost regressor plus everything the
+    feature builders need, as described by the manifest.
+    """
+    def __init__(self, model, feature_info, encoder, manifest):
+        self.model = model
+        self.feature_info = feature_info
+        self.encoder = encoder
+        self.manifest = manifest
+
+    @property
+    def version(self):
+        return self.manifest['model_version']
+
+
+def manifest_path(time_horizon, store_id, model_dir=MODEL_DIR):
+    return Path(model_dir) / MANIFEST_NAME.format(time_horizon=time_horizon, store_id=store_id)
+
+
+def pickle_path(time_horizon, store_id, component, model_dir=MODEL_DIR):
+    return Path(model_dir) / PICKLE_NAME.format(time_horizon=time_horizon, store_id=store_id, component=component)
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _encoder_to_manifest(encoder):
+    """
+    Describe an encoder with JSON types only
+
+    The daily model keeps a plain dict of categories for pd.get_dummies, the
+    weekly and monthly models a fitted sklearn OneHotEncoder.
+    """
+    if encoder is None:
+        return None
+    if isinstance(encoder, dict):
+        return {'type': 'dummies', 'encoder_info': encoder}
+    return {
+        'type': 'onehot',
+        'feature_names': [str(name) for name in encoder.feature_names_in_],
+        'categories': [[str(value) for value in categories] for categories in encoder.categories_],
+        'handle_unknown': encoder.handle_unknown,
+        'dtype': np.dtype(encoder.dtype).name,
+    }
+
+
+def _encoder_from_manifest(spec):
+    """
+    Rebuild the encoder described by _encoder_to_manifest
+    """
+    if spec is None:
+        return None
+    if spec['type'] == 'dummies':
+        return spec['encoder_info']
+    if spec['type'] != 'onehot':
+        raise ModelArtifactError(f"Unknown encoder type: {spec['type']}")
+
+    import pandas as pd
+    from sklearn.preprocessing import OneHotEncoder
+
+    categories = [np.array(values, dtype=object) for values in spec['categories']]
+    encoder = OneHotEncoder(
+        categories=categories,
+        handle_unknown=spec['handle_unknown'],
+        sparse_output=False,
+        dtype=np.dtype(spec['dtype']).type,
+    )
+    # Fitting with explicit categories only records them; one row of known values is enough
+    sample = pd.DataFrame([[values[0] for values in categories]], columns=spec['feature_names'])
+    return encoder.fit(sample)
+
+
+def save_artifact(time_horizon, store_id, model, feature_info, encoder, booster_format='ubj', model_dir=MODEL_DIR,
+                  training=None):
+    """
+    Write a model in XGBoost's native format together with its manifest
+
+    Args:
+        time_horizon: "daily", "weekly" or "monthly"
+        store_id: Store the model was trained for
+        model: Fitted xgboost.XGBRegressor
+        feature_info: Feature description as stored in the *_features.pkl files
+        encoder: Encoder dict (daily) or fitted OneHotEncoder (weekly, monthly)
+        booster_format: "ubj" (binary) or "json"
+        model_dir: Directory to write to
+        training: Optional JSON-serialisable description of how the model was
+            trained (data range, timings, accuracy), stored as manifest["training"]
+
+    Returns:
+        dict: The manifest that was written
+    """
+    import xgboost
+
+    if booster_format not in ('ubj', 'json'):
+        raise ValueError(f"Unsupported booster format: {booster_format}")
+
+    model_dir = Path(model_dir)
+    booster_name = BOOSTER_NAME.format(time_horizon=time_horizon, store_id=store_id, booster_format=booster_format)
+    booster_bytes = bytes(model.get_booster().save_raw(raw_format=booster_format))
+    checksum = _sha256(booster_bytes)
+
+    manifest = {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'time_horizon': time_horizon,
+        'store_id': store_id,
+        'model_version': f'{time_horizon}-{checksum[:12]}',
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'xgboost_version': xgboost.__version__,
+        'booster': {
+            'file': booster_name,
+            'format': booster_format,
+            'sha256': checksum,
+            'size': len(booster_bytes),
+        },
+        'feature_info': feature_info,
+        'encoder': _encoder_to_manifest(encoder),
+    }
+    if training is not None:
+        manifest['training'] = training
+
+    # Write the booster first and the manifest last, each through a rename, so a
+    # reader never sees a manifest that points at a partially written booster
+    booster_tmp = model_dir / f'{booster_name}.tmp'
+    booster_tmp.write_bytes(booster_bytes)
+    os.replace(booster_tmp, model_dir / booster_name)
+
+    path = manifest_path(time_horizon, store_id, model_dir)
+    manifest_tmp = path.with_name(f'{path.name}.tmp')
+    manifest_tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(manifest_tmp, path)
+    return manifest
+
+
+def read_manifest(time_horizon, store_id, model_dir=MODEL_DIR):
+    """
+    Read and validate a manifest
+
+    Returns:
+        dict or None: The manifest, or None when the model has not been converted
+    """
+    path = manifest_path(time_horizon, store_id, model_dir)
+    if not path.exists():
+        return None
+    try:
+        manifest = json.loads(path.read_text())
+    except (OSError, ValueError) as e:
+        raise ModelArtifactError(f"Unreadable manifest {path}: {e}")
+
+    format_version = manifest.get('format_version')
+    if format_version != ARTIFACT_FORMAT_VERSION:
+        raise ModelArtifactError(
+            f"{path} has format version {format_version}, this code reads version {ARTIFACT_FORMAT_VERSION}"
+        )
+    if manifest.get('time_horizon') != time_horizon:
+        raise ModelArtifactError(f"{path} describes a {manifest.get('time_horizon')} model, expected {time_horizon}")
+    return manifest
+
+
+def load_artifact(time_horizon, store_id, model_dir=MODEL_DIR):
+    """
+    Load a native model artifact
+
+    The booster file is read once into the buffer that is both checksummed
+    and handed to XGBoost, which only parses from a path or a bytearray. The
+    parsed booster lives in each process; start the server with
+    ML_MODELS_PRELOAD and a forking server (e.g. gunicorn --preload) to share
+    it copy-on-write between workers.
+
+    Args:
+        time_horizon: "daily", "weekly" or "monthly"
+        store_id: Store the model was trained for
+        model_dir: Directory holding the artifact
+
+    Returns:
+        ModelArtifact or None when no native artifact exists
+
+    Raises:
+        ModelArtifactError: If the artifact is invalid or fails its checksum
+    """
+    manifest = read_manifest(time_horizon, store_id, model_dir)
+    if manifest is None:
+        return None
+
+    import xgboost
+
+    booster_info = manifest['booster']
+    booster_path = Path(model_dir) / booster_info['file']
+    if manifest['xgboost_version'].split('.')[0] != xgboost.__version__.split('.')[0]:
+        logger.warning(
+            "%s model was saved with xgboost %s, running %s",
+            time_horizon, manifest['xgboost_version'], xgboost.__version__
+        )
+
+    try:
+        with open(booster_path, 'rb') as f:
+            data = bytearray(os.fstat(f.fileno()).st_size)
+            size = f.readinto(data)
+        if size != booster_info['size'] or _sha256(data) != booster_info['sha256']:
+            raise ModelArtifactError(f"Checksum mismatch for {booster_path}")
+        model = xgboost.XGBRegressor()
+        model.load_model(data)
+    except (OSError, ValueError) as e:
+        raise ModelArtifactError(f"Cannot load {booster_path}: {e}")
+
+    return ModelArtifact(
+        model=model,
+        feature_info=manifest['feature_info'],
+        encoder=_encoder_from_manifest(manifest['encoder']),
+        manifest=manifest,
+    )
+
+
+def model_fingerprint(time_horizon, store_id, model_dir=MODEL_DIR):
+    """
+    Cheap identity of the model files on disk, used to notice a retrained model
+
+    The manifest is the last file a conversion writes, so its modification time
+    and size change exactly when a new native artifact is complete. Without a
+    manifest the model pickle is watched instead.
+
+    Returns:
+        tuple or None: (file name, mtime in ns, size), or None if there is no model file
+    """
+    for path in (manifest_path(time_horizon, store_id, model_dir), pickle_path(time_horizon, store_id, 'model', model_dir)):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        return (path.name, stat.st_mtime_ns, stat.st_size)
+    return None
@@ -0,0 +1,85 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from .training import LOOKBACK_DAYS, training_periods, walk_forward
+
+LATENCY_PERCENTILES = (50, 95, 99)
+
+
+def latency_summary(seconds):
+    """
+    Percentiles of a list of durations, in milliseconds
+    """
+    if not seconds:
+        return {f'p{percentile}': None for percentile in LATENCY_PERCENTILES}
+    values = np.percentile(np.asarray(seconds) * 1000, LATENCY_PERCENTILES)
+    return {f'p{percentile}': round(float(value), 3) for percentile, value in zip(LATENCY_PERCENTILES, values)}
+
+
+def backtest_horizon(model_wrapper, time_horizon, history, cutoffs=12, lookback_days=LOOKBACK_DAYS, warmup=1):
+    """
+    Walk-forward backtest of a horizon's model on a daily history
+
+    The last `cutoffs` complete periods that have lookback_days of history
+    before them are forecast one at a time, each from only the history
+    before its cutoff, through the model's own prepare_features and predict,
+    exactly as the server runs them. Both stages are timed per cutoff,
+    except for the first `warmup` ones, which pay one-off costs such as
+    compiling the tree engine.
+
+    MAPE only covers rows that sold something, since a percentage error of
+    zero actual units is undefined.
+
+    Args:
+        model_wrapper: DailyModel, WeeklyModel or MonthlyModel
+        time_horizon: "daily", "weekly" or "monthly"
+        history: Daily history in get_product_data's shape
+        cutoffs: Number of periods to replay
+        lookback_days: Days of history each forecast is made from
+        warmup: Leading cutoffs left out of the latency figures
+
+    Returns:
+        dict: Accuracy (mae, mape) and latency percentiles in ms of the
+        feature-build and predict stages
+    """
+    history = history.sort_values('Date', kind='stable').reset_index(drop=True)
+    history['Date'] = pd.to_datetime(history['Date'])
+    first_cutoff = history['Date'].min() + pd.Timedelta(days=lookback_days)
+    periods = training_periods(time_horizon, first_cutoff, history['Date'].max())[-cutoffs:] if cutoffs else []
+
+    feature_times, predict_times, predictions, actuals = [], [], [], []
+    for replayed, (_, period_start, window, sold) in enumerate(walk_forward(time_horizon, history, periods, lookback_days)):
+        started = time.perf_counter()
+        features = model_wrapper.prepare_features(window, period_start)
+        built = time.perf_counter()
+        predicted = model_wrapper.predict(features)
+        finished = time.perf_counter()
+
+        if replayed >= warmup:
+            feature_times.append(built - started)
+            predict_times.append(finished - built)
+        predictions.append(np.asarray(predicted, dtype=float))
+        actuals.append(sold)
+
+    result = {
+        'cutoffs': len(actuals),
+        'first_cutoff': str(periods[0].date()) if periods else None,
+        'last_cutoff': str(periods[-1].date()) if periods else None,
+        'predictions': 0,
+        'mae': None,
+        'mape': None,
+        'feature_ms': latency_summary(feature_times),
+        'predict_ms': latency_summary(predict_times),
+    }
+    if predictions:
+        predictions = np.concatenate(predictions)
+        actuals = np.concatenate(actuals)
+        errors = np.abs(predictions - actuals)
+        sold = actuals > 0
+        result['predictions'] = len(predictions)
+        result['mae'] = round(float(errors.mean()), 4)
+        if sold.any():
+            result['mape'] = round(float((errors[sold] / actuals[sold]).mean() * 100), 2)
+    return result
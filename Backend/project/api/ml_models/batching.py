@@ -0,0 +1,153 @@
+import threading
+
+from django.conf import settings
+
+
+class _Batch:
+    """
+    Forecast requests for one horizon and last_date collected during one window
+    """
+    def __init__(self):
+        self.product_ids = {}
+        self.n_periods = 0
+        self.requests = 0
+        self.closed = threading.Event()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def add(self, product_ids, n_periods):
+        self.product_ids.update(dict.fromkeys(product_ids))
+        self.n_periods = max(self.n_periods, n_periods)
+        self.requests += 1
+
+
+class ForecastBatcher:
+    """
+    Micro-batcher in front of MultiModelPredictor.forecast.
+
+    A request for a horizon and last_date that no other request is working
+    on runs straight away. One arriving while others are in flight opens a
+    batch and waits up to FORECAST_BATCH_WINDOW seconds, and requests arriving
+    meanwhile join it, so only a loaded server pays for the window. The
+    batch then makes a single forecast call for the union of the
+    products and the largest number of periods, and every request takes its
+    own rows from the result. A recursive forecast's first n steps do not
+    depend on the steps after them, so requests for fewer periods get the
+    same steps they would have computed alone. One exception: the weekly and
+    monthly feature builders fill a missing numeric feature (price, discount,
+    demand forecast) with the median over all products of the call, so a
+    product with such a gap can be forecast slightly differently depending on
+    the products it is batched with. A batch is closed early once it holds
+    FORECAST_BATCH_MAX_SIZE products. A window of 0 or None disables batching.
+    """
+    def __init__(self, predict, window=None, max_size=None):
+        self.predict_function = predict
+        self._window = window
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._active = {}
+        self.batches = 0
+        self.requests = 0
+
+    @property
+    def window(self):
+        if self._window is not None:
+            return self._window
+        return getattr(settings, 'FORECAST_BATCH_WINDOW', 0.005)
+
+    @property
+    def max_size(self):
+        if self._max_size is not None:
+            return self._max_size
+        return getattr(settings, 'FORECAST_BATCH_MAX_SIZE', 256)
+
+    def predict(self, product_ids, time_horizon="daily", n_periods=1, last_date=None):
+        """
+        Predict like MultiModelPredictor.forecast, sharing the model call with concurrent requests
+
+        Returns:
+            ForecastResult with the rows of the requested products and periods
+        """
+        window = self.window
+        if not window:
+            return self.predict_function(
+                product_ids=product_ids, time_horizon=time_horizon, n_periods=n_periods, last_date=last_date
+            )
+
+        key = (time_horizon, last_date)
+        with self._lock:
+            busy = self._active.get(key, 0)
+            self._active[key] = busy + 1
+            batch = self._pending.get(key)
+            leader = batch is None
+            if leader:
+                batch = _Batch()
+                if busy:
+                    self._pending[key] = batch
+                else:
+                    # Nothing to wait for: run now, and let requests arriving meanwhile batch up
+                    batch.closed.set()
+            batch.add(product_ids, n_periods)
+            if self._pending.get(key) is batch and len(batch.product_ids) >= self.max_size:
+                # Full: later requests start a new batch
+                del self._pending[key]
+                batch.closed.set()
+
+        try:
+            if leader:
+                batch.closed.wait(window)
+                with self._lock:
+                    if self._pending.get(key) is batch:
+                        del self._pending[key]
+                self._run(batch, time_horizon, last_date)
+            else:
+                batch.done.wait()
+        finally:
+            with self._lock:
+                self._active[key] -= 1
+                if not self._active[key]:
+                    del self._active[key]
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.result.select(product_ids, n_periods)
+
+    def _run(self, batch, time_horizon, last_date):
+        try:
+            batch.result = self.predict_function(
+                product_ids=list(batch.product_ids),
+                time_horizon=time_horizon,
+                n_periods=batch.n_periods,
+                last_date=last_date
+            )
+        except Exception as e:
+            batch.error = e
+        finally:
+            with self._lock:
+                self.batches += 1
+                self.requests += batch.requests
+            batch.done.set()
+
+    def stats(self):
+        """
+        Batches run and requests served by this process
+        """
+        with self._lock:
+            return {
+                'window': self.window,
+                'max_size': self.max_size,
+                'batches': self.batches,
+                'requests': self.requests,
+                'requests_per_batch': round(self.requests / self.batches, 2) if self.batches else 0.0,
+            }
+
+
+def _forecast(**kwargs):
+    # Imported on first use so importing this module does not load pandas
+    from .multi_model_predictor import predictor
+    return predictor.forecast(**kwargs)
+
+
+forecast_batcher = ForecastBatcher(_forecast)
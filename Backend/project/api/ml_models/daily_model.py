@@ -1,11 +1,18 @@
+import hashlib
+import logging
 import os
 import pickle
 import pandas as pd
 import numpy as np
 from pathlib import Path
+from .artifacts import ModelArtifactError, load_artifact
+from .feature_matrix import EncodingPlan, build_history_matrix, period_offsets, product_codes_for
+from .tree_engine import predict_trees
 
 MODEL_DIR = Path(__file__).resolve().parent / 'models'
 
+logger = logging.getLogger(__name__)
+
 class DailyModel:
     """
     XGBoost model for daily sales predictions
@@ -16,17 +23,29 @@ class DailyModel:
         self.feature_info = None
         self.encoder_info = None
         self.processed_feature_columns = None
+        self.model_version = None
+        self.artifact_error = None
+        self.compiled_trees = None
         self.load_model_components()
+        self.encoding_plan = self.compile_encoding_plan()
     
     def load_model_components(self):
         """
         Load all model components for daily predictions
+        
+        The native artifact written by `manage.py convert_models` is used when
+        present; the original pickles are the fallback.
         """
+        if self.load_native_artifact():
+            return
+        
         try:
             model_path = os.path.join(MODEL_DIR, f'inventory_xgb_daily_store_{self.store_id}_model.pkl')
             if os.path.exists(model_path):
                 with open(model_path, 'rb') as f:
-                    self.model = pickle.load(f)
+                    model_bytes = f.read()
+                self.model = pickle.loads(model_bytes)
+                self.model_version = f"daily-{hashlib.sha256(model_bytes).hexdigest()[:12]}"
                 print(f"Successfully loaded daily model for store {self.store_id}")
             else:
                 print(f"Daily model file not found at {model_path}")
@@ -51,6 +70,39 @@ class DailyModel:
         except Exception as e:
             print(f"Error loading daily model components: {e}")
     
+    def load_native_artifact(self):
+        """
+        Load the model, features and encoder from the native artifact
+        
+        Returns:
+            bool: True if the artifact was found and loaded
+        """
+        try:
+            artifact = load_artifact('daily', self.store_id)
+        except ModelArtifactError as e:
+            logger.warning("Ignoring daily model artifact, falling back to the pickles: %s", e)
+            self.artifact_error = str(e)
+            return False
+        if artifact is None:
+            return False
+        
+        self.model = artifact.model
+        self.feature_info = artifact.feature_info
+        self.processed_feature_columns = self.feature_info.get('processed_feature_columns_list', [])
+        self.encoder_info = artifact.encoder
+        self.model_version = artifact.version
+        logger.info("Loaded daily model artifact %s for store %s", artifact.version, self.store_id)
+        return True
+    
+    def compile_encoding_plan(self):
+        """
+        The one-hot encoding of the loaded model's categorical features, or None without feature columns
+        """
+        if not self.processed_feature_columns:
+            return None
+        categorical = (self.encoder_info or {}).get('all_categorical_to_ohe', [])
+        return EncodingPlan.from_dummies(self.processed_feature_columns, categorical)
+    
     def prepare_features(self, product_data, target_date=None):
         """
         Prepare features for prediction
@@ -84,53 +136,54 @@ class DailyModel:
         date_features = self.feature_info.get('date_features', [])
         
         df_latest = df.sort_values(by=['Product ID', 'Date']).groupby('Product ID').last().reset_index()
+        n_products = len(df_latest)
         
-        feature_rows = []
+        history = df.sort_values('Date', kind='stable')
+        codes = product_codes_for(history['Product ID'], df_latest['Product ID'])
+        offsets, exact = period_offsets(history['Date'], target_date, pd.Timedelta(days=1))
+        matrix = build_history_matrix(
+            codes, offsets, history['Units Sold'].to_numpy(dtype=np.float64),
+            n_products, 7, exact=exact
+        )
         
-        for _, row in df_latest.iterrows():
-            product_id = row['Product ID']
-            product_history = df[df['Product ID'] == product_id].sort_values('Date')
-            
-            feature_row = {}
-            
-            for col in static_cat_features:
-                if col in row:
-                    feature_row[col] = row[col]
-                else:
-                    feature_row[col] = 'Missing'
-            
-            for i in range(1, 8):
-                lag_date = target_date - pd.Timedelta(days=i)
-                lag_value = product_history[product_history['Date'] == lag_date]['Units Sold']
-                feature_row[f'UnitsSold_lag_{i}'] = lag_value.iloc[0] if not lag_value.empty else 0
-            
-            recent_sales = product_history[
-                (product_history['Date'] >= (target_date - pd.Timedelta(days=7))) &
-                (product_history['Date'] < target_date)
-            ]['Units Sold']
-            
-            feature_row['UnitsSold_roll_mean_7_lag1'] = recent_sales.mean() if not recent_sales.empty else 0
-            feature_row['UnitsSold_roll_std_7_lag1'] = recent_sales.std() if not recent_sales.empty and len(recent_sales) > 1 else 0
-            
-            if 'Inventory Level' in row:
-                feature_row['InventoryLevel_t'] = row['Inventory Level']
+        lag_dtype = history['Units Sold'].dtype if n_products else np.float64
+        if not np.issubdtype(lag_dtype, np.number):
+            lag_dtype = np.float64
+        
+        features = {}
+        
+        for col in static_cat_features:
+            if col in df_latest.columns:
+                features[col] = df_latest[col].to_numpy()
             else:
-                feature_row['InventoryLevel_t'] = 0
-            
-            feature_row['t+1_DayOfWeek'] = target_date.dayofweek
-            feature_row['t+1_Month'] = target_date.month
-            feature_row['t+1_Year'] = target_date.year
-            feature_row['t+1_DayOfYear'] = target_date.dayofyear
-            feature_row['t+1_WeekOfYear'] = target_date.isocalendar().week
-            feature_row['t+1_IsWeekend'] = int(target_date.dayofweek >= 5)
-            
-            for col_base in ['Demand Forecast', 'Price', 'Discount', 'Weather Condition', 'Holiday/Promotion', 'Seasonality']:
-                if col_base in row:
-                    feature_row[f'{col_base}_t+1'] = row[col_base]
-            
-            feature_rows.append(feature_row)
+                features[col] = np.full(n_products, 'Missing', dtype=object)
         
-        X = pd.DataFrame(feature_rows)
+        for i in range(1, 8):
+            features[f'UnitsSold_lag_{i}'] = matrix.lag(i).astype(lag_dtype)
+        
+        features['UnitsSold_roll_mean_7_lag1'] = matrix.window_mean(7)
+        features['UnitsSold_roll_std_7_lag1'] = matrix.window_std(7)
+        
+        if 'Inventory Level' in df_latest.columns:
+            features['InventoryLevel_t'] = df_latest['Inventory Level'].to_numpy()
+        else:
+            features['InventoryLevel_t'] = np.zeros(n_products, dtype=np.int64)
+        
+        features['t+1_DayOfWeek'] = np.full(n_products, target_date.dayofweek)
+        features['t+1_Month'] = np.full(n_products, target_date.month)
+        features['t+1_Year'] = np.full(n_products, target_date.year)
+        features['t+1_DayOfYear'] = np.full(n_products, target_date.dayofyear)
+        features['t+1_WeekOfYear'] = np.full(n_products, target_date.isocalendar().week)
+        features['t+1_IsWeekend'] = np.full(n_products, int(target_date.dayofweek >= 5))
+        
+        for col_base in ['Demand Forecast', 'Price', 'Discount', 'Weather Condition', 'Holiday/Promotion', 'Seasonality']:
+            if col_base in df_latest.columns:
+                features[f'{col_base}_t+1'] = df_latest[col_base].to_numpy()
+        
+        if self.encoding_plan is not None:
+            return self.encoding_plan.encode(features, n_products)
+        
+        X = pd.DataFrame(features)
         
         if self.encoder_info and 'all_categorical_to_ohe' in self.encoder_info:
             cat_cols = self.encoder_info['all_categorical_to_ohe']
@@ -162,7 +215,13 @@ class DailyModel:
         if self.model is None:
             raise ValueError("Model not loaded")
         
-        predictions = self.model.predict(X)
+        predictions = predict_trees(self, X)
         return np.maximum(0, predictions)
 
-daily_model = DailyModel()
+
+def __getattr__(name):
+    # The shared instance comes from the model registry, so importing this module does not load the model
+    if name == 'daily_model':
+        from .registry import model_registry
+        return model_registry.get('daily')
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,159 @@
+import uuid
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import DailyProductSales, SalesRecords
+
+SOURCE_DAILY = "daily"
+SOURCE_TRANSACTIONS = "transactions"
+
+
+def history_source():
+    """
+    Where sales history is read from: "daily" (DailyProductSales) or "transactions" (SalesRecords)
+    """
+    return getattr(settings, 'SALES_HISTORY_SOURCE', SOURCE_DAILY)
+
+
+def sales_day(transaction_date):
+    """
+    Day a transaction counts towards, in the current time zone like the __date lookup
+    """
+    if isinstance(transaction_date, str):
+        transaction_date = parse_datetime(transaction_date)
+    if timezone.is_aware(transaction_date):
+        return timezone.localdate(transaction_date)
+    return transaction_date.date()
+
+
+def _daily_totals(sales):
+    """
+    Per product and day totals of a SalesRecords queryset
+    """
+    return sales.annotate(day=TruncDate('transaction_date')).values('product_id', 'day').annotate(
+        units=Sum('quantity_sold'),
+        revenue=Sum(F('quantity_sold') * F('unit_price_at_sale')),
+        discount=Sum('discount_applied'),
+        transactions=Count('pk'),
+        promotions=Count('pk', filter=Q(promotion_marker=True)),
+    ).order_by()
+
+
+def _daily_row(totals):
+    return DailyProductSales(
+        daily_sales_id=str(uuid.uuid4()),
+        product_id=totals['product_id'],
+        date=totals['day'],
+        units_sold=totals['units'] or 0,
+        revenue=totals['revenue'] or 0.0,
+        discount=totals['discount'] or 0.0,
+        transactions=totals['transactions'],
+        promotion=totals['promotions'] > 0,
+    )
+
+
+def refresh_daily_sales(keys):
+    """
+    Recompute the daily rows of the given product days from their transactions
+
+    A day whose transactions were all deleted or moved loses its row. Rows
+    are upserted, so concurrent sales of the same product and day never
+    collide on the (product, date) constraint.
+
+    Args:
+        keys: Iterable of (product ID, date) pairs
+    """
+    keys = {(product_id, day) for product_id, day in keys if product_id and day}
+    if not keys:
+        return
+    sales = SalesRecords.objects.filter(
+        product_id__in={product_id for product_id, _ in keys},
+        transaction_date__date__in={day for _, day in keys}
+    )
+    rows = [_daily_row(totals) for totals in _daily_totals(sales) if (totals['product_id'], totals['day']) in keys]
+    emptied = keys - {(row.product_id, row.date) for row in rows}
+    with transaction.atomic():
+        if emptied:
+            DailyProductSales.objects.filter(
+                reduce(or_, (Q(product_id=product_id, date=day) for product_id, day in emptied))
+            ).delete()
+        DailyProductSales.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['product', 'date'],
+            update_fields=['units_sold', 'revenue', 'discount', 'transactions', 'promotion']
+        )
+
+
+def backfill_daily_sales(start_date=None, end_date=None, batch_size=1000):
+    """
+    Rebuild the daily rows of a date range (everything by default) in bulk
+
+    Returns:
+        int: Number of daily rows written
+    """
+    sales = SalesRecords.objects.all()
+    existing = DailyProductSales.objects.all()
+    if start_date:
+        sales = sales.filter(transaction_date__date__gte=start_date)
+        existing = existing.filter(date__gte=start_date)
+    if end_date:
+        sales = sales.filter(transaction_date__date__lte=end_date)
+        existing = existing.filter(date__lte=end_date)
+
+    rows = [_daily_row(totals) for totals in _daily_totals(sales).iterator()]
+    with transaction.atomic():
+        existing.delete()
+        DailyProductSales.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def daily_sales(product_ids=None, start_date=None, end_date=None):
+    """
+    Daily rows of the given products (all by default) between two dates, inclusive
+
+    Returns:
+        QuerySet of dicts with product_id, date, units_sold, revenue, discount,
+        transactions and promotion, ordered by date
+    """
+    rows = DailyProductSales.objects.all()
+    if product_ids is not None:
+        rows = rows.filter(product_id__in=product_ids)
+    if start_date:
+        rows = rows.filter(date__gte=start_date)
+    if end_date:
+        rows = rows.filter(date__lte=end_date)
+    return rows.values(
+        'product_id', 'date', 'units_sold', 'revenue', 'discount', 'transactions', 'promotion'
+    ).order_by('date', 'product_id')
+
+
+def history_row(day, product):
+    """
+    One row of forecast history (see MultiModelPredictor.get_product_data) from a daily row
+
+    Price is the day's average selling price and Discount the average
+    discount per transaction.
+    """
+    units = day["units_sold"]
+    return {
+        "Date": day["date"],
+        "Store ID": 1,
+        "Product ID": product.product_id,
+        "Category": product.category.name if product.category else "Unknown",
+        "Inventory Level": product.current_stock,
+        "Units Sold": units,
+        "Price": day["revenue"] / units if units else product.unit_price,
+        "Discount": day["discount"] / day["transactions"] if day["transactions"] else 0.0,
+        "Weather Condition": "Normal",
+        "Holiday/Promotion": 1 if day["promotion"] else 0,
+        "Seasonality": "Regular",
+        "Demand Forecast": 0.0,
+    }
@@ -1,14 +1,206 @@
 import pandas as pd
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from django.db.models import Q, Sum
-from ..models import Products, SalesRecords, Categories
+from django.db.models import OuterRef, Q, Subquery, Sum
+from ..models import Products, PurchaseOrderItems, SalesRecords, Categories
+from .daily_sales import SOURCE_DAILY, daily_sales, history_source
+from .multi_model_predictor import _as_date
 import os
 from pathlib import Path
 
+TRAINING_COLUMNS = [
+    'Date', 'Product_ID', 'Category', 'Inventory_Level', 'Competitor_Pricing', 'Units_Sold',
+    'Units_Ordered', 'Price', 'Discount', 'Holiday/Promotion', 'Demand Forecast'
+]
+
+# File suffix -> training data format
+TRAINING_FORMATS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+}
+
+DICTIONARY_COLUMNS = ('Product_ID', 'Category')
+
+
+def training_format(path):
+    suffix = Path(path).suffix.lower()
+    if suffix not in TRAINING_FORMATS:
+        raise ValueError(f"Unsupported training data file type: {suffix or path} (use {', '.join(TRAINING_FORMATS)})")
+    return TRAINING_FORMATS[suffix]
+
+
+def training_schema():
+    """
+    Arrow schema of the training columns
+    """
+    import pyarrow as pa
+    
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('Date', pa.date32()),
+        ('Product_ID', dictionary),
+        ('Category', dictionary),
+        ('Inventory_Level', pa.int64()),
+        ('Competitor_Pricing', pa.float64()),
+        ('Units_Sold', pa.int64()),
+        ('Units_Ordered', pa.int64()),
+        ('Price', pa.float64()),
+        ('Discount', pa.float64()),
+        ('Holiday/Promotion', pa.int8()),
+        ('Demand Forecast', pa.float64()),
+    ])
+
+
+def training_dictionaries():
+    """
+    Values of the dictionary-encoded columns: every product ID and category name
+    """
+    return {
+        'Product_ID': sorted(Products.objects.values_list('product_id', flat=True)),
+        'Category': sorted(set(Categories.objects.values_list('name', flat=True)) | {'Unknown'}),
+    }
+
+
+def _record_batch(rows, schema, dictionaries):
+    """
+    Arrow record batch of training rows, with the string columns encoded against fixed dictionaries
+    """
+    import pyarrow as pa
+    
+    frame = pd.DataFrame(rows, columns=TRAINING_COLUMNS)
+    arrays = []
+    for field in schema:
+        if field.name in dictionaries:
+            codes = pd.Categorical(frame[field.name], categories=dictionaries[field.name]).codes
+            arrays.append(pa.DictionaryArray.from_arrays(
+                pa.array(codes, type=pa.int32()), pa.array(dictionaries[field.name], type=pa.string())
+            ))
+        else:
+            arrays.append(pa.array(frame[field.name], type=field.type, from_pandas=True))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+@contextmanager
+def training_writer(path, file_format, dictionaries):
+    """
+    Open a training data file and yield a function that appends a list of rows to it
+    """
+    if file_format == 'csv':
+        with open(path, 'w', newline='') as f:
+            header = [True]
+            
+            def write(rows):
+                if rows or header[0]:
+                    pd.DataFrame(rows, columns=TRAINING_COLUMNS).to_csv(f, header=header[0], index=False)
+                    header[0] = False
+            yield write
+        return
+    
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    schema = training_schema()
+    if file_format == 'parquet':
+        writer = pq.ParquetWriter(path, schema, compression='zstd')
+        write_batch = lambda batch: writer.write_batch(batch)
+    else:
+        writer = pa.ipc.new_file(str(path), schema)
+        write_batch = writer.write_batch
+    try:
+        yield lambda rows: write_batch(_record_batch(rows, schema, dictionaries))
+    finally:
+        writer.close()
+
+
+def load_training_data(path, columns=None):
+    """
+    Read a training data file written by DataPreparation.write_training_data
+    
+    Parquet and Arrow files are memory-mapped instead of read and parsed; an
+    Arrow IPC file's buffers are used straight from the page cache until
+    they are converted. Dictionary-encoded columns become pandas categoricals.
+    
+    Args:
+        path: CSV, Parquet or Arrow file
+        columns: Columns to read (default: all)
+        
+    Returns:
+        pandas.DataFrame
+    """
+    file_format = training_format(path)
+    if file_format == 'csv':
+        return pd.read_csv(path, usecols=columns, parse_dates=['Date'] if columns is None or 'Date' in columns else None)
+    
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    if file_format == 'parquet':
+        table = pq.read_table(path, columns=columns, memory_map=True)
+    else:
+        with pa.memory_map(str(path)) as source:
+            table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select(columns)
+    frame = table.to_pandas()
+    if 'Date' in frame.columns:
+        frame['Date'] = pd.to_datetime(frame['Date'])
+    return frame
+
+
+class UnitsOrdered:
+    """
+    Units of each product ordered in the `days` days up to and including a date.
+    
+    The purchase-order items of the whole range are summed per product and
+    order date with one query and kept as running totals, so the ordered
+    quantity of any (product, date) is the difference of two prefix sums
+    instead of a query per row.
+    """
+    def __init__(self, start_date, end_date, product_ids=None, days=30):
+        self.days = days
+        items = PurchaseOrderItems.objects.filter(
+            purchase_order__order_date__gte=start_date - timedelta(days=days),
+            purchase_order__order_date__lte=end_date
+        )
+        if product_ids is not None:
+            items = items.filter(product_id__in=product_ids)
+        totals = items.values('product_id', 'purchase_order__order_date').annotate(
+            ordered=Sum('ordered_quantity')
+        ).order_by('product_id', 'purchase_order__order_date')
+        
+        self._dates = {}
+        self._running_totals = {}
+        for row in totals:
+            dates = self._dates.setdefault(row['product_id'], [])
+            running = self._running_totals.setdefault(row['product_id'], [0])
+            dates.append(row['purchase_order__order_date'].toordinal())
+            running.append(running[-1] + (row['ordered'] or 0))
+    
+    def get(self, product_id, date):
+        """
+        Units of a product ordered from `days` days before date up to date
+        """
+        dates = self._dates.get(product_id)
+        if not dates:
+            return 0
+        running = self._running_totals[product_id]
+        first = bisect_left(dates, (date - timedelta(days=self.days)).toordinal())
+        last = bisect_right(dates, date.toordinal())
+        return max(running[last] - running[first], 0)
+
+
 class DataPreparation:
     def __init__(self):
         self.model_dir = Path(__file__).resolve().parent / 'model_files'
         
+    def _date_range(self, start_date, end_date):
+        end_date = _as_date(end_date) if end_date else datetime.now().date()
+        start_date = _as_date(start_date) if start_date else end_date - timedelta(days=365)
+        return start_date, end_date
+    
     def collect_sales_data(self, start_date=None, end_date=None):
         """
         Collect sales data from Django models and format for ML model
@@ -20,65 +212,78 @@ class DataPreparation:
         Returns:
             pandas.DataFrame: Formatted data ready for ML model
         """
-        if not end_date:
-            end_date = datetime.now().date()
-        if not start_date:
-            start_date = end_date - timedelta(days=365)
+        return pd.DataFrame(list(self.iter_sales_rows(start_date, end_date)))
+    
+    def iter_sales_rows(self, start_date=None, end_date=None, chunk_size=2000):
+        """
+        Training rows one dict at a time, in date order
+        
+        Rows are fetched from the database chunk_size at a time with
+        QuerySet.iterator(), so the whole range is never held in memory.
+        
+        Args:
+            start_date: Start date for data collection (YYYY-MM-DD)
+            end_date: End date for data collection (YYYY-MM-DD)
+            chunk_size: Database rows fetched at a time
+            
+        Yields:
+            dict: One row with the TRAINING_COLUMNS
+        """
+        start_date, end_date = self._date_range(start_date, end_date)
+        
+        from .multi_model_predictor import MultiModelPredictor
+        predictor = MultiModelPredictor()
+        product_demand_forecasts = predictor._calculate_moving_averages(None, end_date)
+        units_ordered = UnitsOrdered(start_date, end_date)
+        
+        if history_source() == SOURCE_DAILY:
+            yield from self._iter_daily_rows(start_date, end_date, product_demand_forecasts, units_ordered, chunk_size)
+            return
             
         sales_query = SalesRecords.objects.select_related('product', 'product__category').filter(
             transaction_date__date__gte=start_date,
             transaction_date__date__lte=end_date
         ).order_by('transaction_date')
-        data_rows = []
         
-        from .multi_model_predictor import MultiModelPredictor
-        predictor = MultiModelPredictor()
-        unique_products = set(sale.product.product_id for sale in sales_query)
-        product_demand_forecasts = {}
-        for product_id in unique_products:
-            product_demand_forecasts[product_id] = predictor._calculate_simple_moving_average(
-                product_id, end_date
-            )
-        
-        for sale in sales_query:
+        for sale in sales_query.iterator(chunk_size=chunk_size):
             demand_forecast = product_demand_forecasts.get(sale.product.product_id, 0.0)
             
-            row = {
+            yield {
                 'Date': sale.transaction_date.date(),
                 'Product_ID': sale.product.product_id,
                 'Category': sale.product.category.name if sale.product.category else 'Unknown',
                 'Inventory_Level': sale.product.current_stock,
                 'Competitor_Pricing': sale.product.competitor_price or 0.0,
                 'Units_Sold': sale.quantity_sold,
-                'Units_Ordered': self._get_units_ordered(sale.product, sale.transaction_date.date()),
+                'Units_Ordered': units_ordered.get(sale.product.product_id, sale.transaction_date.date()),
                 'Price': sale.unit_price_at_sale,
                 'Discount': sale.discount_applied,
                 'Holiday/Promotion': 1 if sale.promotion_marker else 0,
                 'Demand Forecast': demand_forecast,
             }
-            data_rows.append(row)
-            
-        return pd.DataFrame(data_rows)
     
-    def _get_units_ordered(self, product, date):
+    def _iter_daily_rows(self, start_date, end_date, product_demand_forecasts, units_ordered, chunk_size):
         """
-        Get units ordered for a product around a specific date
-        This is a simplified approach - you may need to adjust based on your business logic
+        Training rows with one row per product and day, read from DailyProductSales
         """
-
-        from ..models import PurchaseOrderItems
-        
-        start_date = date - timedelta(days=30)
-        end_date = date
-        
-        po_items = PurchaseOrderItems.objects.filter(
-            product=product,
-            purchase_order__order_date__gte=start_date,
-            purchase_order__order_date__lte=end_date
-        )
+        products = Products.objects.select_related('category').in_bulk()
         
-        total_ordered = sum(item.ordered_quantity for item in po_items)
-        return total_ordered if total_ordered > 0 else 0
+        for day in daily_sales(start_date=start_date, end_date=end_date).iterator(chunk_size=chunk_size):
+            product = products[day['product_id']]
+            units = day['units_sold']
+            yield {
+                'Date': day['date'],
+                'Product_ID': product.product_id,
+                'Category': product.category.name if product.category else 'Unknown',
+                'Inventory_Level': product.current_stock,
+                'Competitor_Pricing': product.competitor_price or 0.0,
+                'Units_Sold': units,
+                'Units_Ordered': units_ordered.get(product.product_id, day['date']),
+                'Price': day['revenue'] / units if units else product.unit_price,
+                'Discount': day['discount'] / day['transactions'] if day['transactions'] else 0.0,
+                'Holiday/Promotion': 1 if day['promotion'] else 0,
+                'Demand Forecast': product_demand_forecasts.get(product.product_id, 0.0),
+            }
     
     def generate_training_csv(self, start_date=None, end_date=None, filename='processed.csv'):
         """
@@ -108,61 +313,171 @@ class DataPreparation:
         
         return csv_path
     
+    def write_training_data(self, path, start_date=None, end_date=None, chunk_size=50000):
+        """
+        Stream training data into a CSV, Parquet or Arrow IPC file, one chunk at a time
+        
+        The format follows the file suffix (see TRAINING_FORMATS). At most
+        chunk_size rows are held in memory; each chunk is written as one CSV
+        block, Parquet row group or Arrow record batch. In Parquet and Arrow
+        files the columns are typed and Product_ID and Category are dictionary
+        encoded against the full product and category lists, so every chunk
+        shares one dictionary. The file is written under a temporary name and
+        renamed when complete.
+        
+        Args:
+            path: Output file
+            start_date: Start date for data collection (YYYY-MM-DD)
+            end_date: End date for data collection (YYYY-MM-DD)
+            chunk_size: Rows per chunk
+            
+        Returns:
+            dict: Rows written and the first and last date, both None without rows
+        """
+        path = Path(path)
+        file_format = training_format(path)
+        dictionaries = training_dictionaries()
+        tmp_path = path.with_name(f'{path.name}.tmp')
+        summary = {'rows': 0, 'first_date': None, 'last_date': None}
+        
+        try:
+            with training_writer(tmp_path, file_format, dictionaries) as write:
+                rows = []
+                for row in self.iter_sales_rows(start_date, end_date, chunk_size=min(chunk_size, 2000)):
+                    rows.append(row)
+                    # Rows arrive in date order
+                    summary['first_date'] = summary['first_date'] or row['Date']
+                    summary['last_date'] = row['Date']
+                    if len(rows) >= chunk_size:
+                        write(rows)
+                        summary['rows'] += len(rows)
+                        rows = []
+                if rows or not summary['rows']:
+                    write(rows)
+                    summary['rows'] += len(rows)
+            os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        return summary
+    
+    def generate_training_file(self, start_date=None, end_date=None, filename='processed.parquet', chunk_size=50000):
+        """
+        Generate a training data file in the model directory with bounded memory
+        
+        Args:
+            start_date: Start date for data collection (YYYY-MM-DD)
+            end_date: End date for data collection (YYYY-MM-DD)
+            filename: Name of the output file; .csv, .parquet or .arrow
+            chunk_size: Rows per written chunk
+            
+        Returns:
+            str: Path to the generated file
+        """
+        os.makedirs(self.model_dir, exist_ok=True)
+        
+        path = os.path.join(self.model_dir, filename)
+        summary = self.write_training_data(path, start_date, end_date, chunk_size)
+        if not summary['rows']:
+            os.remove(path)
+            raise ValueError("No sales data found for the specified date range")
+        
+        print(f"Training data saved to: {path}")
+        print(f"Rows: {summary['rows']}")
+        print(f"Date range: {summary['first_date']} to {summary['last_date']}")
+        
+        return path
+    
     def get_latest_product_data(self, product_ids=None):
         """
         Get the latest data for specific products for prediction
         
+        The latest sale of every product is attached to the product query as
+        subquery annotations, and moving averages and units ordered come from
+        one grouped query each, so any number of products costs three
+        queries. Units sold, discount and promotion are those of the latest
+        individual sale whichever SALES_HISTORY_SOURCE is configured; the
+        DailyProductSales totals of a day are not a sale.
+        
         Args:
             product_ids: List of product IDs to get data for
             
         Returns:
             pandas.DataFrame: Latest product data
         """
+        latest = SalesRecords.objects.filter(product=OuterRef('pk')).order_by('-transaction_date')
+        latest_fields = {
+            'latest_units': 'quantity_sold',
+            'latest_discount': 'discount_applied',
+            'latest_promotion': 'promotion_marker',
+        }
+        products = Products.objects.select_related('category').annotate(**{
+            name: Subquery(latest.values(field)[:1]) for name, field in latest_fields.items()
+        })
         if product_ids:
-            products = Products.objects.select_related('category').filter(product_id__in=product_ids)
-        else:
-            products = Products.objects.select_related('category').all()
-            
-        data_rows = []
+            products = products.filter(product_id__in=product_ids)
+        products = list(products)
+        
         current_date = datetime.now().date()
+        selected_ids = [product.product_id for product in products]
+        
+        from .multi_model_predictor import predictor
+        demand_forecasts = predictor._calculate_moving_averages(selected_ids, current_date)
+        units_ordered = UnitsOrdered(current_date, current_date, selected_ids)
+        
+        data_rows = []
         for product in products:
-            latest_sale = SalesRecords.objects.filter(product=product).order_by('-transaction_date').first()
-            
-            from .multi_model_predictor import MultiModelPredictor
-            predictor = MultiModelPredictor()
-            demand_forecast = predictor._calculate_simple_moving_average(product.product_id, current_date)
-            
             row = {
                 'Date': current_date,
                 'Product_ID': product.product_id,
                 'Category': product.category.name if product.category else 'Unknown',
                 'Inventory_Level': product.current_stock,
                 'Competitor_Pricing': product.competitor_price or 0.0,
-                'Units_Sold': latest_sale.quantity_sold if latest_sale else 0,
-                'Units_Ordered': self._get_units_ordered(product, current_date),
+                'Units_Sold': product.latest_units or 0,
+                'Units_Ordered': units_ordered.get(product.product_id, current_date),
                 'Price': product.unit_price,
-                'Discount': latest_sale.discount_applied if latest_sale else 0.0,
-                'Holiday/Promotion': 1 if (latest_sale and latest_sale.promotion_marker) else 0,
-                'Demand Forecast': demand_forecast,
+                'Discount': product.latest_discount if product.latest_units is not None else 0.0,
+                'Holiday/Promotion': 1 if product.latest_promotion else 0,
+                'Demand Forecast': demand_forecasts[product.product_id],
             }
             data_rows.append(row)
             
         return pd.DataFrame(data_rows)
 
-def generate_training_data(start_date=None, end_date=None, filename='processed.csv'):
+def generate_training_data(start_date=None, end_date=None, filename='processed.csv', chunk_size=None, incremental=False):
     """
-    Convenience function to generate training CSV data
+    Convenience function to generate training data
     
     Args:
         start_date: Start date for data collection (YYYY-MM-DD string or datetime)
         end_date: End date for data collection (YYYY-MM-DD string or datetime)
-        filename: Name of the output CSV file
+        filename: Name of the output file; .csv, .parquet or .arrow
+        chunk_size: Stream the rows in chunks of this size; always done for
+            Parquet and Arrow output
+        incremental: Keep the data as a directory of daily partitions named
+            after the file (see TrainingDataset) and only extract new and
+            changed days
         
     Returns:
-        str: Path to the generated CSV file
+        str: Path to the generated file, or directory when incremental
     """
     data_prep = DataPreparation()
-    return data_prep.generate_training_csv(start_date, end_date, filename)
+    if incremental:
+        from .training_dataset import TrainingDataset
+        
+        path = Path(filename)
+        # Up to yesterday, the last complete day
+        end_date = _as_date(end_date) if end_date else datetime.now().date() - timedelta(days=1)
+        days = (end_date - _as_date(start_date)).days + 1 if start_date else 365
+        dataset = TrainingDataset(data_prep.model_dir / path.stem, training_format(path), data_prep)
+        summary = dataset.refresh(end_date, days=days, chunk_size=chunk_size or 50000)
+        print(f"Training data refreshed in: {dataset.path}")
+        print(f"Appended {summary['appended_days']} day(s), re-extracted {summary['re_extracted_days']}, "
+              f"{summary['rows']} rows in total")
+        return str(dataset.path)
+    if chunk_size is None and training_format(filename) == 'csv':
+        return data_prep.generate_training_csv(start_date, end_date, filename)
+    return data_prep.generate_training_file(start_date, end_date, filename, chunk_size or 50000)
 
 def get_current_product_data(product_ids=None):
     """
@@ -0,0 +1,315 @@
+import numpy as np
+import pandas as pd
+
+
+class HistoryMatrix:
+    """
+    Product x period view of a sales history, used by the feature builders.
+
+    Column k of every matrix holds the history k periods before the prediction
+    target, so lag k lives at index k and column 0 is never filled.
+    """
+    def __init__(self, sums, counts, squares, maxes, first):
+        self.sums = sums
+        self.counts = counts
+        self.squares = squares
+        self.maxes = maxes
+        self.first = first
+
+    def lag(self, k):
+        """
+        Value of the first history row exactly k periods before the target (0 if none)
+        """
+        return np.nan_to_num(self.first[:, k], nan=0.0)
+
+    def has_lag(self, k):
+        return ~np.isnan(self.first[:, k])
+
+    def window_count(self, n):
+        return self.counts[:, 1:n + 1].sum(axis=1)
+
+    def window_mean(self, n):
+        """
+        Mean over all history rows in the n periods before the target (0 if none)
+        """
+        counts = self.window_count(n)
+        sums = self.sums[:, 1:n + 1].sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(counts > 0, sums / counts, 0.0)
+
+    def window_std(self, n):
+        """
+        Sample standard deviation over the n periods before the target (0 if fewer than 2 rows)
+        """
+        counts = self.window_count(n)
+        sums = self.sums[:, 1:n + 1].sum(axis=1)
+        squares = self.squares[:, 1:n + 1].sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = (squares - sums * sums / counts) / (counts - 1)
+        return np.where(counts > 1, np.sqrt(np.maximum(variance, 0.0)), 0.0)
+
+    def window_max(self, n):
+        """
+        Maximum over the n periods before the target (0 if none)
+        """
+        maxes = self.maxes[:, 1:n + 1].max(axis=1)
+        return np.where(self.window_count(n) > 0, maxes, 0.0)
+
+
+def build_history_matrix(product_codes, offsets, values, n_products, n_periods, exact=None):
+    """
+    Scatter history rows into product x period matrices in a single pass
+
+    Args:
+        product_codes: Matrix row of each history row (-1 to skip the row)
+        offsets: Number of periods between each history row and the target
+        values: Units sold of each history row
+        n_products: Number of matrix rows
+        n_periods: Number of periods before the target to keep
+        exact: Optional boolean mask of rows that sit exactly on a period
+            boundary; only those rows are used for lag values
+
+    Returns:
+        HistoryMatrix
+    """
+    product_codes = np.asarray(product_codes, dtype=np.int64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    width = n_periods + 1
+    size = n_products * width
+
+    keep = (product_codes >= 0) & (offsets >= 1) & (offsets <= n_periods) & ~np.isnan(values)
+    flat = product_codes[keep] * width + offsets[keep]
+    kept_values = values[keep]
+
+    sums = np.bincount(flat, weights=kept_values, minlength=size).reshape(n_products, width)
+    counts = np.bincount(flat, minlength=size).reshape(n_products, width)
+    squares = np.bincount(flat, weights=kept_values * kept_values, minlength=size).reshape(n_products, width)
+
+    maxes = np.full(size, -np.inf)
+    np.maximum.at(maxes, flat, kept_values)
+    maxes = maxes.reshape(n_products, width)
+
+    first = np.full(size, np.nan)
+    lag_flat = flat
+    lag_values = kept_values
+    if exact is not None:
+        exact_kept = np.asarray(exact, dtype=bool)[keep]
+        lag_flat = flat[exact_kept]
+        lag_values = kept_values[exact_kept]
+    unique_flat, first_index = np.unique(lag_flat, return_index=True)
+    first[unique_flat] = lag_values[first_index]
+    first = first.reshape(n_products, width)
+
+    return HistoryMatrix(sums, counts, squares, maxes, first)
+
+
+def datetime_values(timestamps):
+    """
+    Timestamps as a datetime64[ns] array, skipping the parse when they already are one
+    """
+    values = np.asarray(timestamps)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]')
+    return pd.to_datetime(values).values
+
+
+def period_offsets(timestamps, target, period):
+    """
+    Whole periods between each timestamp and the target, rounded up
+
+    A row at or after the target gets an offset below 1, so it falls outside
+    every look-back window. Rows exactly on a period boundary are flagged as
+    exact, which is what the lag features match on.
+
+    Returns:
+        tuple: (offsets, exact) integer and boolean arrays
+    """
+    delta = (np.datetime64(pd.Timestamp(target), 'ns') - datetime_values(timestamps)) / period.to_timedelta64()
+    delta = np.asarray(delta, dtype=np.float64)
+    missing = np.isnan(delta)
+    delta = np.where(missing, 0.0, delta)
+    offsets = np.ceil(delta)
+    exact = (offsets == delta) & ~missing
+    return offsets.astype(np.int64), exact
+
+
+def product_codes_for(history_ids, product_ids):
+    """
+    Position of each history row's product in product_ids (-1 if absent)
+    """
+    return pd.Index(product_ids).get_indexer(history_ids)
+
+
+def group_mode(group_codes, values, n_groups, default="Unknown"):
+    """
+    Most frequent value per group using categorical codes
+
+    Ties go to the smallest value and groups without any non-null value get
+    the default, matching the `x.mode()[0]` aggregator it replaces.
+
+    Args:
+        group_codes: Group number of each row (0..n_groups-1)
+        values: Values to take the mode of
+        n_groups: Number of groups
+        default: Value for groups without any non-null value
+
+    Returns:
+        numpy.ndarray: Object array with one mode per group
+    """
+    group_codes = np.asarray(group_codes, dtype=np.int64)
+    codes, uniques = pd.factorize(pd.Series(values), sort=True)
+    valid = codes >= 0
+    n_values = max(len(uniques), 1)
+    counts = np.bincount(
+        group_codes[valid] * n_values + codes[valid],
+        minlength=n_groups * n_values
+    ).reshape(n_groups, n_values)
+    result = np.full(n_groups, default, dtype=object)
+    has_value = counts.sum(axis=1) > 0
+    if len(uniques):
+        result[has_value] = np.asarray(uniques, dtype=object)[counts.argmax(axis=1)[has_value]]
+    return result
+
+
+def month_index(timestamps):
+    """
+    Months since 1970-01 for each timestamp
+    """
+    return datetime_values(timestamps).astype('datetime64[M]').astype(np.int64)
+
+
+def latest_values(product_codes, timestamps, values, n_products, depth):
+    """
+    The most recent values of every product, newest first
+
+    Args:
+        product_codes: Matrix row of each history row (-1 to skip the row)
+        timestamps: Ordering key of each history row
+        values: Values to collect
+        n_products: Number of matrix rows
+        depth: Number of most recent values to keep per product
+
+    Returns:
+        tuple: (n_products x depth array padded with NaN, row count per product)
+    """
+    product_codes = np.asarray(product_codes, dtype=np.int64)
+    keep = product_codes >= 0
+    product_codes = product_codes[keep]
+    timestamps = np.asarray(timestamps)[keep]
+    values = np.asarray(values, dtype=np.float64)[keep]
+
+    order = np.lexsort((timestamps, product_codes))
+    sorted_codes = product_codes[order]
+    counts = np.bincount(sorted_codes, minlength=n_products)
+    group_end = np.cumsum(counts)
+    rank = group_end[sorted_codes] - 1 - np.arange(len(sorted_codes))
+
+    latest = np.full((n_products, depth), np.nan)
+    recent = rank < depth
+    latest[sorted_codes[recent], rank[recent]] = values[order][recent]
+    return latest, counts
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    if values.dtype.kind in 'biuf':
+        return values.astype(np.float64, copy=False)
+    return pd.Series(values).astype(np.float64).to_numpy()
+
+
+class EncodingPlan:
+    """
+    A model's one-hot encoding, compiled against its processed feature columns.
+
+    Built once when the model loads: every known category value of every
+    categorical feature maps straight to its column index in the model's
+    feature order, and every numeric feature to its own. encode() then
+    writes a batch into one preallocated float32 matrix, instead of
+    encoding into new frames, concatenating them and reindexing them to the
+    model's columns on every call. Values are matched by their str() form,
+    like the `.astype(str)` the encoders were fitted on; unknown values
+    encode as all zeros and model columns no feature fills stay 0.
+    """
+    def __init__(self, columns, categories, fill_median=False):
+        """
+        Args:
+            columns: Processed feature columns in the model's order
+            categories: Categorical feature -> {category value: encoded column name}
+            fill_median: Fill missing numeric values with the batch median (0 if
+                all are missing), as the weekly and monthly builders do; the
+                daily model passes them on as missing
+        """
+        self.columns = list(columns)
+        position = {column: index for index, column in enumerate(self.columns)}
+        self.categories = {
+            feature: {value: position[column] for value, column in values.items() if column in position}
+            for feature, values in categories.items()
+        }
+        encoded = {column for values in categories.values() for column in values.values()}
+        self.numeric = {column: index for column, index in position.items() if column not in encoded}
+        self.fill_median = fill_median
+
+    @classmethod
+    def from_dummies(cls, columns, categorical_features):
+        """
+        Plan of pd.get_dummies(X, columns=categorical_features) reindexed to columns
+
+        get_dummies names the column of value v of feature f "f_v", so every
+        model column with such a prefix is one of that feature's categories.
+        """
+        categories = {feature: {} for feature in categorical_features}
+        # Longest prefix first, so a feature whose name extends another's claims its own columns
+        prefixes = sorted(categorical_features, key=len, reverse=True)
+        for column in columns:
+            for feature in prefixes:
+                if column.startswith(f'{feature}_'):
+                    categories[feature][column[len(feature) + 1:]] = column
+                    break
+        return cls(columns, categories)
+
+    @classmethod
+    def from_encoder(cls, columns, encoder, categorical_features, fill_median=True):
+        """
+        Plan of a fitted OneHotEncoder's transform of categorical_features, reindexed to columns
+        """
+        names = iter(encoder.get_feature_names_out(categorical_features))
+        drop_idx = getattr(encoder, 'drop_idx_', None)
+        categories = {}
+        for i, (feature, values) in enumerate(zip(categorical_features, encoder.categories_)):
+            categories[feature] = {}
+            for j, value in enumerate(values):
+                if drop_idx is not None and drop_idx[i] is not None and drop_idx[i] == j:
+                    continue
+                categories[feature][str(value)] = next(names)
+        return cls(columns, categories, fill_median=fill_median)
+
+    def encode(self, features, n_rows):
+        """
+        Feature matrix of a batch in the model's column order
+
+        Args:
+            features: Feature name -> array of n_rows values; categorical
+                features hold their raw values
+            n_rows: Number of rows
+
+        Returns:
+            pandas.DataFrame: float32 values under the processed feature columns
+        """
+        X = np.zeros((n_rows, len(self.columns)), dtype=np.float32)
+        for name, values in features.items():
+            index = self.numeric.get(name)
+            if index is not None:
+                column = _as_float(values)
+                if self.fill_median:
+                    missing = np.isnan(column)
+                    if missing.any():
+                        column = np.where(missing, 0.0 if missing.all() else np.nanmedian(column), column)
+                X[:, index] = column
+            elif name in self.categories and n_rows:
+                lookup = self.categories[name]
+                codes, uniques = pd.factorize(np.asarray(values, dtype=object), use_na_sentinel=False)
+                targets = np.array([lookup.get(str(value), -1) for value in uniques], dtype=np.int64)[codes]
+                rows = np.flatnonzero(targets >= 0)
+                X[rows, targets[rows]] = 1.0
+        return pd.DataFrame(X, columns=self.columns, copy=False)
@@ -0,0 +1,141 @@
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+VERSION_KEY = "forecast:version:{product_id}"
+ENTRY_KEY = "forecast:{time_horizon}:{model_version}:{periods}:{last_date}:{as_of}:{product_id}:{version}"
+
+
+class ForecastCache:
+    """
+    Cache of summarised forecasts, one entry per product, horizon, model
+    version, number of periods and last_date.
+
+    Every product carries a random data version that is replaced whenever its
+    sales, stock or price change (see api.signals). The version is part of the
+    entry key, so entries computed from old data can never be read again and
+    simply expire. Versions live in the Django cache, so every process sees
+    invalidations as long as a shared cache backend is configured.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'FORECAST_CACHE_ENABLED', True)
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'FORECAST_CACHE_TIMEOUT', 60 * 60)
+
+    def _versions(self, product_ids):
+        """
+        Current data version of every product, creating one where none exists yet
+        """
+        version_keys = {product_id: VERSION_KEY.format(product_id=product_id) for product_id in product_ids}
+        stored = cache.get_many(list(version_keys.values()))
+        versions = {}
+        for product_id, key in version_keys.items():
+            version = stored.get(key)
+            if version is None:
+                version = uuid.uuid4().hex
+                if not cache.add(key, version, timeout=None):
+                    version = cache.get(key, version)
+            versions[product_id] = version
+        return versions
+
+    def lookup(self, product_ids, time_horizon, periods, last_date=None, model_version=None):
+        """
+        Look up cached forecasts
+
+        Args:
+            product_ids: Product IDs to look up
+            time_horizon: "daily", "weekly" or "monthly"
+            periods: Number of forecast periods
+            last_date: Last known date as passed to the predictor
+            model_version: Version of the model serving the horizon
+
+        Returns:
+            tuple: (cached records by product ID, entry keys by product ID for the
+            products that still have to be computed; pass them to store())
+        """
+        product_ids = list(dict.fromkeys(product_ids))
+        if not self.enabled:
+            return {}, {product_id: None for product_id in product_ids}
+
+        # History always ends today, so entries roll over at midnight even without a last_date
+        as_of = timezone.localdate().isoformat()
+        versions = self._versions(product_ids)
+        entry_keys = {
+            product_id: ENTRY_KEY.format(
+                time_horizon=time_horizon, model_version=model_version or '-',
+                periods=periods, last_date=last_date or '-',
+                as_of=as_of, product_id=product_id, version=versions[product_id]
+            )
+            for product_id in product_ids
+        }
+        stored = cache.get_many(list(entry_keys.values()))
+
+        cached = {}
+        missing = {}
+        for product_id, key in entry_keys.items():
+            if key in stored:
+                cached[product_id] = stored[key]
+            else:
+                missing[product_id] = key
+
+        with self._lock:
+            self.hits += len(cached)
+            self.misses += len(missing)
+        return cached, missing
+
+    def store(self, records, entry_keys):
+        """
+        Store freshly computed forecast records under the keys returned by lookup()
+        """
+        if not self.enabled:
+            return
+        entries = {
+            entry_keys[record['Product_ID']]: record
+            for record in records
+            if entry_keys.get(record['Product_ID'])
+        }
+        if entries:
+            cache.set_many(entries, timeout=self.timeout)
+
+    def invalidate(self, product_id):
+        """
+        Give the product a new data version so none of its cached forecasts is used again
+        """
+        cache.set(VERSION_KEY.format(product_id=product_id), uuid.uuid4().hex, timeout=None)
+        with self._lock:
+            self.invalidations += 1
+
+    def stats(self):
+        """
+        Hit/miss counters of this process
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+
+
+forecast_cache = ForecastCache()
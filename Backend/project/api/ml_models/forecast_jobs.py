@@ -0,0 +1,137 @@
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from ..models import ForecastJob
+from .forecast_snapshots import SOURCE_MIXED, get_forecasts
+
+
+def job_ttl():
+    return timedelta(seconds=getattr(settings, 'FORECAST_JOB_TTL', 60 * 60))
+
+
+def request_key(product_ids, time_horizon, periods, last_date=None):
+    """
+    Hash of a job's inputs; requests with the same key share one job
+
+    Without a last_date forecasts run up to today, so the day is part of the key.
+    """
+    as_of = str(last_date) if last_date else f'today:{timezone.localdate()}'
+    payload = json.dumps([sorted(map(str, product_ids)), time_horizon, periods, as_of])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ForecastJobRunner:
+    """
+    Runs forecast jobs on a thread pool inside the server process
+
+    A job forecasts its products FORECAST_JOB_BATCH_SIZE at a time through
+    get_forecasts (snapshots first, live inference for the rest), recording
+    progress after each batch, and keeps its results until FORECAST_JOB_TTL
+    seconds after it finished. Until then, submitting the same products,
+    horizon, periods and last date returns the existing job. Jobs live in
+    the database so any server process can report on them; one interrupted
+    by a restart stays pending or running until it expires.
+    FORECAST_JOB_WORKERS of 0 runs jobs inline in the submitting request.
+    """
+    def __init__(self, workers=None):
+        self._workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def workers(self):
+        if self._workers is not None:
+            return self._workers
+        return getattr(settings, 'FORECAST_JOB_WORKERS', 2)
+
+    def submit(self, product_ids, time_horizon, periods, last_date=None):
+        """
+        Start a job forecasting the given products, or return the unexpired job with the same inputs
+
+        Args:
+            product_ids (list): Products to forecast
+            time_horizon (str): "daily", "weekly" or "monthly"
+            periods (int): Number of forecast periods
+            last_date: Last known date, or None for today
+
+        Returns:
+            tuple: (ForecastJob, whether it was created)
+        """
+        now = timezone.now()
+        ForecastJob.objects.filter(expires_at__lte=now).delete()
+
+        key = request_key(product_ids, time_horizon, periods, last_date)
+        job = ForecastJob.objects.filter(
+            request_key=key, expires_at__gt=now
+        ).exclude(status='failed').order_by('-created_at').first()
+        if job:
+            return job, False
+
+        job = ForecastJob.objects.create(
+            request_key=key,
+            time_horizon=time_horizon,
+            periods=periods,
+            last_date=last_date,
+            product_ids=list(product_ids),
+            expires_at=now + job_ttl()
+        )
+        workers = self.workers
+        if workers:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='forecast-job')
+            self._executor.submit(self._run_in_thread, job.job_id)
+        else:
+            self.run(job.job_id)
+            job.refresh_from_db()
+        return job, True
+
+    def _run_in_thread(self, job_id):
+        try:
+            self.run(job_id)
+        finally:
+            # Worker threads open their own connection; don't leave it to time out
+            connection.close()
+
+    def run(self, job_id):
+        """
+        Forecast a job's products batch by batch and store the results
+        """
+        job = ForecastJob.objects.get(job_id=job_id)
+        jobs = ForecastJob.objects.filter(job_id=job_id)
+        jobs.update(status='running')
+
+        last_date = job.last_date.isoformat() if job.last_date else None
+        batch_size = max(1, getattr(settings, 'FORECAST_JOB_BATCH_SIZE', 500))
+        results, sources = [], set()
+        try:
+            for start in range(0, len(job.product_ids), batch_size):
+                batch_ids = job.product_ids[start:start + batch_size]
+                records, source = get_forecasts(batch_ids, job.time_horizon, job.periods, last_date)
+                if isinstance(records, dict) and "error" in records:
+                    raise RuntimeError(records["error"])
+                results.extend(records)
+                sources.add(source)
+                jobs.update(completed_products=start + len(batch_ids))
+        except Exception as e:
+            jobs.update(status='failed', error=str(e), finished_at=timezone.now())
+            return
+
+        finished_at = timezone.now()
+        jobs.update(
+            status='done',
+            results=results,
+            source=sources.pop() if len(sources) == 1 else SOURCE_MIXED,
+            finished_at=finished_at,
+            expires_at=finished_at + job_ttl()
+        )
+
+
+forecast_jobs = ForecastJobRunner()
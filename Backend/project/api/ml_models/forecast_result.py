@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+# Days one forecast period stands for in Actual_Forecast_Days
+PERIOD_DAYS = {
+    "daily": 1,
+    "weekly": 7,
+    "monthly": 30
+}
+
+
+class ForecastResult:
+    """
+    Forecasts of one horizon as arrays: a row per product, a column per forecast date.
+
+    MultiModelPredictor.forecast returns it, the batcher slices it per
+    request, and summary_records() reduces it straight to the per-product
+    records the API, the forecast cache and the snapshots share, with NumPy
+    reductions instead of a DataFrame group-by. to_frame() gives the long
+    DataFrame predict_future_sales has always returned.
+    """
+    __slots__ = ('time_horizon', 'model_version', 'product_ids', 'dates', 'predictions')
+
+    def __init__(self, time_horizon, model_version, product_ids, dates, predictions):
+        self.time_horizon = time_horizon
+        self.model_version = model_version
+        self.product_ids = np.asarray(product_ids)
+        self.dates = list(dates)
+        self.predictions = np.asarray(predictions, dtype=float).reshape(len(self.product_ids), len(self.dates))
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def select(self, product_ids, n_periods):
+        """
+        The rows of the given products and the first n_periods dates, in this result's product order
+        """
+        rows = np.isin(self.product_ids, list(product_ids))
+        return ForecastResult(
+            self.time_horizon, self.model_version,
+            self.product_ids[rows], self.dates[:n_periods], self.predictions[rows, :n_periods]
+        )
+
+    def to_frame(self):
+        """
+        Product-major DataFrame with one row per product and forecast date
+        """
+        return pd.DataFrame({
+            "Date": np.tile([date.strftime("%Y-%m-%d") for date in self.dates], len(self.product_ids)),
+            "Product_ID": np.repeat(self.product_ids, len(self.dates)),
+            "Predicted_Units_Sold": self.predictions.ravel(),
+            "Model_Type": self.time_horizon,
+            "Model_Version": self.model_version
+        })
+
+    def summary_records(self):
+        """
+        Per-product totals, as summarize_predictions(self.to_frame()).to_dict(orient="records") gives them
+
+        Missing (NaN) predictions are skipped and products without any valid
+        prediction left out, as summarize_predictions does.
+
+        Returns:
+            list: One dict per product with Product_ID, Model_Type, Model_Version,
+            Total_Predicted_Units_Sold, Forecast_Periods and Actual_Forecast_Days
+        """
+        valid = ~np.isnan(self.predictions)
+        periods = valid.sum(axis=1)
+        totals = np.round(np.where(valid, self.predictions, 0.0).sum(axis=1)).astype(np.int64)
+        days = periods * PERIOD_DAYS.get(self.time_horizon, 30)
+
+        keep = periods > 0
+        return [
+            {
+                "Product_ID": product_id,
+                "Model_Type": self.time_horizon,
+                "Model_Version": self.model_version,
+                "Total_Predicted_Units_Sold": total,
+                "Forecast_Periods": n_periods,
+                "Actual_Forecast_Days": n_days,
+            }
+            for product_id, total, n_periods, n_days in zip(
+                self.product_ids[keep].tolist(), totals[keep].tolist(), periods[keep].tolist(), days[keep].tolist()
+            )
+        ]
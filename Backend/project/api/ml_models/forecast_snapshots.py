@@ -0,0 +1,143 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import ForecastSnapshot, Products, SalesRecords
+from .inference import serving_model_version
+
+SOURCE_SNAPSHOT = "snapshot"
+SOURCE_LIVE = "live"
+SOURCE_MIXED = "mixed"
+
+
+def snapshot_max_age():
+    return timedelta(seconds=getattr(settings, 'FORECAST_SNAPSHOT_MAX_AGE', 6 * 60 * 60))
+
+
+def fresh_snapshot_records(product_ids, time_horizon, periods):
+    """
+    Load precomputed forecasts that are still fresh
+
+    A snapshot is fresh when it was computed today (forecast history always ends
+    today), within FORECAST_SNAPSHOT_MAX_AGE, by the model version currently
+    serving the horizon, and has not been deleted because the product's sales,
+    stock or price changed since.
+
+    Returns:
+        dict: Product ID -> record in the get_product_sales_prediction format
+    """
+    now = timezone.now()
+    snapshots = ForecastSnapshot.objects.filter(
+        product_id__in=product_ids,
+        time_horizon=time_horizon,
+        periods=periods,
+        as_of_date=timezone.localdate(now),
+        computed_at__gte=now - snapshot_max_age(),
+        model_version=serving_model_version(time_horizon) or ''
+    ).values('product_id', 'total_predicted_units', 'forecast_days', 'model_version')
+
+    return {
+        snapshot['product_id']: {
+            "Product_ID": snapshot['product_id'],
+            "Model_Type": time_horizon,
+            "Total_Predicted_Units_Sold": snapshot['total_predicted_units'],
+            "Forecast_Periods": periods,
+            "Actual_Forecast_Days": snapshot['forecast_days'],
+            "Model_Version": snapshot['model_version'],
+        }
+        for snapshot in snapshots
+    }
+
+
+def changed_since(product_ids, since):
+    """
+    Products among the given ones whose row or sales were saved after a point in time
+    """
+    changed = set(Products.objects.filter(
+        product_id__in=product_ids, updated_at__gt=since
+    ).values_list('product_id', flat=True))
+    changed.update(SalesRecords.objects.filter(
+        product_id__in=product_ids, updated_at__gt=since
+    ).values_list('product_id', flat=True))
+    return changed
+
+
+def save_snapshots(records, time_horizon, periods, computed_at=None):
+    """
+    Replace the snapshots of the given forecast records in bulk
+
+    Snapshots are stamped with computed_at, which should be taken before the
+    forecasts' history was read. Products whose sales or product row changed
+    after it are skipped: the change has already dropped their old snapshot
+    (see api.signals), and a forecast built from the history before it must
+    not take its place.
+
+    Args:
+        records: Records as returned by ForecastResult.summary_records()
+        time_horizon: "daily", "weekly" or "monthly"
+        periods: Number of forecast periods
+        computed_at: Time the forecasts' history was read (defaults to now)
+
+    Returns:
+        int: Number of snapshots written
+    """
+    computed_at = computed_at or timezone.now()
+    with transaction.atomic():
+        stale = changed_since([record["Product_ID"] for record in records], computed_at)
+        snapshots = [
+            ForecastSnapshot(
+                product_id=record["Product_ID"],
+                time_horizon=time_horizon,
+                periods=periods,
+                as_of_date=timezone.localdate(computed_at),
+                total_predicted_units=int(record["Total_Predicted_Units_Sold"]),
+                forecast_days=int(record["Actual_Forecast_Days"]),
+                model_version=record.get("Model_Version") or '',
+                computed_at=computed_at,
+            )
+            for record in records
+            if record["Product_ID"] not in stale
+        ]
+        ForecastSnapshot.objects.filter(
+            product_id__in=[snapshot.product_id for snapshot in snapshots],
+            time_horizon=time_horizon,
+            periods=periods
+        ).delete()
+        ForecastSnapshot.objects.bulk_create(snapshots, batch_size=500)
+    return len(snapshots)
+
+
+def get_forecasts(product_ids, time_horizon, periods, last_date=None):
+    """
+    Get forecasts from fresh snapshots where possible and live inference otherwise
+
+    Snapshots are always computed up to today, so a request with an explicit
+    last_date goes straight to live inference.
+
+    Returns:
+        tuple: (records or {"error": ...} dict, source) where source is
+        "snapshot", "live" or "mixed"
+    """
+    from .multi_model_predictor import get_product_sales_prediction
+
+    snapshot_records = {}
+    if last_date is None:
+        snapshot_records = fresh_snapshot_records(product_ids, time_horizon, periods)
+
+    missing_ids = [product_id for product_id in product_ids if product_id not in snapshot_records]
+    if not missing_ids:
+        return sorted(snapshot_records.values(), key=lambda record: record["Product_ID"]), SOURCE_SNAPSHOT
+
+    live_records = get_product_sales_prediction(
+        product_ids=missing_ids,
+        time_horizon=time_horizon,
+        periods=periods,
+        last_date=last_date
+    )
+    if isinstance(live_records, dict) and "error" in live_records:
+        return live_records, SOURCE_LIVE
+
+    records = sorted(list(snapshot_records.values()) + live_records, key=lambda record: record["Product_ID"])
+    return records, SOURCE_MIXED if snapshot_records else SOURCE_LIVE
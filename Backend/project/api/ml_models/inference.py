@@ -0,0 +1,344 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.connection import Client, Listener, answer_challenge, deliver_challenge
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+OP_FORECAST = "forecast"
+OP_VERSIONS = "versions"
+OP_PING = "ping"
+
+
+class InferenceError(Exception):
+    """
+    Raised when the inference workers cannot answer a request.
+    """
+
+
+class InferenceUnavailable(InferenceError):
+    """
+    Raised when no inference server is listening at ML_INFERENCE_ADDRESS.
+    """
+
+
+class InferenceTimeout(InferenceError):
+    """
+    Raised when the inference server does not answer within the timeout.
+    """
+
+
+def parse_address(value):
+    """
+    "host:port" is a TCP address, anything else a Unix socket path
+    """
+    host, sep, port = value.rpartition(':')
+    if sep and port.isdigit() and '/' not in value:
+        return (host or '127.0.0.1', int(port))
+    return value
+
+
+def inference_address():
+    """
+    Address of the inference server from settings.ML_INFERENCE_ADDRESS
+
+    A (host, port) pair or a "host:port" string is a TCP address, any other
+    string a Unix socket path. None means forecasts run inside the web process.
+    """
+    address = getattr(settings, 'ML_INFERENCE_ADDRESS', None)
+    if isinstance(address, list):
+        address = tuple(address)
+    if isinstance(address, str):
+        address = parse_address(address)
+    return address
+
+
+def inference_authkey():
+    """
+    Shared secret of the server and its clients, derived from SECRET_KEY unless set
+    """
+    authkey = getattr(settings, 'ML_INFERENCE_AUTHKEY', None)
+    if authkey:
+        return authkey.encode() if isinstance(authkey, str) else authkey
+    return hashlib.sha256(f"ml-inference:{settings.SECRET_KEY}".encode()).digest()
+
+
+def _init_worker(settings_module):
+    """
+    Prepare a worker process: set up Django, drop inherited database
+    connections and load every model before the first request arrives.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+    from django.db import connections
+    connections.close_all()
+
+    from .registry import model_registry
+    model_registry.preload()
+
+
+def _handle(op, kwargs):
+    """
+    Run one request inside a worker process
+    """
+    from django.db import close_old_connections
+
+    close_old_connections()
+    if op == OP_FORECAST:
+        from .multi_model_predictor import compute_product_sales_prediction
+        return compute_product_sales_prediction(**kwargs)
+    if op == OP_VERSIONS:
+        from .registry import model_registry
+        return {time_horizon: model_registry.version(time_horizon) for time_horizon in model_registry}
+    if op == OP_PING:
+        return os.getpid()
+    raise ValueError(f"Unknown inference operation: {op}")
+
+
+class InferenceServer:
+    """
+    A pool of long-lived worker processes serving forecasts over a local socket.
+
+    Every worker sets up Django and preloads the models once, then runs
+    forecasts with its own interpreter, so concurrent requests from any number
+    of web workers are spread over the cores instead of queueing on the GIL of
+    the web process that received them. Each client connection is served by a
+    thread of the server, which hands the work to the pool and sends back the
+    result; workers reload retrained models like any other process (see
+    ModelRegistry).
+    """
+    def __init__(self, address=None, workers=None, authkey=None):
+        self.address = address or inference_address()
+        if self.address is None:
+            raise InferenceError("ML_INFERENCE_ADDRESS is not configured")
+        self.workers = workers or getattr(settings, 'ML_INFERENCE_WORKERS', None) or os.cpu_count() or 1
+        self.authkey = authkey or inference_authkey()
+        self.executor = None
+        self.listener = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """
+        Start the workers and wait until every one of them has loaded the models
+        """
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            # Spawned workers do not inherit the server's threads, sockets or locks
+            mp_context=get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'project.settings'),)
+        )
+        started = time.perf_counter()
+        pids = {future.result() for future in [self.executor.submit(_handle, OP_PING, {}) for _ in range(self.workers)]}
+        logger.info("Started %d inference workers in %.1fs", len(pids), time.perf_counter() - started)
+
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            # A socket left behind by a server that did not shut down cleanly
+            os.unlink(self.address)
+        self.listener = Listener(self.address, authkey=self.authkey)
+
+    def serve_forever(self):
+        """
+        Accept client connections until stop() is called
+        """
+        if self.listener is None:
+            self.start()
+        try:
+            while not self._stopped.is_set():
+                try:
+                    connection = self.listener.accept()
+                except OSError:
+                    if self._stopped.is_set():
+                        break
+                    logger.exception("Accepting an inference connection failed")
+                    continue
+                threading.Thread(target=self._serve_connection, args=(connection,), daemon=True).start()
+        finally:
+            self.stop()
+
+    def _serve_connection(self, connection):
+        with connection:
+            while True:
+                try:
+                    op, kwargs = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = ("ok", self.executor.submit(_handle, op, kwargs).result())
+                except Exception as e:
+                    logger.exception("Inference request %s failed", op)
+                    reply = ("error", str(e))
+                try:
+                    connection.send(reply)
+                except OSError:
+                    # The client gave up waiting and closed the connection
+                    return
+
+    def stop(self):
+        self._stopped.set()
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+class InferenceClient:
+    """
+    Client of an InferenceServer used by the web processes.
+
+    Every thread keeps its own connection, so concurrent requests of a threaded
+    web worker are served in parallel. A request that is not answered within
+    the timeout raises InferenceTimeout and its connection is discarded, so a
+    late answer can never be read as the reply to a later request.
+    """
+    def __init__(self, address, authkey=None, timeout=None):
+        self.address = address
+        self.authkey = authkey or inference_authkey()
+        self.timeout = timeout if timeout is not None else getattr(settings, 'ML_INFERENCE_TIMEOUT', 30)
+        self._local = threading.local()
+        self._versions = None
+        self._versions_at = 0.0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            try:
+                connection = Client(self.address)
+            except OSError as e:
+                raise InferenceUnavailable(f"No inference server at {self.address}: {e}")
+            # Authenticate by hand: Client() would wait forever on a server that stopped accepting
+            try:
+                if not connection.poll(self.timeout):
+                    raise InferenceTimeout(f"Inference server at {self.address} did not accept within {self.timeout}s")
+                answer_challenge(connection, self.authkey)
+                deliver_challenge(connection, self.authkey)
+            except (OSError, EOFError) as e:
+                connection.close()
+                raise InferenceUnavailable(f"Cannot connect to the inference server at {self.address}: {e}")
+            except BaseException:
+                connection.close()
+                raise
+            self._local.connection = connection
+        return connection
+
+    def _discard(self):
+        connection = getattr(self._local, 'connection', None)
+        self._local.connection = None
+        if connection is not None:
+            try:
+                connection.close()
+            except OSError:
+                pass
+
+    def call(self, op, timeout=None, **kwargs):
+        """
+        Send one request and wait for its result
+
+        Raises:
+            InferenceUnavailable: If the server cannot be reached
+            InferenceTimeout: If no answer arrives within the timeout
+            InferenceError: If the request failed in the worker
+        """
+        timeout = self.timeout if timeout is None else timeout
+        # A kept connection may belong to a server that has since restarted; retry once on a fresh one
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.send((op, kwargs))
+                if not connection.poll(timeout):
+                    self._discard()
+                    raise InferenceTimeout(f"Inference {op} timed out after {timeout}s")
+                status, result = connection.recv()
+                break
+            except (OSError, EOFError) as e:
+                self._discard()
+                if attempt:
+                    raise InferenceUnavailable(f"Lost the inference server at {self.address}: {e}")
+
+        if status != "ok":
+            raise InferenceError(result)
+        return result
+
+    def forecast(self, product_ids, time_horizon, periods, last_date=None):
+        return self.call(
+            OP_FORECAST,
+            product_ids=list(product_ids),
+            time_horizon=time_horizon,
+            periods=periods,
+            last_date=last_date
+        )
+
+    def versions(self):
+        return self.call(OP_VERSIONS)
+
+    def model_version(self, time_horizon):
+        """
+        Version of the model serving a horizon in the workers
+
+        Versions are remembered for ML_MODELS_RELOAD_INTERVAL seconds, which is
+        also how long the workers may take to notice a retrained model.
+        """
+        max_age = getattr(settings, 'ML_MODELS_RELOAD_INTERVAL', None) or 60
+        if self._versions is None or time.monotonic() - self._versions_at > max_age:
+            self._versions = self.versions()
+            self._versions_at = time.monotonic()
+        return self._versions.get(time_horizon)
+
+    def close(self):
+        self._discard()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def inference_client():
+    """
+    Client of the configured inference server, or None when forecasts run in-process
+    """
+    address = inference_address()
+    if address is None:
+        return None
+    with _clients_lock:
+        client = _clients.get(address)
+        if client is None:
+            client = _clients[address] = InferenceClient(address)
+    return client
+
+
+def fallback_enabled():
+    """
+    Whether forecasts run in-process while the inference server is unreachable
+    """
+    return getattr(settings, 'ML_INFERENCE_FALLBACK', True)
+
+
+def serving_model_version(time_horizon):
+    """
+    Version of the model that answers forecasts for a horizon
+
+    With an inference server this asks the workers, so the web process never
+    loads a model just to learn its version. Returns None when the workers
+    cannot tell.
+    """
+    client = inference_client()
+    if client is not None:
+        try:
+            return client.model_version(time_horizon)
+        except InferenceUnavailable:
+            if not fallback_enabled():
+                return None
+        except InferenceError:
+            logger.exception("Asking the inference workers for model versions failed")
+            return None
+    from .registry import model_registry
+    return model_registry.version(time_horizon)
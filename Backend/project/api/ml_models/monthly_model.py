@@ -1,12 +1,21 @@
+import hashlib
+import logging
 import os
 import pickle
 import pandas as pd
 import numpy as np
 from pathlib import Path
 from sklearn.preprocessing import OneHotEncoder
+from .artifacts import ModelArtifactError, load_artifact
+from .feature_matrix import (
+    EncodingPlan, build_history_matrix, group_mode, latest_values, month_index, product_codes_for
+)
+from .tree_engine import predict_trees
 
 MODEL_DIR = Path(__file__).resolve().parent / 'models'
 
+logger = logging.getLogger(__name__)
+
 class MonthlyModel:
     """
     XGBoost model for monthly sales predictions
@@ -17,17 +26,29 @@ class MonthlyModel:
         self.encoder = None
         self.feature_info = None
         self.processed_feature_columns = None
+        self.model_version = None
+        self.artifact_error = None
+        self.compiled_trees = None
         self.load_model_components()
+        self.encoding_plan = self.compile_encoding_plan()
     
     def load_model_components(self):
         """
         Load all model components for monthly predictions
+        
+        The native artifact written by `manage.py convert_models` is used when
+        present; the original pickles are the fallback.
         """
+        if self.load_native_artifact():
+            return
+        
         try:
             model_path = os.path.join(MODEL_DIR, f'inventory_xgb_monthly_store_{self.store_id}_model.pkl')
             if os.path.exists(model_path):
                 with open(model_path, 'rb') as f:
-                    self.model = pickle.load(f)
+                    model_bytes = f.read()
+                self.model = pickle.loads(model_bytes)
+                self.model_version = f"monthly-{hashlib.sha256(model_bytes).hexdigest()[:12]}"
                 print(f"Successfully loaded monthly model for store {self.store_id}")
             else:
                 print(f"Monthly model file not found at {model_path}")
@@ -52,6 +73,30 @@ class MonthlyModel:
         except Exception as e:
             print(f"Error loading monthly model components: {e}")
     
+    def load_native_artifact(self):
+        """
+        Load the model, features and encoder from the native artifact
+        
+        Returns:
+            bool: True if the artifact was found and loaded
+        """
+        try:
+            artifact = load_artifact('monthly', self.store_id)
+        except ModelArtifactError as e:
+            logger.warning("Ignoring monthly model artifact, falling back to the pickles: %s", e)
+            self.artifact_error = str(e)
+            return False
+        if artifact is None:
+            return False
+        
+        self.model = artifact.model
+        self.feature_info = artifact.feature_info
+        self.processed_feature_columns = self.feature_info.get('processed_feature_columns_list', [])
+        self.encoder = artifact.encoder
+        self.model_version = artifact.version
+        logger.info("Loaded monthly model artifact %s for store %s", artifact.version, self.store_id)
+        return True
+    
     def aggregate_to_monthly(self, daily_data):
         """
         Aggregate daily data to monthly data
@@ -69,9 +114,9 @@ class MonthlyModel:
         if 'Date' in df.columns:
             df['Date'] = pd.to_datetime(df['Date'])
         
-        df['Year_Month'] = df['Date'].dt.strftime('%Y-%m')
-        df['MonthStart'] = pd.to_datetime(df['Date'].dt.strftime('%Y-%m-01'))
-        df['MonthEnd'] = (df['MonthStart'] + pd.offsets.MonthEnd(0))
+        df['_month'] = month_index(df['Date'])
+        if 'Holiday/Promotion' in df.columns:
+            df['Holiday/Promotion'] = (df['Holiday/Promotion'] == 1).astype(np.int64)
         
         agg_funcs = {
             'Units Sold': 'sum',
@@ -79,39 +124,44 @@ class MonthlyModel:
             'Price': 'mean',
             'Discount': 'mean',
             'Inventory Level': 'mean',
-            'Weather Condition': lambda x: x.mode()[0] if not x.mode().empty else "Unknown",
-            'Holiday/Promotion': lambda x: 1 if (x==1).any() else 0,
-            'Seasonality': lambda x: x.mode()[0] if not x.mode().empty else "Unknown",
+            'Weather Condition': 'mode',
+            'Holiday/Promotion': 'max',
+            'Seasonality': 'mode',
             'Date': 'max',
-            'MonthStart': 'first',
-            'MonthEnd': 'first'
         }
         
         available_cols = [col for col in agg_funcs.keys() if col in df.columns]
-        agg_funcs = {col: agg_funcs[col] for col in available_cols}
         
-        monthly_df = df.groupby(['Store ID', 'Product ID', 'Year_Month']).agg(agg_funcs)
+        grouped = df.groupby(['Store ID', 'Product ID', '_month'], sort=True)
+        group_codes = grouped.ngroup().to_numpy()
+        monthly_df = grouped.agg({col: agg_funcs[col] for col in available_cols if agg_funcs[col] != 'mode'}).reset_index()
         
-        if isinstance(monthly_df.columns, pd.MultiIndex):
-            monthly_df.columns = [col[0] if col[1] == '' else f"{col[0]}_{col[1]}" for col in monthly_df.columns]
+        for col in available_cols:
+            if agg_funcs[col] == 'mode':
+                monthly_df[col] = group_mode(group_codes, df[col].to_numpy(), len(monthly_df))
         
-        monthly_df = monthly_df.reset_index()
-        
-        if 'MonthStart_first' in monthly_df.columns:
-            monthly_df['MonthStart'] = monthly_df['MonthStart_first']
-            monthly_df.drop('MonthStart_first', axis=1, inplace=True)
-            
-        if 'MonthEnd_first' in monthly_df.columns:
-            monthly_df['MonthEnd'] = monthly_df['MonthEnd_first']
-            monthly_df.drop('MonthEnd_first', axis=1, inplace=True)
+        months = monthly_df['_month'].to_numpy()
+        monthly_df['MonthStart'] = months.astype('datetime64[M]').astype('datetime64[ns]')
+        monthly_df['MonthEnd'] = ((months + 1).astype('datetime64[M]').astype('datetime64[D]') - 1).astype('datetime64[ns]')
+        monthly_df['Year_Month'] = pd.Series(months // 12 + 1970).astype(str) + "-" + \
+                                   pd.Series(months % 12 + 1).astype(str).str.zfill(2)
+        monthly_df = monthly_df[['Store ID', 'Product ID', 'Year_Month'] + available_cols + ['MonthStart', 'MonthEnd']]
         
         if 'Category' in df.columns:
-            category_map = df.drop_duplicates(['Product ID'])
-            category_map = category_map[['Product ID', 'Category']]
-            monthly_df = monthly_df.merge(category_map, on='Product ID', how='left')
+            category_map = df.drop_duplicates(['Product ID']).set_index('Product ID')['Category']
+            monthly_df['Category'] = monthly_df['Product ID'].map(category_map)
         
         return monthly_df
     
+    def compile_encoding_plan(self):
+        """
+        The one-hot encoding of the loaded model's categorical features, or None without encoder or feature columns
+        """
+        if self.encoder is None or not self.processed_feature_columns:
+            return None
+        categorical = self.feature_info.get('categorical_columns') or list(self.encoder.feature_names_in_)
+        return EncodingPlan.from_encoder(self.processed_feature_columns, self.encoder, categorical)
+    
     def prepare_features(self, product_data, target_month_start=None):
         """
         Prepare features for prediction
@@ -159,139 +209,100 @@ class MonthlyModel:
         date_features = self.feature_info.get('date_features', [])
         
         monthly_latest = monthly_data.sort_values(by=['Product ID', 'MonthStart']).groupby('Product ID').last().reset_index()
+        n_products = len(monthly_latest)
         
-        feature_rows = []
+        history = monthly_data.sort_values('MonthStart', kind='stable')
+        codes = product_codes_for(history['Product ID'], monthly_latest['Product ID'])
+        units = history['Units Sold'].to_numpy(dtype=np.float64)
         
-        for _, row in monthly_latest.iterrows():
-            product_id = row['Product ID']
-            product_history = monthly_data[monthly_data['Product ID'] == product_id].sort_values('MonthStart')
-            
-            feature_row = {}
-            
-            for col in static_cat_features:
-                if col in row:
-                    feature_row[col] = row[col]
-                else:
-                    feature_row[col] = 'Missing'
-            
-            for i in range(1, 13):
-                lag_month_start = (target_month_start - pd.DateOffset(months=i)).replace(day=1)
-                lag_row = product_history[product_history['MonthStart'] == lag_month_start]
-                lag_value = lag_row['Units Sold'] if not lag_row.empty else pd.Series([0])
-                feature_row[f'UnitsSold_lag_{i}_month'] = lag_value.iloc[0] if not lag_value.empty else 0
-            
-            last_year_month = (target_month_start - pd.DateOffset(months=12)).replace(day=1)
-            last_year_row = product_history[product_history['MonthStart'] == last_year_month]
-            feature_row['UnitsSold_same_month_last_year'] = last_year_row['Units Sold'].iloc[0] if not last_year_row.empty else 0
-            
-            three_month_history = product_history[
-                (product_history['MonthStart'] >= (target_month_start - pd.DateOffset(months=3))) &
-                (product_history['MonthStart'] < target_month_start)
-            ]['Units Sold']
-            feature_row['UnitsSold_roll_mean_3_month'] = three_month_history.mean() if not three_month_history.empty else 0
-            feature_row['UnitsSold_roll_std_3_month'] = three_month_history.std() if not three_month_history.empty and len(three_month_history) > 1 else 0
-            
-            six_month_history = product_history[
-                (product_history['MonthStart'] >= (target_month_start - pd.DateOffset(months=6))) &
-                (product_history['MonthStart'] < target_month_start)
-            ]['Units Sold']
-            feature_row['UnitsSold_roll_mean_6_month'] = six_month_history.mean() if not six_month_history.empty else 0
-            feature_row['UnitsSold_roll_max_6_month'] = six_month_history.max() if not six_month_history.empty else 0
-            
-            twelve_month_history = product_history[
-                (product_history['MonthStart'] >= (target_month_start - pd.DateOffset(months=12))) &
-                (product_history['MonthStart'] < target_month_start)
-            ]['Units Sold']
-            feature_row['UnitsSold_roll_mean_12_month'] = twelve_month_history.mean() if not twelve_month_history.empty else 0
-            
-            if len(product_history) >= 2:
-                sorted_history = product_history.sort_values('MonthStart', ascending=False)
-                latest_val = sorted_history.iloc[0]['Units Sold']
-                prev_val = sorted_history.iloc[1]['Units Sold']
-                mom_change = (latest_val - prev_val) / prev_val if prev_val > 0 else 0
-                feature_row['UnitsSold_mom_change'] = mom_change
-                feature_row['UnitsSold_mom_change_lag1'] = sorted_history.iloc[1].get('UnitsSold_mom_change', 0)
-            else:
-                feature_row['UnitsSold_mom_change'] = 0
-                feature_row['UnitsSold_mom_change_lag1'] = 0
-                
-            if len(product_history) >= 4:
-                sorted_history = product_history.sort_values('MonthStart', ascending=False)
-                latest_val = sorted_history.iloc[0]['Units Sold']
-                three_months_ago_val = sorted_history.iloc[3]['Units Sold']
-                qoq_change = (latest_val - three_months_ago_val) / three_months_ago_val if three_months_ago_val > 0 else 0
-                feature_row['UnitsSold_qoq_change'] = qoq_change
-            else:
-                feature_row['UnitsSold_qoq_change'] = 0
-                
-            if 'Inventory Level' in row:
-                feature_row['Inventory_Level_current'] = row['Inventory Level']
-            else:
-                feature_row['Inventory_Level_current'] = 0
-                
-            if 'Units Sold' in row and row['Units Sold'] > 0 and 'Inventory Level' in row:
-                feature_row['Inventory_to_Sales_Ratio'] = row['Inventory Level'] / row['Units Sold']
-            else:
-                feature_row['Inventory_to_Sales_Ratio'] = 0
-            
-            target_month = target_month_start.month
-            target_year = target_month_start.year
-            target_quarter = (target_month - 1) // 3 + 1
-            
-            high_season_months = [11, 12, 1, 7]
-            is_high_season = 1 if target_month in high_season_months else 0
-            
-            feature_row['next_month_Month'] = target_month
-            feature_row['next_month_Year'] = target_year
-            feature_row['next_month_Quarter'] = target_quarter
-            feature_row['next_month_IsHighSeason'] = is_high_season
-            
-            for col_base in ['Demand Forecast', 'Price', 'Discount', 'Weather Condition', 'Holiday/Promotion', 'Seasonality']:
-                if col_base in row:
-                    feature_row[f'{col_base}_next_month'] = row[col_base]
-            
-            feature_rows.append(feature_row)
+        offsets = month_index([target_month_start])[0] - month_index(history['MonthStart'])
+        lag_starts = np.array(
+            [(target_month_start - pd.DateOffset(months=i)).replace(day=1) for i in range(13)],
+            dtype='datetime64[ns]'
+        )
+        exact = history['MonthStart'].to_numpy(dtype='datetime64[ns]') == lag_starts[np.clip(offsets, 0, 12)]
+        matrix = build_history_matrix(codes, offsets, units, n_products, 12, exact=exact)
         
-        X_base = pd.DataFrame(feature_rows)
+        lag_dtype = history['Units Sold'].dtype if n_products else np.float64
+        if not np.issubdtype(lag_dtype, np.number):
+            lag_dtype = np.float64
         
-        if self.encoder is not None:
-            cat_cols = self.feature_info.get('categorical_columns', [])
-            cat_cols = [col for col in cat_cols if col in X_base.columns]
-            
-            num_cols = [col for col in X_base.columns if col not in cat_cols]
-            X_num = X_base[num_cols].copy()
-            
-            for col in X_num.select_dtypes(include=np.number).columns:
-                if X_num[col].isnull().any():
-                    X_num[col] = X_num[col].fillna(X_num[col].median() if not X_num[col].empty else 0)
-            
-            if cat_cols:
-                X_cat = X_base[cat_cols].copy()
-                for col in cat_cols:
-                    X_cat[col] = X_cat[col].astype(str).fillna('Missing')
-                
-                X_cat_encoded = self.encoder.transform(X_cat)
-                
-                cat_feature_names = self.encoder.get_feature_names_out(cat_cols)
-                
-                X_cat_df = pd.DataFrame(X_cat_encoded, columns=cat_feature_names, index=X_num.index)
-                
-                X = pd.concat([X_num, X_cat_df], axis=1)
+        features = {}
+        
+        for col in static_cat_features:
+            if col in monthly_latest.columns:
+                features[col] = monthly_latest[col].to_numpy()
             else:
-                X = X_num
-            
-            X = X.fillna(0)
-            
-            for col in self.processed_feature_columns:
-                if col not in X.columns:
-                    X[col] = 0
-            
-            X = X[self.processed_feature_columns]
+                features[col] = np.full(n_products, 'Missing', dtype=object)
+        
+        for i in range(1, 13):
+            features[f'UnitsSold_lag_{i}_month'] = matrix.lag(i).astype(lag_dtype)
+        
+        features['UnitsSold_same_month_last_year'] = matrix.lag(12).astype(lag_dtype)
+        
+        features['UnitsSold_roll_mean_3_month'] = matrix.window_mean(3)
+        features['UnitsSold_roll_std_3_month'] = matrix.window_std(3)
+        features['UnitsSold_roll_mean_6_month'] = matrix.window_mean(6)
+        features['UnitsSold_roll_max_6_month'] = matrix.window_max(6)
+        features['UnitsSold_roll_mean_12_month'] = matrix.window_mean(12)
+        
+        # Change features compare the most recent months on record, not months relative to the target
+        latest, history_length = latest_values(
+            codes, history['MonthStart'].to_numpy(dtype='datetime64[ns]'), units, n_products, 4
+        )
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mom_change = np.where(latest[:, 1] > 0, (latest[:, 0] - latest[:, 1]) / latest[:, 1], 0.0)
+            qoq_change = np.where(latest[:, 3] > 0, (latest[:, 0] - latest[:, 3]) / latest[:, 3], 0.0)
+        features['UnitsSold_mom_change'] = np.where(history_length >= 2, mom_change, 0.0)
+        if 'UnitsSold_mom_change' in history.columns:
+            previous_change, _ = latest_values(
+                codes, history['MonthStart'].to_numpy(dtype='datetime64[ns]'),
+                history['UnitsSold_mom_change'].to_numpy(dtype=np.float64), n_products, 2
+            )
+            features['UnitsSold_mom_change_lag1'] = np.where(history_length >= 2, previous_change[:, 1], 0.0)
+        else:
+            features['UnitsSold_mom_change_lag1'] = np.zeros(n_products)
+        features['UnitsSold_qoq_change'] = np.where(history_length >= 4, qoq_change, 0.0)
+        
+        if 'Inventory Level' in monthly_latest.columns:
+            inventory = monthly_latest['Inventory Level'].to_numpy()
+            features['Inventory_Level_current'] = inventory
+        else:
+            features['Inventory_Level_current'] = np.zeros(n_products, dtype=np.int64)
+        
+        if 'Units Sold' in monthly_latest.columns and 'Inventory Level' in monthly_latest.columns:
+            latest_units = monthly_latest['Units Sold'].to_numpy(dtype=np.float64)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                features['Inventory_to_Sales_Ratio'] = np.where(
+                    latest_units > 0, inventory.astype(np.float64) / latest_units, 0.0
+                )
         else:
-            for col in X_base.select_dtypes(include=np.number).columns:
-                if X_base[col].isnull().any():
-                    X_base[col] = X_base[col].fillna(X_base[col].median() if not X_base[col].empty else 0)
-            X = X_base
+            features['Inventory_to_Sales_Ratio'] = np.zeros(n_products)
+        
+        target_month = target_month_start.month
+        target_year = target_month_start.year
+        target_quarter = (target_month - 1) // 3 + 1
+        
+        high_season_months = [11, 12, 1, 7]
+        is_high_season = 1 if target_month in high_season_months else 0
+        
+        features['next_month_Month'] = np.full(n_products, target_month)
+        features['next_month_Year'] = np.full(n_products, target_year)
+        features['next_month_Quarter'] = np.full(n_products, target_quarter)
+        features['next_month_IsHighSeason'] = np.full(n_products, is_high_season)
+        
+        for col_base in ['Demand Forecast', 'Price', 'Discount', 'Weather Condition', 'Holiday/Promotion', 'Seasonality']:
+            if col_base in monthly_latest.columns:
+                features[f'{col_base}_next_month'] = monthly_latest[col_base].to_numpy()
+        
+        if self.encoding_plan is not None:
+            return self.encoding_plan.encode(features, n_products)
+        
+        # Without an encoder the features are passed on unencoded
+        X = pd.DataFrame(features)
+        for col in X.select_dtypes(include=np.number).columns:
+            if X[col].isnull().any():
+                X[col] = X[col].fillna(X[col].median() if not X[col].empty else 0)
         
         return X
     
@@ -308,7 +319,13 @@ class MonthlyModel:
         if self.model is None:
             raise ValueError("Model not loaded")
         
-        predictions = self.model.predict(X)
+        predictions = predict_trees(self, X)
         return np.maximum(0, predictions)
 
-monthly_model = MonthlyModel()
\ No newline at end of file
+
+def __getattr__(name):
+    # The shared instance comes from the model registry, so importing this module does not load the model
+    if name == 'monthly_model':
+        from .registry import model_registry
+        return model_registry.get('monthly')
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,24 +3,51 @@ import pickle
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from .daily_model import daily_model
-from .weekly_model import weekly_model
-from .monthly_model import monthly_model
-from ..models import Products, SalesRecords
+from .registry import model_registry
+from .batching import forecast_batcher
+from .daily_sales import SOURCE_DAILY, daily_sales, history_row, history_source
+from .forecast_cache import forecast_cache
+from .forecast_result import PERIOD_DAYS, ForecastResult
+from .inference import InferenceUnavailable, fallback_enabled, inference_client, serving_model_version
+from .timing import stage
+from ..models import DailyProductSales, Products, SalesRecords
 from django.db.models import Sum, Count
+from django.utils import timezone
+from datetime import timedelta
 
 MODEL_DIR = Path(__file__).resolve().parent / "models"
 
+# The 30-day average of daily units, scaled to each horizon, is the "Demand Forecast" feature
+DEMAND_SCALE_FACTORS = {
+    "daily": 1.5,
+    "weekly": 7.5,
+    "monthly": 30
+}
+
+HISTORY_COLUMNS = [
+    "Date", "Store ID", "Product ID", "Category", "Inventory Level", "Units Sold", "Price",
+    "Discount", "Weather Condition", "Holiday/Promotion", "Seasonality", "Demand Forecast"
+]
+
+
+def _as_date(value):
+    """
+    Normalise a date, datetime, Timestamp or YYYY-MM-DD string to a date
+    """
+    if isinstance(value, str):
+        return pd.to_datetime(value).date()
+    if hasattr(value, 'date'):
+        return value.date()
+    return value
+
 class MultiModelPredictor:    
     """
     A class that manages multiple prediction models (daily, weekly, monthly)
     and handles predictions based on the specified time-horizon.
     """
     def __init__(self):
-        self.models = {
-            "daily": daily_model,
-            "weekly": weekly_model,
-            "monthly": monthly_model        }
+        # Models are loaded on first use; see api.ml_models.registry
+        self.models = model_registry
     def _calculate_simple_moving_average(self, product_id, reference_date, days=30):
         """
         Calculate moving average
@@ -33,29 +60,70 @@ class MultiModelPredictor:
         Returns:
             float: Moving average
         """
-        from datetime import timedelta
+        return self._calculate_moving_averages([product_id], reference_date, days)[product_id]
+    
+    def _calculate_moving_averages(self, product_ids, reference_date, days=30):
+        """
+        Calculate moving averages for many products with one grouped query
+        
+        Args:
+            product_ids: Product IDs to calculate for, or None for every product with sales
+            reference_date: Reference date for calculation (exclusive end of the window)
+            days: Number of days to look back for moving average
+            
+        Returns:
+            dict: Product ID -> moving average (0.0 for products without sales)
+        """
+        reference_date = _as_date(reference_date)
+        start_date = reference_date - timedelta(days=days)
         
-        if isinstance(reference_date, str):
-            reference_date = pd.to_datetime(reference_date).date()
-        elif hasattr(reference_date, 'date'):
-            reference_date = reference_date.date()
+        if history_source() == SOURCE_DAILY:
+            sales = DailyProductSales.objects.filter(date__gte=start_date, date__lt=reference_date)
+            units_field = 'units_sold'
+        else:
+            sales = SalesRecords.objects.filter(
+                transaction_date__date__gte=start_date,
+                transaction_date__date__lt=reference_date
+            )
+            units_field = 'quantity_sold'
+        if product_ids is not None:
+            sales = sales.filter(product_id__in=product_ids)
+        totals = sales.values('product_id').annotate(total=Sum(units_field)).order_by()
+        
+        moving_averages = {product_id: 0.0 for product_id in (product_ids or [])}
+        for row in totals:
+            moving_averages[row['product_id']] = round((row['total'] or 0) / days, 2)
+        return moving_averages
+    
+    def _moving_averages_from_history(self, history, reference_date, days=30):
+        """
+        Calculate moving averages from an already fetched history frame
         
-        end_date = reference_date
-        start_date = end_date - timedelta(days=days)
+        Args:
+            history: DataFrame with 'Date', 'Product ID' and 'Units Sold' columns
+            reference_date: Reference date for calculation (exclusive end of the window)
+            days: Number of days to look back for moving average
+            
+        Returns:
+            dict: Product ID -> moving average for products with sales in the window
+        """
+        if history.empty:
+            return {}
         
-        total_sales = SalesRecords.objects.filter(
-            product_id=product_id,
-            transaction_date__date__gte=start_date,
-            transaction_date__date__lt=end_date
-        ).aggregate(total=Sum('quantity_sold'))['total'] or 0
+        end_date = pd.Timestamp(_as_date(reference_date))
+        dates = pd.to_datetime(history['Date'])
+        window = history[(dates >= end_date - pd.Timedelta(days=days)) & (dates < end_date)]
+        totals = window.groupby('Product ID')['Units Sold'].sum()
         
-        moving_average = total_sales / days
-        return round(moving_average, 2)
+        return {product_id: round(total / days, 2) for product_id, total in totals.items()}
     
     def get_product_data(self, product_ids, days_history=90, time_horizon="daily"):
         """
         Collect product data from Django models for the specified products
         
+        History comes from DailyProductSales (one row per product and day) or,
+        with SALES_HISTORY_SOURCE = "transactions", from the raw SalesRecords.
+        
         Args:
             product_ids: List of product IDs to collect data for
             days_history: Number of days of historical data to collect
@@ -64,37 +132,68 @@ class MultiModelPredictor:
         Returns:
             pandas.DataFrame: Product data
         """
-        products = Products.objects.select_related("category").filter(product_id__in=product_ids)
-        if not products:
-            raise ValueError(f"No products found with IDs: {product_ids}")
+        with stage("fetch"):
+            products = Products.objects.select_related("category").filter(product_id__in=product_ids)
+            if not products:
+                raise ValueError(f"No products found with IDs: {product_ids}")
+            
+            # Today in TIME_ZONE, the day the forecast cache and snapshots are keyed by
+            end_date = pd.Timestamp(timezone.localdate())
+            start_date = end_date - pd.Timedelta(days=days_history)
+            
+            if history_source() == SOURCE_DAILY:
+                data_rows = self._daily_history_rows(products, product_ids, start_date, end_date)
+            else:
+                data_rows = self._transaction_history_rows(product_ids, start_date, end_date)
+        
+        scale_factor = DEMAND_SCALE_FACTORS.get(time_horizon, 1)
+        sold_products = set(row["Product ID"] for row in data_rows)
+        for product in products:
+            if product.product_id not in sold_products:
+                placeholder_row = {
+                    "Date": end_date.date(),
+                    "Store ID": 1,
+                    "Product ID": product.product_id,
+                    "Category": product.category.name if product.category else "Unknown",
+                    "Inventory Level": product.current_stock,
+                    "Units Sold": 0,
+                    "Price": product.unit_price,
+                    "Discount": 0,
+                    "Weather Condition": "Normal",
+                    "Holiday/Promotion": 0,
+                    "Seasonality": "Regular",
+                    "Demand Forecast": 0.0,
+                }
+                data_rows.append(placeholder_row)
         
-        end_date = pd.Timestamp.now().normalize()
-        start_date = end_date - pd.Timedelta(days=days_history)
+        df = pd.DataFrame(data_rows, columns=HISTORY_COLUMNS)
+        
+        # The 30-day window lies inside the fetched history, so no extra queries are needed
+        with stage("moving_average"):
+            if days_history >= 30:
+                daily_averages = self._moving_averages_from_history(df, end_date)
+            else:
+                daily_averages = self._calculate_moving_averages(product_ids, end_date)
+        
+        df["Demand Forecast"] = df["Product ID"].map(daily_averages).fillna(0.0) * scale_factor
+        
+        df["Date"] = pd.to_datetime(df["Date"])
+        df = df.sort_values(by=["Product ID", "Date"])
         
+        return df
+    
+    def _transaction_history_rows(self, product_ids, start_date, end_date):
+        """
+        History rows with one row per sale, read from SalesRecords
+        """
         sales_query = SalesRecords.objects.select_related("product", "product__category").filter(
             product__product_id__in=product_ids,
             transaction_date__date__gte=start_date.date(),
             transaction_date__date__lte=end_date.date()
         ).order_by("transaction_date")
         data_rows = []
-        product_demand_forecasts = {}
-        
-        scale_factor = {
-            "daily": 1.5,
-            "weekly": 7.5,
-            "monthly": 30
-        }.get(time_horizon, 1)
-        
-        for product in products:
-            daily_average = self._calculate_simple_moving_average(
-                product.product_id, end_date.date()
-            )
-            scaled_forecast = daily_average * scale_factor
-            product_demand_forecasts[product.product_id] = scaled_forecast
         
         for sale in sales_query:
-            demand_forecast = product_demand_forecasts.get(sale.product.product_id, 0.0)
-            
             row = {
                 "Date": sale.transaction_date.date(),
                 "Store ID": 1,
@@ -107,37 +206,22 @@ class MultiModelPredictor:
                 "Weather Condition": "Normal",
                 "Holiday/Promotion": 1 if sale.promotion_marker else 0,
                 "Seasonality": "Regular",
-                "Demand Forecast": demand_forecast
+                "Demand Forecast": 0.0,
             }
             data_rows.append(row)
-        
-        df = pd.DataFrame(data_rows)
-        for product in products:
-            if product.product_id not in df["Product ID"].values:
-                demand_forecast = product_demand_forecasts.get(product.product_id, 0.0)
-                
-                placeholder_row = {
-                    "Date": end_date.date(),
-                    "Store ID": 1,
-                    "Product ID": product.product_id,
-                    "Category": product.category.name if product.category else "Unknown",
-                    "Inventory Level": product.current_stock,
-                    "Units Sold": 0,
-                    "Price": product.unit_price,
-                    "Discount": 0,
-                    "Weather Condition": "Normal",
-                    "Holiday/Promotion": 0,
-                    "Seasonality": "Regular",
-                    "Demand Forecast": demand_forecast
-                }
-                df = pd.concat([df, pd.DataFrame([placeholder_row])], ignore_index=True)
-        
-        df["Date"] = pd.to_datetime(df["Date"])
-        df = df.sort_values(by=["Product ID", "Date"])
-        
-        return df
+        return data_rows
     
-    def predict_future_sales(self, product_ids, time_horizon="daily", n_periods=1, last_date=None):
+    def _daily_history_rows(self, products, product_ids, start_date, end_date):
+        """
+        History rows with one row per product and day, read from DailyProductSales
+        """
+        products_by_id = {product.product_id: product for product in products}
+        return [
+            history_row(day, products_by_id[day["product_id"]])
+            for day in daily_sales(product_ids, start_date.date(), end_date.date())
+        ]
+    
+    def forecast(self, product_ids, time_horizon="daily", n_periods=1, last_date=None):
         """
         Make predictions using the specified model type
         
@@ -148,7 +232,7 @@ class MultiModelPredictor:
             last_date (str): The last known date in YYYY-MM-DD format
             
         Returns:
-            DataFrame with predictions
+            ForecastResult: Predictions of every product and period
         """
         if time_horizon not in self.models:
             raise ValueError(f"Model for {time_horizon} predictions not available")
@@ -158,45 +242,111 @@ class MultiModelPredictor:
             raise ValueError(f"Model for {time_horizon} predictions not available")
         product_data = self.get_product_data(product_ids, time_horizon=time_horizon)
         
-        target_date = pd.to_datetime(last_date) if last_date else None
+        last_known = pd.to_datetime(last_date) if last_date else pd.Timestamp(timezone.localdate())
+        dates = self.forecast_dates(last_known, time_horizon, n_periods)
         
-        dates = []
-        if target_date is None:
-            target_date = pd.Timestamp.now().normalize()
-            
-        if time_horizon == "daily":
-            for i in range(n_periods):
-                dates.append(target_date + pd.Timedelta(days=i+1))
-        elif time_horizon == "weekly":
-            for i in range(n_periods):
-                dates.append(target_date + pd.Timedelta(weeks=i+1))
-        elif time_horizon == "monthly":
-            for i in range(n_periods):
-                dates.append(target_date + pd.Timedelta(days=(i+1)*30))
-                
-        features = model.prepare_features(product_data, target_date)
-        
-        predictions = None
         try:
-            predictions = model.predict(features)
+            forecast_ids, predictions = self.recursive_forecast(time_horizon, product_data, dates, model=model)
         except Exception as e:
             print(f"Error making predictions with {time_horizon} model: {str(e)}")
             raise
         
-        results = []
-        if predictions is not None:
-            prediction_per_period = predictions / n_periods
+        return ForecastResult(time_horizon, getattr(model, "model_version", None), forecast_ids, dates, predictions)
+    
+    def predict_future_sales(self, product_ids, time_horizon="daily", n_periods=1, last_date=None):
+        """
+        Make predictions using the specified model type, as a DataFrame
+        
+        Args:
+            product_ids (list): List of product IDs to predict
+            time_horizon (str): "daily", "weekly", or "monthly"
+            n_periods (int): Number of periods to predict
+            last_date (str): The last known date in YYYY-MM-DD format
+            
+        Returns:
+            DataFrame with one row per product and date (see ForecastResult.to_frame)
+        """
+        return self.forecast(product_ids, time_horizon, n_periods, last_date).to_frame()
+    
+    def forecast_dates(self, last_known, time_horizon, n_periods):
+        """
+        Dates of the forecast periods following the last known date
+        
+        Args:
+            last_known: Last known date
+            time_horizon: "daily", "weekly" or "monthly"
+            n_periods: Number of periods to forecast
+            
+        Returns:
+            list: One Timestamp per period
+        """
+        last_known = pd.Timestamp(last_known).normalize()
+        if time_horizon == "daily":
+            step = lambda i: pd.Timedelta(days=i)
+        elif time_horizon == "weekly":
+            step = lambda i: pd.Timedelta(weeks=i)
+        else:
+            # Calendar months, so no month is skipped or repeated at the month boundaries
+            step = lambda i: pd.DateOffset(months=i)
+        return [last_known + step(i + 1) for i in range(n_periods)]
+    
+    def recursive_forecast(self, time_horizon, product_data, dates, model=None):
+        """
+        Forecast several periods ahead by feeding every step's predictions back as history
+        
+        Each step builds the features of all products at once and makes a single
+        model call, after which the predictions are appended to the history as
+        that period's units sold, so the next step sees them as its lag features.
+        The cost grows linearly with the number of steps.
+        
+        Args:
+            time_horizon: "daily", "weekly" or "monthly"
+            product_data: Daily history as returned by get_product_data
+            dates: Forecast dates, one per step (see forecast_dates)
+            model: Model to use; defaults to the one currently serving the horizon.
+                Every step uses the same model even if it is reloaded meanwhile.
             
-            for product_idx, product_id in enumerate(product_ids):
-                for date_idx, date in enumerate(dates):
-                    results.append({
-                        "Date": date.strftime("%Y-%m-%d"),
-                        "Product_ID": product_id,
-                        "Predicted_Units_Sold": float(prediction_per_period[product_idx]),
-                        "Model_Type": time_horizon
-                    })
-        
-        return pd.DataFrame(results)
+        Returns:
+            tuple: (product IDs in sorted order, n_products x n_steps array of predictions)
+        """
+        model = model or self.models[time_horizon]
+        history = product_data.copy()
+        history["Date"] = pd.to_datetime(history["Date"])
+        
+        # The feature builders emit one row per product in sorted Product ID order
+        template = history.sort_values(["Product ID", "Date"]).groupby("Product ID", sort=True).last().reset_index()
+        forecast_ids = template["Product ID"].to_numpy()
+        template = template[history.columns]
+        if "Holiday/Promotion" in template.columns:
+            template["Holiday/Promotion"] = 0
+        
+        predictions = np.zeros((len(forecast_ids), len(dates)))
+        fed_back = []
+        for step, date in enumerate(dates):
+            period_start = self._period_start(date, time_horizon)
+            step_history = pd.concat([history] + fed_back, ignore_index=True) if fed_back else history
+            with stage("features"):
+                features = model.prepare_features(step_history, period_start)
+            with stage("predict"):
+                predictions[:, step] = model.predict(features)
+            
+            if step + 1 < len(dates):
+                step_rows = template.copy()
+                step_rows["Date"] = period_start
+                step_rows["Units Sold"] = predictions[:, step]
+                fed_back.append(step_rows)
+        
+        return forecast_ids, predictions
+    
+    def _period_start(self, date, time_horizon):
+        """
+        First day of the period a forecast date falls in
+        """
+        if time_horizon == "weekly":
+            return date - pd.Timedelta(days=date.dayofweek)
+        if time_horizon == "monthly":
+            return date.replace(day=1)
+        return date
 
 predictor = MultiModelPredictor()
 
@@ -204,6 +354,19 @@ def get_product_sales_prediction(product_ids, time_horizon="weekly", periods=1,
     """
     Get sales predictions for products
     
+    Forecasts already in the forecast cache are reused per product, so only
+    products without a fresh entry are forecast. Cache entries belong to the
+    model version that computed them, so a reloaded model never serves
+    forecasts of its predecessor. The cache is read and written here, in the
+    process that also receives the invalidations of api.signals, even when
+    the forecasts themselves come from the inference workers.
+    
+    With settings.ML_INFERENCE_ADDRESS set, the missing products are sent to
+    the inference worker pool (see api.ml_models.inference) so the web process
+    does not hold the GIL while features are built. If the pool cannot be
+    reached and ML_INFERENCE_FALLBACK is on, they are forecast in this
+    process instead.
+    
     Args:
         product_ids (list): List of product IDs
         time_horizon (str): "daily", "weekly" or "monthly"
@@ -211,26 +374,76 @@ def get_product_sales_prediction(product_ids, time_horizon="weekly", periods=1,
         last_date (str): Last known date in YYYY-MM-DD format
         
     Returns:
-        dict or DataFrame: Prediction results
+        list or dict: One summary record per product (dicts with Product_ID,
+        Model_Type, Model_Version, Total_Predicted_Units_Sold, Forecast_Periods
+        and Actual_Forecast_Days), or {"error": ...} on failure
     """
     try:
-        predictions_df = predictor.predict_future_sales(
-            product_ids=product_ids,
-            time_horizon=time_horizon,
-            n_periods=periods,
-            last_date=last_date
-        )
-        
-        if predictions_df.empty:
-            return {"error": "No predictions could be generated"}
+        model_version = serving_model_version(time_horizon)
+        cached, missing_keys = forecast_cache.lookup(product_ids, time_horizon, periods, last_date, model_version)
+        records = list(cached.values())
         
-        summary_df = summarize_predictions(predictions_df)
+        if missing_keys:
+            computed = _forecast_records(list(missing_keys), time_horizon, periods, last_date)
+            # Workers may already serve a model the version check above has not seen yet
+            forecast_cache.store(
+                [record for record in computed if record.get("Model_Version") == model_version],
+                missing_keys
+            )
+            records.extend(computed)
         
-        return summary_df.to_dict(orient="records")
+        if not records:
+            return {"error": "No predictions could be generated"}
+        
+        return sorted(records, key=lambda record: record["Product_ID"])
     except Exception as e:
         print(f"Error making prediction: {e}")
         return {"error": str(e)}
 
+def _forecast_records(product_ids, time_horizon, periods, last_date):
+    """
+    Summary records of the given products from the inference workers, or from this process
+    """
+    client = inference_client()
+    if client is not None:
+        try:
+            with stage("inference"):
+                return client.forecast(product_ids, time_horizon, periods, last_date)
+        except InferenceUnavailable as e:
+            if not fallback_enabled():
+                raise
+            print(f"Inference server unavailable, forecasting in-process: {e}")
+    
+    return compute_product_sales_prediction(product_ids, time_horizon, periods, last_date)
+
+def compute_product_sales_prediction(product_ids, time_horizon="weekly", periods=1, last_date=None):
+    """
+    Forecast products in this process, without the forecast cache
+    
+    The products share one model call with concurrent requests for the same
+    horizon (see api.ml_models.batching). The inference workers answer with
+    this; get_product_sales_prediction adds the cache around it.
+    
+    Args:
+        product_ids (list): List of product IDs
+        time_horizon (str): "daily", "weekly" or "monthly"
+        periods (int): Number of periods to predict
+        last_date (str): Last known date in YYYY-MM-DD format
+        
+    Returns:
+        list: Summary records of the products that could be forecast, in no particular order
+    """
+    result = forecast_batcher.predict(
+        product_ids=list(product_ids),
+        time_horizon=time_horizon,
+        n_periods=periods,
+        last_date=last_date
+    )
+    if not len(result):
+        return []
+    with stage("summarize"):
+        return result.summary_records()
+
 def summarize_predictions(predictions_df):
     """
     Summarize predictions by product
@@ -247,19 +460,19 @@ def summarize_predictions(predictions_df):
     predictions_df["Predicted_Units_Sold"] = pd.to_numeric(predictions_df["Predicted_Units_Sold"], errors="coerce")
     predictions_df.dropna(subset=["Predicted_Units_Sold"], inplace=True)
     
-    summary = predictions_df.groupby(["Product_ID", "Model_Type"], as_index=False)["Predicted_Units_Sold"].sum()
+    group_columns = ["Product_ID", "Model_Type"]
+    if "Model_Version" in predictions_df.columns:
+        group_columns.append("Model_Version")
+    
+    summary = predictions_df.groupby(group_columns, as_index=False, dropna=False)["Predicted_Units_Sold"].sum()
     summary.rename(columns={"Predicted_Units_Sold": "Total_Predicted_Units_Sold"}, inplace=True)
     
-    period_counts = predictions_df.groupby(["Product_ID", "Model_Type"], as_index=False)["Date"].nunique()
+    period_counts = predictions_df.groupby(group_columns, as_index=False, dropna=False)["Date"].nunique()
     period_counts.rename(columns={"Date": "Forecast_Periods"}, inplace=True)
     
-    result = pd.merge(summary, period_counts, on=["Product_ID", "Model_Type"], how="left")
+    result = pd.merge(summary, period_counts, on=group_columns, how="left")
     
-    result["Actual_Forecast_Days"] = result.apply(
-        lambda row: row["Forecast_Periods"] * (1 if row["Model_Type"] == "daily" else 
-                                              7 if row["Model_Type"] == "weekly" else 30), 
-        axis=1
-    )
+    result["Actual_Forecast_Days"] = result["Forecast_Periods"] * result["Model_Type"].map(PERIOD_DAYS).fillna(30).astype(int)
     
     result["Total_Predicted_Units_Sold"] = result["Total_Predicted_Units_Sold"].round(0).astype(int)
     
@@ -0,0 +1,251 @@
+import importlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from .artifacts import model_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Horizon -> (module, class) of the model wrapper, imported only when first needed
+MODEL_CLASSES = {
+    "daily": ("api.ml_models.daily_model", "DailyModel"),
+    "weekly": ("api.ml_models.weekly_model", "WeeklyModel"),
+    "monthly": ("api.ml_models.monthly_model", "MonthlyModel"),
+}
+
+
+class ModelRegistry:
+    """
+    Lazily loaded models, one per time horizon.
+
+    Nothing is imported or unpickled until a horizon is first requested, so
+    management commands that never forecast do not pay for pandas, xgboost or
+    the boosters. Loading is thread-safe: concurrent first requests for the
+    same horizon wait for a single load instead of each unpickling the model.
+
+    Models can be replaced while the process serves requests. reload() builds
+    the new model next to the old one and then swaps the reference, so callers
+    that already hold the old model finish with it and later calls get the new
+    one. With ML_MODELS_RELOAD_INTERVAL set, get() also checks the model files
+    at most that often and reloads retrained models in a background thread.
+
+    The registry behaves like a read-only mapping of horizon -> model, which is
+    what MultiModelPredictor.models used to be.
+    """
+    def __init__(self, model_classes=None, store_id=1):
+        self.model_classes = dict(model_classes or MODEL_CLASSES)
+        self.store_id = store_id
+        self._models = {}
+        self._load_times = {}
+        self._loaded_at = {}
+        self._fingerprints = {}
+        self._locks = {horizon: threading.Lock() for horizon in self.model_classes}
+        self._reload_lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._last_check = time.monotonic()
+
+    @property
+    def reload_interval(self):
+        return getattr(settings, 'ML_MODELS_RELOAD_INTERVAL', None)
+
+    def get(self, time_horizon):
+        """
+        Get the model for a time horizon, loading it on first use
+
+        Args:
+            time_horizon: "daily", "weekly" or "monthly"
+
+        Returns:
+            The model wrapper (DailyModel, WeeklyModel or MonthlyModel)
+        """
+        model = self._models.get(time_horizon)
+        if model is not None:
+            self._maybe_check_for_updates()
+            return model
+        if time_horizon not in self.model_classes:
+            raise KeyError(time_horizon)
+
+        with self._locks[time_horizon]:
+            model = self._models.get(time_horizon)
+            if model is None:
+                model, fingerprint, load_time = self._build(time_horizon)
+                self._install(time_horizon, model, fingerprint, load_time)
+        return model
+
+    def _build(self, time_horizon):
+        """
+        Import and instantiate the model wrapper of a horizon
+
+        Returns:
+            tuple: (model, fingerprint of its files taken before loading, load time)
+        """
+        started = time.perf_counter()
+        module_name, class_name = self.model_classes[time_horizon]
+        model_class = getattr(importlib.import_module(module_name), class_name)
+        fingerprint = model_fingerprint(time_horizon, self.store_id)
+        model = model_class()
+        return model, fingerprint, time.perf_counter() - started
+
+    def _install(self, time_horizon, model, fingerprint, load_time):
+        # A single dict assignment, so readers see either the old or the new model
+        self._models[time_horizon] = model
+        self._load_times[time_horizon] = load_time
+        self._loaded_at[time_horizon] = time.time()
+        self._fingerprints[time_horizon] = fingerprint
+        logger.info(
+            "Loaded %s model %s in %.3fs",
+            time_horizon, getattr(model, 'model_version', None), load_time
+        )
+
+    def reload(self, time_horizons=None):
+        """
+        Load fresh copies of the given horizons (all loaded ones by default) and swap them in
+
+        A horizon whose new model fails to load, or whose native artifact was
+        rejected (so the new model would be the fallback pickles), keeps
+        serving the old one.
+
+        Returns:
+            dict: Horizon -> model version now in use
+        """
+        with self._reload_lock:
+            if time_horizons is None:
+                time_horizons = [horizon for horizon in self.model_classes if horizon in self._models]
+            for time_horizon in time_horizons:
+                if time_horizon not in self.model_classes:
+                    raise KeyError(time_horizon)
+                model, fingerprint, load_time = self._build(time_horizon)
+                if getattr(model, 'model', None) is None:
+                    logger.error("Reloading the %s model failed, keeping the current one", time_horizon)
+                    continue
+                current = self._models.get(time_horizon)
+                if current is not None and getattr(model, 'artifact_error', None):
+                    logger.warning(
+                        "Rejected the new %s model artifact (%s), keeping model %s",
+                        time_horizon, model.artifact_error, getattr(current, 'model_version', None)
+                    )
+                    continue
+                with self._locks[time_horizon]:
+                    self._install(time_horizon, model, fingerprint, load_time)
+            return self.versions()
+
+    def check_for_updates(self):
+        """
+        Reload every loaded horizon whose model files changed on disk
+
+        Returns:
+            list: Horizons that were reloaded
+        """
+        self._last_check = time.monotonic()
+        changed = [
+            time_horizon for time_horizon, fingerprint in list(self._fingerprints.items())
+            if model_fingerprint(time_horizon, self.store_id) != fingerprint
+        ]
+        if changed:
+            self.reload(changed)
+        return changed
+
+    def _maybe_check_for_updates(self):
+        """
+        Start a background file check when the reload interval has passed
+        """
+        interval = self.reload_interval
+        if not interval or time.monotonic() - self._last_check < interval:
+            return
+        with self._check_lock:
+            # Claim the interval so concurrent requests start only one check
+            if time.monotonic() - self._last_check < interval:
+                return
+            self._last_check = time.monotonic()
+        threading.Thread(target=self._check_quietly, name='model-reload', daemon=True).start()
+
+    def _check_quietly(self):
+        try:
+            self.check_for_updates()
+        except Exception:
+            logger.exception("Checking for retrained models failed")
+
+    def preload(self, time_horizons=None):
+        """
+        Load the given horizons (all by default) now instead of on first use
+        """
+        for time_horizon in time_horizons or self.model_classes:
+            self.get(time_horizon)
+
+    def preload_if_configured(self):
+        """
+        Preload every horizon when settings.ML_MODELS_PRELOAD is set
+        """
+        if getattr(settings, 'ML_MODELS_PRELOAD', False):
+            self.preload()
+
+    def is_loaded(self, time_horizon):
+        return time_horizon in self._models
+
+    def version(self, time_horizon):
+        """
+        Version of the model currently serving a horizon, loading it if needed
+        """
+        return getattr(self.get(time_horizon), 'model_version', None)
+
+    def versions(self):
+        """
+        Versions of the loaded models by horizon
+        """
+        return {
+            time_horizon: getattr(model, 'model_version', None)
+            for time_horizon, model in list(self._models.items())
+        }
+
+    def load_times(self):
+        """
+        Seconds spent loading each horizon loaded so far
+        """
+        return dict(self._load_times)
+
+    def status(self):
+        """
+        Load state of every horizon, for monitoring
+        """
+        versions = self.versions()
+        return {
+            time_horizon: {
+                'loaded': time_horizon in versions,
+                'version': versions.get(time_horizon),
+                'load_time': self._load_times.get(time_horizon),
+                'loaded_at': self._loaded_at.get(time_horizon),
+            }
+            for time_horizon in self.model_classes
+        }
+
+    def unload(self, time_horizon=None):
+        """
+        Drop loaded models (all by default) so they are loaded again on next use
+        """
+        for horizon in [time_horizon] if time_horizon else list(self.model_classes):
+            with self._locks[horizon]:
+                self._models.pop(horizon, None)
+                self._load_times.pop(horizon, None)
+                self._loaded_at.pop(horizon, None)
+                self._fingerprints.pop(horizon, None)
+
+    def __getitem__(self, time_horizon):
+        return self.get(time_horizon)
+
+    def __contains__(self, time_horizon):
+        return time_horizon in self.model_classes
+
+    def __iter__(self):
+        return iter(self.model_classes)
+
+    def __len__(self):
+        return len(self.model_classes)
+
+    def keys(self):
+        return self.model_classes.keys()
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from .multi_model_predictor import HISTORY_COLUMNS
+
+CATEGORIES = ['Groceries', 'Furniture', 'Electronics', 'Toys', 'Clothing']
+
+
+def synthetic_history(n_products, n_days, end_date=None, seed=0):
+    """
+    Generate a daily sales history in the shape produced by MultiModelPredictor.get_product_data
+
+    Every product sells every day, with a weekly pattern on top of a
+    product-specific base level, so benchmarks and backtests do not depend on
+    the contents of the database.
+
+    Args:
+        n_products: Number of products (IDs P0001, P0002, ...)
+        n_days: Number of days of history per product
+        end_date: Last day of history (defaults to today)
+        seed: Random seed
+
+    Returns:
+        pandas.DataFrame: History sorted by Product ID and Date
+    """
+    rng = np.random.default_rng(seed)
+    end_date = pd.Timestamp(end_date or pd.Timestamp.now()).normalize()
+    dates = pd.date_range(end=end_date, periods=n_days, freq='D')
+
+    product_ids = np.array([f'P{i:04d}' for i in range(1, n_products + 1)])
+    base = rng.uniform(2, 40, size=n_products)
+    weekly = 1 + 0.3 * np.sin(2 * np.pi * dates.dayofweek.to_numpy() / 7)
+    units = rng.poisson(np.outer(base, weekly))
+
+    n_rows = n_products * n_days
+    df = pd.DataFrame({
+        'Date': np.tile(dates.to_numpy(), n_products),
+        'Store ID': 1,
+        'Product ID': np.repeat(product_ids, n_days),
+        'Category': np.repeat(np.array(CATEGORIES)[np.arange(n_products) % len(CATEGORIES)], n_days),
+        'Inventory Level': np.repeat(rng.integers(50, 500, size=n_products), n_days),
+        'Units Sold': units.ravel(),
+        'Price': np.repeat(rng.uniform(1, 100, size=n_products).round(2), n_days),
+        'Discount': rng.choice([0.0, 5.0, 10.0], size=n_rows),
+        'Weather Condition': 'Normal',
+        'Holiday/Promotion': (rng.random(n_rows) < 0.1).astype(int),
+        'Seasonality': 'Regular',
+        'Demand Forecast': np.repeat(base * 1.5, n_days),
+    })
+    return df[HISTORY_COLUMNS]
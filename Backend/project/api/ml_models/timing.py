@@ -0,0 +1,138 @@
+import threading
+from collections import deque
+from contextvars import ContextVar
+from time import perf_counter
+
+import numpy as np
+from django.conf import settings
+
+# Stages in the order they run and appear in the Server-Timing header
+STAGES = ('fetch', 'moving_average', 'features', 'predict', 'summarize', 'inference', 'serialize', 'total')
+PERCENTILES = (50, 95, 99)
+
+_current = ContextVar('forecast_stage_timings', default=None)
+
+
+class StageTimings:
+    """
+    Seconds spent per stage while handling one request
+
+    A stage entered several times (prepare_features once per forecast step)
+    accumulates.
+    """
+    __slots__ = ('seconds',)
+
+    def __init__(self):
+        self.seconds = {}
+
+    def add(self, name, elapsed):
+        self.seconds[name] = self.seconds.get(name, 0.0) + elapsed
+
+    def server_timing(self):
+        """
+        Server-Timing header value, e.g. "fetch;dur=12.3, predict;dur=4.1"
+        """
+        order = {name: index for index, name in enumerate(STAGES)}
+        names = sorted(self.seconds, key=lambda name: order.get(name, len(order)))
+        return ', '.join(f'{name};dur={self.seconds[name] * 1000:.1f}' for name in names)
+
+
+class _Stage:
+    __slots__ = ('name', 'timings', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.timings = _current.get()
+        if self.timings is not None:
+            self.started = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.timings is not None:
+            self.timings.add(self.name, perf_counter() - self.started)
+
+
+def stage(name):
+    """
+    Context manager adding the time spent in its block to the current request's timings
+
+    Outside a request being timed (management commands, worker processes)
+    it costs one context variable lookup.
+    """
+    return _Stage(name)
+
+
+class StageHistograms:
+    """
+    Rolling latency samples per stage, the last FORECAST_TIMING_WINDOW requests of each
+    """
+    def __init__(self, window=None):
+        self._window = window
+        self._lock = threading.Lock()
+        self._samples = {}
+        self.requests = 0
+
+    @property
+    def window(self):
+        if self._window is not None:
+            return self._window
+        return getattr(settings, 'FORECAST_TIMING_WINDOW', 1000)
+
+    def observe(self, timings):
+        with self._lock:
+            self.requests += 1
+            for name, elapsed in timings.seconds.items():
+                samples = self._samples.get(name)
+                if samples is None or samples.maxlen != self.window:
+                    samples = self._samples[name] = deque(samples or (), maxlen=self.window)
+                samples.append(elapsed * 1000)
+
+    def stats(self):
+        """
+        Sample count, mean and p50/p95/p99 in milliseconds of every stage seen
+        """
+        with self._lock:
+            samples = {name: np.fromiter(values, dtype=float) for name, values in self._samples.items()}
+            requests = self.requests
+        order = {name: index for index, name in enumerate(STAGES)}
+        stages = {}
+        for name in sorted(samples, key=lambda name: order.get(name, len(order))):
+            values = samples[name]
+            stages[name] = dict(
+                {'samples': len(values), 'mean_ms': round(float(values.mean()), 3)},
+                **{f'p{p}_ms': round(float(v), 3) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+            )
+        return {'window': self.window, 'requests': requests, 'stages': stages}
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self.requests = 0
+
+
+class record_timings:
+    """
+    Time the stages run inside the block and add them to the histograms
+
+    Used by api.middleware.ServerTimingMiddleware around every API request;
+    requests that run no timed stage are not recorded.
+    """
+    def __init__(self, histograms=None):
+        self.histograms = histograms or stage_histograms
+        self.timings = StageTimings()
+
+    def __enter__(self):
+        self._token = _current.set(self.timings)
+        self._started = perf_counter()
+        return self.timings
+
+    def __exit__(self, *exc_info):
+        _current.reset(self._token)
+        if self.timings.seconds:
+            self.timings.add('total', perf_counter() - self._started)
+            self.histograms.observe(self.timings)
+
+
+stage_histograms = StageHistograms()
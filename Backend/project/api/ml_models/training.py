@@ -0,0 +1,258 @@
+import math
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from ..models import Products
+from .daily_sales import daily_sales, history_row
+from .multi_model_predictor import DEMAND_SCALE_FACTORS, HISTORY_COLUMNS, predictor
+
+# Days of history the server fetches before a forecast (get_product_data's days_history)
+LOOKBACK_DAYS = 90
+
+
+class TrainingResult:
+    """
+    A model trained for one horizon, with everything save_artifact needs
+    """
+    def __init__(self, time_horizon, model, feature_info, encoder, metrics):
+        self.time_horizon = time_horizon
+        self.model = model
+        self.feature_info = feature_info
+        self.encoder = encoder
+        self.metrics = metrics
+
+    @property
+    def improved(self):
+        """
+        Whether the new model beats the current one on the validation periods
+        """
+        previous = self.metrics['previous_model']['validation']['mae']
+        return previous is None or self.metrics['validation']['mae'] <= previous
+
+
+def load_training_history(start_date, end_date, chunk_size=50000):
+    """
+    Daily sales history of every product, in the row format the server forecasts from
+
+    DailyProductSales rows are streamed from the database chunk_size at a
+    time and turned into a DataFrame per chunk, so a year of catalog-wide
+    history never exists as one list of dicts.
+
+    Args:
+        start_date: First day of history (inclusive)
+        end_date: Last day of history (inclusive)
+        chunk_size: Rows fetched and converted per chunk
+
+    Returns:
+        pandas.DataFrame: HISTORY_COLUMNS, ordered by date
+    """
+    products = Products.objects.select_related('category').in_bulk()
+    frames = []
+    rows = []
+    for day in daily_sales(start_date=start_date, end_date=end_date).iterator(chunk_size=chunk_size):
+        rows.append(history_row(day, products[day['product_id']]))
+        if len(rows) >= chunk_size:
+            frames.append(pd.DataFrame(rows, columns=HISTORY_COLUMNS))
+            rows = []
+    if rows or not frames:
+        frames.append(pd.DataFrame(rows, columns=HISTORY_COLUMNS))
+
+    history = pd.concat(frames, ignore_index=True)
+    history['Date'] = pd.to_datetime(history['Date'])
+    return history
+
+
+def period_end(period_start, time_horizon):
+    """
+    First day after the period starting at period_start
+    """
+    if time_horizon == 'weekly':
+        return period_start + pd.Timedelta(weeks=1)
+    if time_horizon == 'monthly':
+        return period_start + pd.DateOffset(months=1)
+    return period_start + pd.Timedelta(days=1)
+
+
+def training_periods(time_horizon, start_date, end_date):
+    """
+    Starts of the periods that lie entirely between two dates, inclusive
+
+    Args:
+        time_horizon: "daily", "weekly" (weeks start on Monday) or "monthly"
+        start_date: First day a period may start on
+        end_date: Last day a period may end on
+
+    Returns:
+        list: One Timestamp per period
+    """
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date)
+    if time_horizon == 'weekly':
+        starts = pd.date_range(start, end, freq='W-MON')
+    elif time_horizon == 'monthly':
+        starts = pd.date_range(start, end, freq='MS')
+    else:
+        starts = pd.date_range(start, end, freq='D')
+    return [period_start for period_start in starts if period_end(period_start, time_horizon) <= end + pd.Timedelta(days=1)]
+
+
+def walk_forward(time_horizon, history, periods, lookback_days=LOOKBACK_DAYS):
+    """
+    Replay history one period at a time, as a forecast made on each period's first day would see it
+
+    Every period gets the lookback_days of history before it, with the
+    scaled 30-day moving average as Demand Forecast like get_product_data
+    computes it, and the units each of those products sold during the period.
+
+    Args:
+        time_horizon: "daily", "weekly" or "monthly"
+        history: Daily history in get_product_data's shape, ordered by date
+        periods: Period starts (see training_periods)
+        lookback_days: Days of history before each period
+
+    Yields:
+        tuple: (index of the period, period start, history window, units sold
+        per product in sorted Product ID order); periods without history are skipped
+    """
+    dates = history['Date'].to_numpy()
+    scale_factor = DEMAND_SCALE_FACTORS.get(time_horizon, 1)
+    for index, period_start in enumerate(periods):
+        lo = dates.searchsorted(np.datetime64(period_start - pd.Timedelta(days=lookback_days)))
+        hi = dates.searchsorted(np.datetime64(period_start))
+        if lo == hi:
+            continue
+        end = dates.searchsorted(np.datetime64(period_end(period_start, time_horizon)))
+
+        window = history.iloc[lo:hi]
+        averages = predictor._moving_averages_from_history(window, period_start)
+        window = window.assign(**{'Demand Forecast': window['Product ID'].map(averages).fillna(0.0) * scale_factor})
+
+        # prepare_features emits one row per product in sorted Product ID order
+        product_ids = np.sort(window['Product ID'].unique())
+        sold = history.iloc[hi:end].groupby('Product ID')['Units Sold'].sum()
+        yield index, period_start, window, sold.reindex(product_ids, fill_value=0).to_numpy(dtype=float)
+
+
+def build_examples(model_wrapper, time_horizon, history, periods, lookback_days=LOOKBACK_DAYS):
+    """
+    Feature rows and labels of every product that has history before each period
+
+    Features are built by the model wrapper's own prepare_features from what
+    walk_forward replays, so training and serving cannot drift apart. The
+    label is the units sold during the period.
+
+    Args:
+        model_wrapper: DailyModel, WeeklyModel or MonthlyModel providing the feature layout
+        time_horizon: "daily", "weekly" or "monthly"
+        history: Daily history as returned by load_training_history
+        periods: Period starts (see training_periods)
+        lookback_days: Days of history each period's features are built from
+
+    Returns:
+        tuple: (features DataFrame, labels array, array with the index of each row's period)
+    """
+    features, labels, groups = [], [], []
+    for index, period_start, window, sold in walk_forward(time_horizon, history, periods, lookback_days):
+        features.append(model_wrapper.prepare_features(window, period_start))
+        labels.append(sold)
+        groups.append(np.full(len(sold), index))
+
+    if not features:
+        return pd.DataFrame(), np.zeros(0), np.zeros(0, dtype=int)
+    return pd.concat(features, ignore_index=True), np.concatenate(labels), np.concatenate(groups)
+
+
+def _errors(predictions, labels):
+    if len(labels) == 0:
+        return {'mae': None, 'rmse': None}
+    errors = np.asarray(predictions, dtype=float) - labels
+    return {
+        'mae': round(float(np.abs(errors).mean()), 4),
+        'rmse': round(float(np.sqrt((errors ** 2).mean())), 4),
+    }
+
+
+def train_horizon(model_wrapper, time_horizon, history, periods, n_jobs=1, n_estimators=1000,
+                  early_stopping_rounds=20, validation_fraction=0.2, lookback_days=LOOKBACK_DAYS):
+    """
+    Retrain one horizon's model on the given history
+
+    The new regressor keeps the current model's hyperparameters, feature
+    layout and encoder. The most recent validation_fraction of the periods
+    is held out, both for early stopping and to compare the new model with
+    the current one on the same rows.
+
+    Args:
+        model_wrapper: Currently serving DailyModel, WeeklyModel or MonthlyModel
+        time_horizon: "daily", "weekly" or "monthly"
+        history: Daily history as returned by load_training_history
+        periods: Period starts to build examples for, in date order
+        n_jobs: XGBoost threads for this horizon
+        n_estimators: Maximum number of boosting rounds
+        early_stopping_rounds: Rounds without validation improvement before stopping
+        validation_fraction: Share of the periods held out for validation
+        lookback_days: Days of history each period's features are built from
+
+    Returns:
+        TrainingResult
+
+    Raises:
+        ValueError: If the history yields too few periods to train and validate on
+    """
+    import xgboost
+
+    started = time.perf_counter()
+    X, y, groups = build_examples(model_wrapper, time_horizon, history, periods, lookback_days)
+    feature_time = time.perf_counter() - started
+
+    n_periods = len(np.unique(groups))
+    if n_periods < 2:
+        raise ValueError(f"{time_horizon}: {n_periods} period(s) with history, at least 2 are needed")
+    n_validation = min(max(1, math.ceil(n_periods * validation_fraction)), n_periods - 1)
+    first_validation = np.unique(groups)[-n_validation]
+    train, valid = groups < first_validation, groups >= first_validation
+
+    params = model_wrapper.model.get_params()
+    params.update(n_estimators=n_estimators, early_stopping_rounds=early_stopping_rounds, n_jobs=n_jobs)
+    model = xgboost.XGBRegressor(**params)
+
+    started = time.perf_counter()
+    model.fit(X[train], y[train], eval_set=[(X[valid], y[valid])], verbose=False)
+    fit_time = time.perf_counter() - started
+
+    encoder = model_wrapper.encoder_info if time_horizon == 'daily' else model_wrapper.encoder
+    metrics = {
+        'history_start': str(history['Date'].min().date()),
+        'history_end': str(history['Date'].max().date()),
+        'periods': n_periods,
+        'validation_periods': n_validation,
+        'train_rows': int(train.sum()),
+        'validation_rows': int(valid.sum()),
+        'n_estimators': n_estimators,
+        'best_iteration': int(model.best_iteration),
+        'n_jobs': n_jobs,
+        'timings': {
+            'features_seconds': round(feature_time, 3),
+            'fit_seconds': round(fit_time, 3),
+        },
+        'validation': _errors(np.maximum(0, model.predict(X[valid])), y[valid]),
+        'previous_model': {
+            'version': getattr(model_wrapper, 'model_version', None),
+            'validation': _errors(model_wrapper.predict(X[valid]), y[valid]),
+        },
+    }
+    return TrainingResult(time_horizon, model, model_wrapper.feature_info, encoder, metrics)
+
+
+def training_window(end_date, days, lookback_days=LOOKBACK_DAYS):
+    """
+    First day of history needed to train on the days up to end_date
+
+    Returns:
+        tuple: (first history day, first day a training period may start on)
+    """
+    first_period = end_date - timedelta(days=days - 1)
+    return first_period - timedelta(days=lookback_days), first_period
@@ -0,0 +1,232 @@
+import json
+import os
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ..models import DailyProductSales, PurchaseOrderItems, SalesRecords
+from .daily_sales import SOURCE_DAILY, history_source
+from .data_preparation import DataPreparation, load_training_data, training_dictionaries, training_writer
+
+WATERMARK_NAME = '_watermark.json'
+PARTITION_NAME = 'date={day}{suffix}'
+EMPTY_TOTALS = {'rows': 0, 'units': 0}
+FORMAT_SUFFIXES = {
+    'parquet': '.parquet',
+    'arrow': '.arrow',
+    'csv': '.csv',
+}
+
+
+class TrainingDataset:
+    """
+    Training data kept as one file per day and refreshed incrementally.
+
+    A watermark file next to the partitions records the last extracted day,
+    when the last refresh started and the rows and units sold of every day
+    (see partition_totals). A refresh appends only the days after the
+    watermark and drops days that fell out of the retention window. Days that
+    changed since the last refresh are extracted again:
+
+    - sales created or edited since then (SalesRecords.updated_at),
+    - days whose rows or units in the database no longer match the
+      partition, which catches deleted and moved sales,
+    - the 30 days following purchase orders created or edited since then,
+      as they feed Units_Ordered.
+
+    Rows carry the Demand Forecast as of the end of the run they were
+    extracted in, rather than one value for the whole range.
+    """
+    def __init__(self, path, file_format='parquet', preparation=None):
+        if file_format not in FORMAT_SUFFIXES:
+            raise ValueError(f"Unsupported training data format: {file_format}")
+        self.path = Path(path)
+        self.file_format = file_format
+        self.preparation = preparation or DataPreparation()
+
+    @property
+    def watermark_path(self):
+        return self.path / WATERMARK_NAME
+
+    def partition_path(self, day):
+        return self.path / PARTITION_NAME.format(day=day.isoformat(), suffix=FORMAT_SUFFIXES[self.file_format])
+
+    def read_watermark(self):
+        """
+        Returns:
+            dict or None: The watermark, or None before the first refresh
+        """
+        try:
+            watermark = json.loads(self.watermark_path.read_text())
+        except FileNotFoundError:
+            return None
+        if watermark.get('format') != self.file_format:
+            raise ValueError(f"{self.path} holds {watermark.get('format')} partitions, not {self.file_format}")
+        return watermark
+
+    def _write_watermark(self, watermark):
+        tmp_path = self.watermark_path.with_name(f'{WATERMARK_NAME}.tmp')
+        tmp_path.write_text(json.dumps(watermark, indent=2))
+        os.replace(tmp_path, self.watermark_path)
+
+    def refresh(self, end_date=None, days=365, chunk_size=50000, full=False):
+        """
+        Bring the dataset up to end_date, extracting only new and changed days
+
+        Args:
+            end_date: Last day to hold (default: yesterday, the last complete day)
+            days: Days of history to keep
+            chunk_size: Rows per written chunk
+            full: Re-extract every day in the window
+
+        Returns:
+            dict: Days appended, re-extracted and dropped, and the total row count
+        """
+        end_date = end_date or timezone.localdate() - timedelta(days=1)
+        start_date = end_date - timedelta(days=days - 1)
+        started_at = timezone.now()
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        watermark = None if full else self.read_watermark()
+        partitions = {}
+        if watermark is not None:
+            partitions = {date.fromisoformat(day): totals for day, totals in watermark['partitions'].items()}
+        window = {start_date + timedelta(days=offset) for offset in range(days)}
+
+        dropped = sorted(day for day in partitions if day not in window)
+        for day in dropped:
+            self.partition_path(day).unlink(missing_ok=True)
+            del partitions[day]
+
+        new_days = window - set(partitions)
+        stale_days = set()
+        if watermark is not None:
+            since = datetime.fromisoformat(watermark['extracted_at'])
+            stale_days = self._stale_days(partitions, since, start_date, end_date) - new_days
+
+        partitions.update(self._extract(new_days | stale_days, chunk_size))
+        self._write_watermark({
+            'format': self.file_format,
+            'first_date': start_date.isoformat(),
+            'last_date': end_date.isoformat(),
+            'extracted_at': started_at.isoformat(),
+            'rows': sum(totals['rows'] for totals in partitions.values()),
+            'partitions': {day.isoformat(): totals for day, totals in sorted(partitions.items())},
+        })
+        return {
+            'appended_days': len(new_days),
+            're_extracted_days': len(stale_days),
+            'dropped_days': len(dropped),
+            'rows': sum(totals['rows'] for totals in partitions.values()),
+        }
+
+    def _stale_days(self, partitions, since, start_date, end_date):
+        """
+        Extracted days whose source rows changed since the last refresh started
+        """
+        in_window = lambda days: {day for day in days if day in partitions and start_date <= day <= end_date}
+
+        edited = SalesRecords.objects.filter(
+            updated_at__gte=since,
+            transaction_date__date__gte=start_date,
+            transaction_date__date__lte=end_date,
+        ).annotate(day=TruncDate('transaction_date')).values_list('day', flat=True).distinct()
+        stale = in_window(edited)
+
+        current = partition_totals(start_date, end_date)
+        stale |= {day for day, totals in partitions.items() if current.get(day, EMPTY_TOTALS) != totals}
+
+        ordered = PurchaseOrderItems.objects.filter(
+            Q(updated_at__gte=since) | Q(purchase_order__updated_at__gte=since),
+            purchase_order__order_date__lte=end_date,
+        ).values_list('purchase_order__order_date', flat=True).distinct()
+        for order_date in ordered:
+            stale |= in_window(order_date + timedelta(days=offset) for offset in range(31))
+        return stale
+
+    def _extract(self, days, chunk_size):
+        """
+        Write the partitions of the given days, one query run per stretch of consecutive days
+
+        Returns:
+            dict: Day -> rows and units written
+        """
+        if not days:
+            return {}
+        dictionaries = training_dictionaries()
+        counts = {}
+        for first, last in _runs(sorted(days)):
+            counts.update({first + timedelta(days=offset): EMPTY_TOTALS for offset in range((last - first).days + 1)})
+            day, rows = None, []
+            for row in self.preparation.iter_sales_rows(first, last, chunk_size=min(chunk_size, 2000)):
+                if row['Date'] != day:
+                    if rows:
+                        counts[day] = self._write_partition(day, rows, dictionaries, chunk_size)
+                    day, rows = row['Date'], []
+                rows.append(row)
+            if rows:
+                counts[day] = self._write_partition(day, rows, dictionaries, chunk_size)
+
+        for day, totals in counts.items():
+            if not totals['rows']:
+                self.partition_path(day).unlink(missing_ok=True)
+        return counts
+
+    def _write_partition(self, day, rows, dictionaries, chunk_size):
+        path = self.partition_path(day)
+        tmp_path = path.with_name(f'{path.name}.tmp')
+        with training_writer(tmp_path, self.file_format, dictionaries) as write:
+            for offset in range(0, len(rows), chunk_size):
+                write(rows[offset:offset + chunk_size])
+        os.replace(tmp_path, path)
+        return {'rows': len(rows), 'units': sum(row['Units_Sold'] for row in rows)}
+
+    def load(self, columns=None):
+        """
+        All partitions as one DataFrame in date order (see load_training_data)
+        """
+        watermark = self.read_watermark()
+        if watermark is None:
+            return pd.DataFrame()
+        frames = [
+            load_training_data(self.partition_path(date.fromisoformat(day)), columns=columns)
+            for day, totals in watermark['partitions'].items() if totals['rows']
+        ]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+
+def partition_totals(start_date, end_date):
+    """
+    Rows and units sold per day in the history source, as the partitions of those days would hold them
+
+    Returns:
+        dict: Day -> {'rows': ..., 'units': ...} for days with rows
+    """
+    if history_source() == SOURCE_DAILY:
+        totals = DailyProductSales.objects.filter(date__gte=start_date, date__lte=end_date).values('date')
+        totals = totals.annotate(rows=Count('pk'), units=Sum('units_sold'))
+        return {row['date']: {'rows': row['rows'], 'units': row['units']} for row in totals.order_by()}
+    totals = SalesRecords.objects.filter(
+        transaction_date__date__gte=start_date, transaction_date__date__lte=end_date
+    ).annotate(day=TruncDate('transaction_date')).values('day')
+    totals = totals.annotate(rows=Count('pk'), units=Sum('quantity_sold'))
+    return {row['day']: {'rows': row['rows'], 'units': row['units']} for row in totals.order_by()}
+
+
+def _runs(days):
+    """
+    Split sorted days into (first, last) stretches of consecutive days
+    """
+    runs = []
+    for day in days:
+        if runs and day == runs[-1][1] + timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return [tuple(run) for run in runs]
@@ -0,0 +1,199 @@
+import json
+
+import numpy as np
+from django.conf import settings
+
+ENGINE_XGBOOST = "xgboost"
+ENGINE_NUMPY = "numpy"
+ENGINE_AUTO = "auto"
+
+
+class CompiledTreeEnsemble:
+    """
+    An XGBoost tree ensemble compiled into flat NumPy arrays.
+
+    All trees are laid out in one node table (split feature, threshold,
+    children, default direction; leaves hold their value in the threshold
+    column). Prediction walks every row through every tree at once, one tree
+    level per iteration, so a batch costs max_depth vectorised gathers and no
+    DMatrix construction. That wins over booster.predict for small batches,
+    where XGBoost's per-call overhead dominates; for large batches the native
+    predictor is faster (see `manage.py benchmark_tree_engine`).
+
+    Only what the forecasting models use is supported: gbtree boosters with
+    numerical splits and a single output.
+    """
+    def __init__(self, feature_names, roots, features, thresholds, left, right, default_left, base_score, max_depth):
+        self.feature_names = feature_names
+        self.roots = roots
+        self.features = features
+        self.thresholds = thresholds
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.base_score = base_score
+        self.max_depth = max_depth
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @classmethod
+    def from_model(cls, model):
+        """
+        Compile a fitted xgboost.XGBRegressor
+
+        Trees after the best iteration are dropped, as XGBRegressor.predict does.
+        """
+        booster = model.get_booster()
+        n_trees = None
+        best_iteration = getattr(model, 'best_iteration', None) if _has_best_iteration(model) else None
+        dump = json.loads(bytes(booster.save_raw(raw_format='json')))
+        if best_iteration is not None:
+            indptr = dump['learner']['gradient_booster']['model']['iteration_indptr']
+            n_trees = indptr[best_iteration + 1]
+        return cls.from_json(dump, n_trees=n_trees)
+
+    @classmethod
+    def from_json(cls, dump, n_trees=None):
+        """
+        Compile a booster from its JSON model dump (booster.save_raw('json'))
+
+        Args:
+            dump: Parsed JSON model
+            n_trees: Number of leading trees to use (default: all)
+        """
+        learner = dump['learner']
+        gradient_booster = learner['gradient_booster']
+        if gradient_booster['name'] != 'gbtree':
+            raise ValueError(f"Unsupported booster: {gradient_booster['name']}")
+        objective = learner['objective']['name']
+        if objective not in ('reg:squarederror', 'reg:absoluteerror', 'reg:pseudohubererror'):
+            raise ValueError(f"Unsupported objective: {objective}")
+        params = learner['learner_model_param']
+        if int(params.get('num_target', 1)) != 1 or int(params.get('num_class', 0)) > 1:
+            raise ValueError("Only single-output models are supported")
+
+        trees = gradient_booster['model']['trees'][:n_trees]
+        roots = np.zeros(len(trees), dtype=np.int64)
+        features, thresholds, left, right, default_left = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for index, tree in enumerate(trees):
+            if any(tree['split_type']):
+                raise ValueError("Categorical splits are not supported")
+            tree_left = np.asarray(tree['left_children'], dtype=np.int64)
+            tree_right = np.asarray(tree['right_children'], dtype=np.int64)
+            is_leaf = tree_left == -1
+            # Leaves point to themselves, so finished rows stay put while deeper trees are walked
+            own = np.arange(len(tree_left), dtype=np.int64) + offset
+            left.append(np.where(is_leaf, own, tree_left + offset))
+            right.append(np.where(is_leaf, own, tree_right + offset))
+            features.append(np.where(is_leaf, 0, tree['split_indices']).astype(np.int64))
+            thresholds.append(np.asarray(tree['split_conditions'], dtype=np.float32))
+            default_left.append(np.asarray(tree['default_left'], dtype=bool))
+            roots[index] = offset
+            offset += len(tree_left)
+            max_depth = max(max_depth, _depth(tree_left, tree_right))
+
+        concat = lambda parts, dtype: np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype=dtype)
+        return cls(
+            feature_names=learner.get('feature_names') or None,
+            roots=roots,
+            features=concat(features, np.int64),
+            thresholds=concat(thresholds, np.float32),
+            left=concat(left, np.int64),
+            right=concat(right, np.int64),
+            default_left=concat(default_left, bool),
+            base_score=float(str(params['base_score']).strip('[]')),
+            max_depth=max_depth,
+        )
+
+    def _matrix(self, X):
+        """
+        Features as a float32 array in the order the booster was trained with
+        """
+        if hasattr(X, 'columns'):
+            if self.feature_names is not None and list(X.columns) != self.feature_names:
+                X = X[self.feature_names]
+            return X.to_numpy(dtype=np.float32, na_value=np.nan)
+        return np.asarray(X, dtype=np.float32)
+
+    def predict(self, X):
+        """
+        Predict like booster.predict, to within float32 rounding of the leaf sums
+        """
+        data = self._matrix(X)
+        n_rows = data.shape[0]
+        if n_rows == 0 or self.n_trees == 0:
+            return np.full(n_rows, self.base_score, dtype=np.float32)
+
+        rows = np.arange(n_rows)[:, None]
+        nodes = np.broadcast_to(self.roots, (n_rows, self.n_trees))
+        for _ in range(self.max_depth):
+            values = data[rows, self.features[nodes]]
+            go_left = np.where(np.isnan(values), self.default_left[nodes], values < self.thresholds[nodes])
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        # At the leaves the threshold column holds the leaf value
+        leaf_sums = self.thresholds[nodes].sum(axis=1, dtype=np.float64)
+        return (leaf_sums + self.base_score).astype(np.float32)
+
+
+def _has_best_iteration(model):
+    # XGBRegressor.best_iteration raises AttributeError unless the model was early-stopped
+    try:
+        return model.best_iteration is not None
+    except AttributeError:
+        return False
+
+
+def _depth(left, right):
+    """
+    Number of splits on the longest root-to-leaf path of one tree
+    """
+    depth = np.zeros(len(left), dtype=np.int64)
+    # Children always have larger ids than their parent in XGBoost's layout
+    for node in range(len(left)):
+        if left[node] != -1:
+            depth[left[node]] = depth[node] + 1
+            depth[right[node]] = depth[node] + 1
+    return int(depth.max()) if len(depth) else 0
+
+
+def tree_engine():
+    """
+    Inference engine from settings.ML_TREE_ENGINE: "xgboost", "numpy" or "auto"
+    """
+    return getattr(settings, 'ML_TREE_ENGINE', ENGINE_AUTO)
+
+
+def uses_numpy_engine(n_rows):
+    engine = tree_engine()
+    if engine == ENGINE_NUMPY:
+        return True
+    if engine == ENGINE_AUTO:
+        return n_rows <= getattr(settings, 'ML_TREE_ENGINE_MAX_ROWS', 128)
+    return False
+
+
+def predict_trees(model_wrapper, X):
+    """
+    Predict with the configured engine
+
+    The compiled ensemble is built on first use and kept on the model wrapper,
+    so a reloaded model is compiled afresh.
+
+    Args:
+        model_wrapper: DailyModel, WeeklyModel or MonthlyModel with a loaded model
+        X: Prepared feature frame
+
+    Returns:
+        Array of raw predictions
+    """
+    if not uses_numpy_engine(len(X)):
+        return model_wrapper.model.predict(X)
+    compiled = getattr(model_wrapper, 'compiled_trees', None)
+    if compiled is None:
+        compiled = model_wrapper.compiled_trees = CompiledTreeEnsemble.from_model(model_wrapper.model)
+    return compiled.predict(X)
@@ -1,12 +1,19 @@
+import hashlib
+import logging
 import os
 import pickle
 import pandas as pd
 import numpy as np
 from pathlib import Path
 from sklearn.preprocessing import OneHotEncoder
+from .artifacts import ModelArtifactError, load_artifact
+from .feature_matrix import EncodingPlan, build_history_matrix, group_mode, period_offsets, product_codes_for
+from .tree_engine import predict_trees
 
 MODEL_DIR = Path(__file__).resolve().parent / 'models'
 
+logger = logging.getLogger(__name__)
+
 class WeeklyModel:
     """
     XGBoost model for weekly sales predictions
@@ -17,17 +24,29 @@ class WeeklyModel:
         self.encoder = None
         self.feature_info = None
         self.processed_feature_columns = None
+        self.model_version = None
+        self.artifact_error = None
+        self.compiled_trees = None
         self.load_model_components()
+        self.encoding_plan = self.compile_encoding_plan()
     
     def load_model_components(self):
         """
         Load all model components for weekly predictions
+        
+        The native artifact written by `manage.py convert_models` is used when
+        present; the original pickles are the fallback.
         """
+        if self.load_native_artifact():
+            return
+        
         try:
             model_path = os.path.join(MODEL_DIR, f'inventory_xgb_weekly_store_{self.store_id}_model.pkl')
             if os.path.exists(model_path):
                 with open(model_path, 'rb') as f:
-                    self.model = pickle.load(f)
+                    model_bytes = f.read()
+                self.model = pickle.loads(model_bytes)
+                self.model_version = f"weekly-{hashlib.sha256(model_bytes).hexdigest()[:12]}"
                 print(f"Successfully loaded weekly model for store {self.store_id}")
             else:
                 print(f"Weekly model file not found at {model_path}")
@@ -52,6 +71,30 @@ class WeeklyModel:
         except Exception as e:
             print(f"Error loading weekly model components: {e}")
     
+    def load_native_artifact(self):
+        """
+        Load the model, features and encoder from the native artifact
+        
+        Returns:
+            bool: True if the artifact was found and loaded
+        """
+        try:
+            artifact = load_artifact('weekly', self.store_id)
+        except ModelArtifactError as e:
+            logger.warning("Ignoring weekly model artifact, falling back to the pickles: %s", e)
+            self.artifact_error = str(e)
+            return False
+        if artifact is None:
+            return False
+        
+        self.model = artifact.model
+        self.feature_info = artifact.feature_info
+        self.processed_feature_columns = self.feature_info.get('processed_feature_columns_list', [])
+        self.encoder = artifact.encoder
+        self.model_version = artifact.version
+        logger.info("Loaded weekly model artifact %s for store %s", artifact.version, self.store_id)
+        return True
+    
     def aggregate_to_weekly(self, daily_data):
         """
         Aggregate daily data to weekly data
@@ -69,9 +112,11 @@ class WeeklyModel:
         if 'Date' in df.columns:
             df['Date'] = pd.to_datetime(df['Date'])
         
-        df['WeekStart'] = df['Date'] - pd.to_timedelta(df['Date'].dt.dayofweek, unit='D')
-        df['Year_Week'] = df['Date'].dt.isocalendar().year.astype(str) + "-" + \
-                          df['Date'].dt.isocalendar().week.astype(str).str.zfill(2)
+        # Monday-aligned integer week index; day 0 of the epoch (1970-01-01) was a Thursday
+        day_index = df['Date'].values.astype('datetime64[D]').astype(np.int64)
+        df['_week'] = (day_index + 3) // 7
+        if 'Holiday/Promotion' in df.columns:
+            df['Holiday/Promotion'] = (df['Holiday/Promotion'] == 1).astype(np.int64)
         
         agg_funcs = {
             'Units Sold': 'sum',
@@ -79,25 +124,42 @@ class WeeklyModel:
             'Price': 'mean',
             'Discount': 'mean',
             'Inventory Level': 'mean',
-            'Weather Condition': lambda x: x.mode()[0] if not x.mode().empty else "Unknown",
-            'Holiday/Promotion': lambda x: 1 if (x==1).any() else 0,
-            'Seasonality': lambda x: x.mode()[0] if not x.mode().empty else "Unknown",
+            'Weather Condition': 'mode',
+            'Holiday/Promotion': 'max',
+            'Seasonality': 'mode',
             'Date': 'max',
-            'WeekStart': 'first'
         }
         
         available_cols = [col for col in agg_funcs.keys() if col in df.columns]
-        agg_funcs = {col: agg_funcs[col] for col in available_cols}
         
-        weekly_df = df.groupby(['Store ID', 'Product ID', 'Year_Week']).agg(agg_funcs).reset_index()
+        grouped = df.groupby(['Store ID', 'Product ID', '_week'], sort=True)
+        group_codes = grouped.ngroup().to_numpy()
+        weekly_df = grouped.agg({col: agg_funcs[col] for col in available_cols if agg_funcs[col] != 'mode'}).reset_index()
+        
+        for col in available_cols:
+            if agg_funcs[col] == 'mode':
+                weekly_df[col] = group_mode(group_codes, df[col].to_numpy(), len(weekly_df))
+        
+        weekly_df['WeekStart'] = (weekly_df['_week'].to_numpy() * 7 - 3).astype('datetime64[D]').astype('datetime64[ns]')
+        iso = weekly_df['WeekStart'].dt.isocalendar()
+        weekly_df['Year_Week'] = iso['year'].astype(str) + "-" + iso['week'].astype(str).str.zfill(2)
+        weekly_df = weekly_df[['Store ID', 'Product ID', 'Year_Week'] + available_cols + ['WeekStart']]
         
         if 'Category' in df.columns:
-            category_map = df.drop_duplicates(['Product ID'])
-            category_map = category_map[['Product ID', 'Category']]
-            weekly_df = weekly_df.merge(category_map, on='Product ID', how='left')
+            category_map = df.drop_duplicates(['Product ID']).set_index('Product ID')['Category']
+            weekly_df['Category'] = weekly_df['Product ID'].map(category_map)
         
         return weekly_df
     
+    def compile_encoding_plan(self):
+        """
+        The one-hot encoding of the loaded model's categorical features, or None without encoder or feature columns
+        """
+        if self.encoder is None or not self.processed_feature_columns:
+            return None
+        categorical = self.feature_info.get('categorical_columns') or list(self.encoder.feature_names_in_)
+        return EncodingPlan.from_encoder(self.processed_feature_columns, self.encoder, categorical)
+    
     def prepare_features(self, product_data, target_week_start=None):
         """
         Prepare features for prediction
@@ -137,99 +199,61 @@ class WeeklyModel:
         date_features = self.feature_info.get('date_features', [])
         
         weekly_latest = weekly_data.sort_values(by=['Product ID', 'WeekStart']).groupby('Product ID').last().reset_index()
+        n_products = len(weekly_latest)
         
-        feature_rows = []
+        history = weekly_data.sort_values('WeekStart', kind='stable')
+        codes = product_codes_for(history['Product ID'], weekly_latest['Product ID'])
+        offsets, exact = period_offsets(history['WeekStart'], target_week_start, pd.Timedelta(weeks=1))
+        matrix = build_history_matrix(
+            codes, offsets, history['Units Sold'].to_numpy(dtype=np.float64),
+            n_products, 4, exact=exact
+        )
         
-        for _, row in weekly_latest.iterrows():
-            product_id = row['Product ID']
-            product_history = weekly_data[weekly_data['Product ID'] == product_id].sort_values('WeekStart')
-            
-            feature_row = {}
-            
-            for col in static_cat_features:
-                if col in row:
-                    feature_row[col] = row[col]
-                else:
-                    feature_row[col] = 'Missing'
-            
-            for i in range(1, 5):
-                lag_week_start = target_week_start - pd.Timedelta(weeks=i)
-                lag_row = product_history[product_history['WeekStart'] == lag_week_start]
-                lag_value = lag_row['Units Sold'] if not lag_row.empty else pd.Series([0])
-                feature_row[f'UnitsSold_lag_{i}_week'] = lag_value.iloc[0] if not lag_value.empty else 0
-            
-            
-            recent_weeks = product_history[
-                (product_history['WeekStart'] >= (target_week_start - pd.Timedelta(weeks=4))) &
-                (product_history['WeekStart'] < target_week_start)
-            ]['Units Sold']
-            
-            feature_row['UnitsSold_roll_mean_4_week'] = recent_weeks.mean() if not recent_weeks.empty else 0
-            feature_row['UnitsSold_roll_std_4_week'] = recent_weeks.std() if not recent_weeks.empty and len(recent_weeks) > 1 else 0
-            
-            
-            if 'Inventory Level' in row:
-                feature_row['InventoryLevel_current_week'] = row['Inventory Level']
-            else:
-                feature_row['InventoryLevel_current_week'] = 0
-            
-            
-            target_month = target_week_start.month
-            target_year = target_week_start.year
-            target_week_of_year = target_week_start.isocalendar().week
-            target_quarter = (target_month - 1) // 3 + 1
-            
-            feature_row['next_week_Month'] = target_month
-            feature_row['next_week_Year'] = target_year
-            feature_row['next_week_WeekOfYear'] = target_week_of_year
-            feature_row['next_week_Quarter'] = target_quarter
-            
-            for col_base in ['Demand Forecast', 'Price', 'Discount', 'Weather Condition', 'Holiday/Promotion', 'Seasonality']:
-                if col_base in row:
-                    feature_row[f'{col_base}_next_week'] = row[col_base]
-            
-            feature_rows.append(feature_row)
+        lag_dtype = history['Units Sold'].dtype if n_products else np.float64
+        if not np.issubdtype(lag_dtype, np.number):
+            lag_dtype = np.float64
         
-        X_base = pd.DataFrame(feature_rows)
+        features = {}
         
-        if self.encoder is not None:
-            cat_cols = self.feature_info.get('categorical_columns', [])
-            cat_cols = [col for col in cat_cols if col in X_base.columns]
-            
-            num_cols = [col for col in X_base.columns if col not in cat_cols]
-            X_num = X_base[num_cols].copy()
-            
-            for col in X_num.select_dtypes(include=np.number).columns:
-                if X_num[col].isnull().any():
-                    X_num[col] = X_num[col].fillna(X_num[col].median() if not X_num[col].empty else 0)
-            
-            if cat_cols:
-                X_cat = X_base[cat_cols].copy()
-                for col in cat_cols:
-                    X_cat[col] = X_cat[col].astype(str).fillna('Missing')
-                
-                X_cat_encoded = self.encoder.transform(X_cat)
-                
-                cat_feature_names = self.encoder.get_feature_names_out(cat_cols)
-                
-                X_cat_df = pd.DataFrame(X_cat_encoded, columns=cat_feature_names, index=X_num.index)
-                
-                X = pd.concat([X_num, X_cat_df], axis=1)
+        for col in static_cat_features:
+            if col in weekly_latest.columns:
+                features[col] = weekly_latest[col].to_numpy()
             else:
-                X = X_num
-            
-            X = X.fillna(0)
-            
-            for col in self.processed_feature_columns:
-                if col not in X.columns:
-                    X[col] = 0
-            
-            X = X[self.processed_feature_columns]
+                features[col] = np.full(n_products, 'Missing', dtype=object)
+        
+        for i in range(1, 5):
+            features[f'UnitsSold_lag_{i}_week'] = matrix.lag(i).astype(lag_dtype)
+        
+        features['UnitsSold_roll_mean_4_week'] = matrix.window_mean(4)
+        features['UnitsSold_roll_std_4_week'] = matrix.window_std(4)
+        
+        if 'Inventory Level' in weekly_latest.columns:
+            features['InventoryLevel_current_week'] = weekly_latest['Inventory Level'].to_numpy()
         else:
-            for col in X_base.select_dtypes(include=np.number).columns:
-                if X_base[col].isnull().any():
-                    X_base[col] = X_base[col].fillna(X_base[col].median() if not X_base[col].empty else 0)
-            X = X_base
+            features['InventoryLevel_current_week'] = np.zeros(n_products, dtype=np.int64)
+        
+        target_month = target_week_start.month
+        target_year = target_week_start.year
+        target_week_of_year = target_week_start.isocalendar().week
+        target_quarter = (target_month - 1) // 3 + 1
+        
+        features['next_week_Month'] = np.full(n_products, target_month)
+        features['next_week_Year'] = np.full(n_products, target_year)
+        features['next_week_WeekOfYear'] = np.full(n_products, target_week_of_year)
+        features['next_week_Quarter'] = np.full(n_products, target_quarter)
+        
+        for col_base in ['Demand Forecast', 'Price', 'Discount', 'Weather Condition', 'Holiday/Promotion', 'Seasonality']:
+            if col_base in weekly_latest.columns:
+                features[f'{col_base}_next_week'] = weekly_latest[col_base].to_numpy()
+        
+        if self.encoding_plan is not None:
+            return self.encoding_plan.encode(features, n_products)
+        
+        # Without an encoder the features are passed on unencoded
+        X = pd.DataFrame(features)
+        for col in X.select_dtypes(include=np.number).columns:
+            if X[col].isnull().any():
+                X[col] = X[col].fillna(X[col].median() if not X[col].empty else 0)
         
         return X
     
@@ -246,7 +270,13 @@ class WeeklyModel:
         if self.model is None:
             raise ValueError("Model not loaded")
         
-        predictions = self.model.predict(X)
+        predictions = predict_trees(self, X)
         return np.maximum(0, predictions)
-    
-weekly_model = WeeklyModel()
\ No newline at end of file
+
+
+def __getattr__(name):
+    # The shared instance comes from the model registry, so importing this module does not load the model
+    if name == 'weekly_model':
+        from .registry import model_registry
+        return model_registry.get('weekly')
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -114,4 +114,69 @@ class SalesRecords(models.Model):
 
     class Meta:
         verbose_name_plural = "Sales Records"
-        ordering = ['-transaction_date']
\ No newline at end of file
+        ordering = ['-transaction_date']
+
+class ForecastSnapshot(models.Model):
+    snapshot_id = models.CharField(primary_key=True, max_length=50, editable=False, default=uuid.uuid4)
+    product = models.ForeignKey(Products, on_delete=models.CASCADE, related_name='forecast_snapshots', to_field='product_id', null=False)
+    time_horizon = models.CharField(max_length=10, null=False, blank=False)
+    periods = models.IntegerField(null=False, blank=False)
+    as_of_date = models.DateField(null=False, blank=False)
+    total_predicted_units = models.IntegerField(default=0)
+    forecast_days = models.IntegerField(default=0)
+    model_version = models.CharField(max_length=50, blank=True, default='')
+    computed_at = models.DateTimeField(null=False, blank=False)
+
+    def __str__(self):
+        return f"{self.time_horizon} forecast of {self.product_id} as of {self.as_of_date}"
+
+    class Meta:
+        verbose_name_plural = "Forecast Snapshots"
+        unique_together = ('product', 'time_horizon', 'periods')
+
+class DailyProductSales(models.Model):
+    daily_sales_id = models.CharField(primary_key=True, max_length=50, editable=False, default=uuid.uuid4)
+    product = models.ForeignKey(Products, on_delete=models.CASCADE, related_name='daily_sales', to_field='product_id', null=False)
+    date = models.DateField(null=False, blank=False)
+    units_sold = models.IntegerField(default=0)
+    revenue = models.FloatField(default=0.0)
+    discount = models.FloatField(default=0.0)
+    transactions = models.IntegerField(default=0)
+    promotion = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.units_sold} x {self.product_id} on {self.date}"
+
+    class Meta:
+        verbose_name_plural = "Daily Product Sales"
+        unique_together = ('product', 'date')
+        indexes = [models.Index(fields=['date'])]
+
+class ForecastJob(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    job_id = models.CharField(primary_key=True, max_length=50, editable=False, default=uuid.uuid4)
+    request_key = models.CharField(max_length=64, db_index=True)
+    time_horizon = models.CharField(max_length=10, null=False, blank=False)
+    periods = models.IntegerField(null=False, blank=False)
+    last_date = models.DateField(null=True, blank=True)
+    product_ids = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, null=False, blank=False, default='pending')
+    completed_products = models.IntegerField(default=0)
+    results = models.JSONField(default=list)
+    source = models.CharField(max_length=10, blank=True, default='')
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=False, blank=False)
+
+    def __str__(self):
+        return f"{self.time_horizon} forecast job {self.job_id} ({self.status})"
+
+    class Meta:
+        verbose_name_plural = "Forecast Jobs"
+        indexes = [models.Index(fields=['expires_at'])]
@@ -0,0 +1,65 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .models import ForecastSnapshot, Products, SalesRecords
+from .ml_models.daily_sales import refresh_daily_sales, sales_day
+from .ml_models.forecast_cache import forecast_cache
+
+# Product fields that feed the forecasting features
+FORECAST_INPUT_FIELDS = ('current_stock', 'unit_price', 'category_id')
+
+
+def invalidate_forecasts(product_id):
+    """
+    Drop every cached and precomputed forecast of a product
+    """
+    forecast_cache.invalidate(product_id)
+    ForecastSnapshot.objects.filter(product_id=product_id).delete()
+
+
+def _forecast_inputs(instance):
+    # Read from __dict__ so deferred fields are never loaded just for this check
+    return tuple(instance.__dict__.get(field) for field in FORECAST_INPUT_FIELDS)
+
+
+@receiver(post_init, sender=Products)
+def remember_product_forecast_inputs(sender, instance, **kwargs):
+    instance._forecast_inputs = _forecast_inputs(instance)
+
+
+@receiver(post_save, sender=Products)
+def invalidate_product_forecasts(sender, instance, created, **kwargs):
+    current = _forecast_inputs(instance)
+    if not created and current != getattr(instance, '_forecast_inputs', None):
+        invalidate_forecasts(instance.product_id)
+    instance._forecast_inputs = current
+
+
+def _sale_day_key(instance):
+    transaction_date = instance.__dict__.get('transaction_date')
+    return (instance.__dict__.get('product_id'), sales_day(transaction_date) if transaction_date else None)
+
+
+@receiver(post_init, sender=SalesRecords)
+def remember_sale_product(sender, instance, **kwargs):
+    instance._original_product_id = instance.__dict__.get('product_id')
+    instance._original_day_key = _sale_day_key(instance)
+
+
+@receiver(post_save, sender=SalesRecords)
+@receiver(post_delete, sender=SalesRecords)
+def invalidate_sale_forecasts(sender, instance, **kwargs):
+    invalidate_forecasts(instance.product_id)
+    original_product_id = getattr(instance, '_original_product_id', None)
+    if original_product_id and original_product_id != instance.product_id:
+        invalidate_forecasts(original_product_id)
+    instance._original_product_id = instance.product_id
+
+
+@receiver(post_save, sender=SalesRecords)
+@receiver(post_delete, sender=SalesRecords)
+def refresh_sale_daily_sales(sender, instance, **kwargs):
+    # The day the sale left (if it moved) and the day it is in now
+    current = _sale_day_key(instance)
+    refresh_daily_sales([current, getattr(instance, '_original_day_key', current)])
+    instance._original_day_key = current
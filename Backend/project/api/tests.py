@@ -1,3 +1,1266 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from pandas.testing import assert_frame_equal
+
+from .models import Categories, DailyProductSales, ForecastJob, ForecastSnapshot, Products, SalesRecords
+from .ml_models.forecast_cache import forecast_cache
+from .ml_models.feature_matrix import EncodingPlan
+from .ml_models.forecast_result import ForecastResult
+from .ml_models.forecast_snapshots import get_forecasts
+from .ml_models.multi_model_predictor import (
+    MultiModelPredictor, get_product_sales_prediction, predictor, summarize_predictions
+)
+from .ml_models.artifacts import ModelArtifactError, load_artifact, manifest_path, save_artifact
+from .ml_models.batching import ForecastBatcher
+from .ml_models.daily_sales import backfill_daily_sales, refresh_daily_sales
+from .ml_models.inference import (
+    InferenceClient, InferenceServer, InferenceTimeout, inference_address, inference_authkey
+)
+from .ml_models.registry import ModelRegistry
+from .ml_models.synthetic_data import synthetic_history
+from .ml_models.tree_engine import CompiledTreeEnsemble, predict_trees
+from .ml_models.daily_model import daily_model
+from .ml_models.weekly_model import weekly_model
+from .ml_models.monthly_model import monthly_model
+
+
+def make_daily_history(n_products=6, n_days=40, seed=0):
+    """
+    Synthetic history in the shape produced by MultiModelPredictor.get_product_data.
+
+    Some days are skipped, some carry two transactions with the same quantity
+    (so the lag value is unambiguous), one product only has old sales and one
+    product is unknown to the trained encoders.
+    """
+    rng = np.random.default_rng(seed)
+    end_date = pd.Timestamp('2025-06-20')
+    categories = ['Groceries', 'Furniture', 'Electronics', 'Toys', 'Clothing']
+    product_ids = [f'P{i:04d}' for i in range(1, n_products)] + ['P0999']
+    rows = []
+    for idx, product_id in enumerate(product_ids):
+        days = range(n_days) if idx != 1 else range(20, n_days)
+        for day in days:
+            if rng.random() < 0.25:
+                continue
+            date = end_date - pd.Timedelta(days=day)
+            units = int(rng.integers(0, 30))
+            for _ in range(2 if rng.random() < 0.2 else 1):
+                rows.append({
+                    'Date': date,
+                    'Store ID': 1,
+                    'Product ID': product_id,
+                    'Category': categories[idx % len(categories)],
+                    'Inventory Level': int(rng.integers(0, 500)),
+                    'Units Sold': units,
+                    'Price': float(rng.uniform(1, 100)),
+                    'Discount': float(rng.choice([0.0, 5.0, 10.0])),
+                    'Weather Condition': 'Normal',
+                    'Holiday/Promotion': int(rng.random() < 0.3),
+                    'Seasonality': 'Regular',
+                    'Demand Forecast': float(rng.uniform(0, 20)),
+                })
+    df = pd.DataFrame(rows)
+    return df.sort_values(by=['Product ID', 'Date']).reset_index(drop=True)
+
+
+def create_catalog(n_products=4, n_days=45, seed=0):
+    """
+    Products with a few sales per day over the last n_days, stored in the test database
+    """
+    rng = np.random.default_rng(seed)
+    category = Categories.objects.create(name='Groceries')
+    products = [
+        Products.objects.create(
+            product_id=f'P{i:04d}', category=category, product_name=f'Product {i}',
+            unit_price=10.0 + i, current_stock=100 + i
+        )
+        for i in range(1, n_products + 1)
+    ]
+    now = timezone.now()
+    sales = []
+    for product in products[:-1]:
+        for day in range(n_days):
+            for _ in range(int(rng.integers(0, 3))):
+                sales.append(SalesRecords(
+                    transaction_date=now - timedelta(days=day, minutes=int(rng.integers(0, 600))),
+                    product=product,
+                    quantity_sold=int(rng.integers(1, 10)),
+                    unit_price_at_sale=product.unit_price,
+                    promotion_marker=bool(rng.random() < 0.2),
+                ))
+    SalesRecords.objects.bulk_create(sales)
+    # bulk_create sends no signals, so the daily table is rebuilt like after any bulk load
+    backfill_daily_sales()
+    return products
+
+
+def reference_daily_features(model, product_data, target_date):
+    """
+    The original per-product DailyModel.prepare_features loop, kept as the oracle
+    """
+    df = product_data.copy()
+    df['Date'] = pd.to_datetime(df['Date'])
+    if target_date is None:
+        target_date = df['Date'].max() + pd.Timedelta(days=1)
+    target_date = pd.to_datetime(target_date)
+
+    static_cat_features = model.feature_info.get('static_categorical_features', [])
+    df_latest = df.sort_values(by=['Product ID', 'Date']).groupby('Product ID').last().reset_index()
+
+    feature_rows = []
+    for _, row in df_latest.iterrows():
+        product_history = df[df['Product ID'] == row['Product ID']].sort_values('Date')
+        feature_row = {}
+        for col in static_cat_features:
+            feature_row[col] = row[col] if col in row else 'Missing'
+        for i in range(1, 8):
+            lag_value = product_history[product_history['Date'] == target_date - pd.Timedelta(days=i)]['Units Sold']
+            feature_row[f'UnitsSold_lag_{i}'] = lag_value.iloc[0] if not lag_value.empty else 0
+        recent_sales = product_history[
+            (product_history['Date'] >= (target_date - pd.Timedelta(days=7))) &
+            (product_history['Date'] < target_date)
+        ]['Units Sold']
+        feature_row['UnitsSold_roll_mean_7_lag1'] = recent_sales.mean() if not recent_sales.empty else 0
+        feature_row['UnitsSold_roll_std_7_lag1'] = recent_sales.std() if len(recent_sales) > 1 else 0
+        feature_row['InventoryLevel_t'] = row['Inventory Level'] if 'Inventory Level' in row else 0
+        feature_row['t+1_DayOfWeek'] = target_date.dayofweek
+        feature_row['t+1_Month'] = target_date.month
+        feature_row['t+1_Year'] = target_date.year
+        feature_row['t+1_DayOfYear'] = target_date.dayofyear
+        feature_row['t+1_WeekOfYear'] = target_date.isocalendar().week
+        feature_row['t+1_IsWeekend'] = int(target_date.dayofweek >= 5)
+        for col_base in ['Demand Forecast', 'Price', 'Discount', 'Weather Condition', 'Holiday/Promotion', 'Seasonality']:
+            if col_base in row:
+                feature_row[f'{col_base}_t+1'] = row[col_base]
+        feature_rows.append(feature_row)
+
+    X = pd.DataFrame(feature_rows)
+    cat_cols = model.encoder_info['all_categorical_to_ohe']
+    for col in cat_cols:
+        if col in X.columns:
+            X[col] = X[col].astype(str).fillna('Missing')
+    X = pd.get_dummies(X, columns=cat_cols, dummy_na=False, dtype=int)
+    for col in model.processed_feature_columns:
+        if col not in X.columns:
+            X[col] = 0
+    return X[model.processed_feature_columns]
+
+
+def encode_like_model(model, X_base):
+    """
+    The encoder tail shared by the original weekly and monthly builders
+    """
+    cat_cols = [col for col in model.feature_info.get('categorical_columns', []) if col in X_base.columns]
+    num_cols = [col for col in X_base.columns if col not in cat_cols]
+    X_num = X_base[num_cols].copy()
+    for col in X_num.select_dtypes(include=np.number).columns:
+        if X_num[col].isnull().any():
+            X_num[col] = X_num[col].fillna(X_num[col].median())
+    X_cat = X_base[cat_cols].copy()
+    for col in cat_cols:
+        X_cat[col] = X_cat[col].astype(str).fillna('Missing')
+    X_cat_df = pd.DataFrame(
+        model.encoder.transform(X_cat),
+        columns=model.encoder.get_feature_names_out(cat_cols),
+        index=X_num.index
+    )
+    X = pd.concat([X_num, X_cat_df], axis=1).fillna(0)
+    for col in model.processed_feature_columns:
+        if col not in X.columns:
+            X[col] = 0
+    return X[model.processed_feature_columns]
+
+
+def reference_weekly_aggregate(daily_data):
+    """
+    The original lambda-based WeeklyModel.aggregate_to_weekly
+    """
+    df = daily_data.copy()
+    df['Date'] = pd.to_datetime(df['Date'])
+    df['WeekStart'] = df['Date'] - pd.to_timedelta(df['Date'].dt.dayofweek, unit='D')
+    df['Year_Week'] = df['Date'].dt.isocalendar().year.astype(str) + "-" + \
+                      df['Date'].dt.isocalendar().week.astype(str).str.zfill(2)
+    agg_funcs = {
+        'Units Sold': 'sum',
+        'Demand Forecast': 'mean',
+        'Price': 'mean',
+        'Discount': 'mean',
+        'Inventory Level': 'mean',
+        'Weather Condition': lambda x: x.mode()[0] if not x.mode().empty else "Unknown",
+        'Holiday/Promotion': lambda x: 1 if (x == 1).any() else 0,
+        'Seasonality': lambda x: x.mode()[0] if not x.mode().empty else "Unknown",
+        'Date': 'max',
+        'WeekStart': 'first'
+    }
+    weekly_df = df.groupby(['Store ID', 'Product ID', 'Year_Week']).agg(agg_funcs).reset_index()
+    category_map = df.drop_duplicates(['Product ID'])[['Product ID', 'Category']]
+    return weekly_df.merge(category_map, on='Product ID', how='left')
+
+
+def reference_weekly_features(model, product_data, target_week_start):
+    """
+    The original per-product WeeklyModel.prepare_features loop, kept as the oracle
+    """
+    weekly_data = reference_weekly_aggregate(product_data)
+    target_week_start = pd.to_datetime(target_week_start)
+    target_week_start = target_week_start - pd.Timedelta(days=target_week_start.dayofweek)
+
+    static_cat_features = model.feature_info.get('static_categorical_features', [])
+    weekly_latest = weekly_data.sort_values(by=['Product ID', 'WeekStart']).groupby('Product ID').last().reset_index()
+
+    feature_rows = []
+    for _, row in weekly_latest.iterrows():
+        product_history = weekly_data[weekly_data['Product ID'] == row['Product ID']].sort_values('WeekStart')
+        feature_row = {}
+        for col in static_cat_features:
+            feature_row[col] = row[col] if col in row else 'Missing'
+        for i in range(1, 5):
+            lag_row = product_history[product_history['WeekStart'] == target_week_start - pd.Timedelta(weeks=i)]
+            feature_row[f'UnitsSold_lag_{i}_week'] = lag_row['Units Sold'].iloc[0] if not lag_row.empty else 0
+        recent_weeks = product_history[
+            (product_history['WeekStart'] >= (target_week_start - pd.Timedelta(weeks=4))) &
+            (product_history['WeekStart'] < target_week_start)
+        ]['Units Sold']
+        feature_row['UnitsSold_roll_mean_4_week'] = recent_weeks.mean() if not recent_weeks.empty else 0
+        feature_row['UnitsSold_roll_std_4_week'] = recent_weeks.std() if len(recent_weeks) > 1 else 0
+        feature_row['InventoryLevel_current_week'] = row['Inventory Level'] if 'Inventory Level' in row else 0
+        target_month = target_week_start.month
+        feature_row['next_week_Month'] = target_month
+        feature_row['next_week_Year'] = target_week_start.year
+        feature_row['next_week_WeekOfYear'] = target_week_start.isocalendar().week
+        feature_row['next_week_Quarter'] = (target_month - 1) // 3 + 1
+        for col_base in ['Demand Forecast', 'Price', 'Discount', 'Weather Condition', 'Holiday/Promotion', 'Seasonality']:
+            if col_base in row:
+                feature_row[f'{col_base}_next_week'] = row[col_base]
+        feature_rows.append(feature_row)
+
+    return encode_like_model(model, pd.DataFrame(feature_rows))
+
+
+def reference_monthly_aggregate(daily_data):
+    """
+    The original string-keyed MonthlyModel.aggregate_to_monthly
+    """
+    df = daily_data.copy()
+    df['Date'] = pd.to_datetime(df['Date'])
+    df['Year_Month'] = df['Date'].dt.strftime('%Y-%m')
+    df['MonthStart'] = pd.to_datetime(df['Date'].dt.strftime('%Y-%m-01'))
+    df['MonthEnd'] = (df['MonthStart'] + pd.offsets.MonthEnd(0))
+    agg_funcs = {
+        'Units Sold': 'sum',
+        'Demand Forecast': 'mean',
+        'Price': 'mean',
+        'Discount': 'mean',
+        'Inventory Level': 'mean',
+        'Weather Condition': lambda x: x.mode()[0] if not x.mode().empty else "Unknown",
+        'Holiday/Promotion': lambda x: 1 if (x == 1).any() else 0,
+        'Seasonality': lambda x: x.mode()[0] if not x.mode().empty else "Unknown",
+        'Date': 'max',
+        'MonthStart': 'first',
+        'MonthEnd': 'first'
+    }
+    monthly_df = df.groupby(['Store ID', 'Product ID', 'Year_Month']).agg(agg_funcs).reset_index()
+    category_map = df.drop_duplicates(['Product ID'])[['Product ID', 'Category']]
+    return monthly_df.merge(category_map, on='Product ID', how='left')
+
+
+def reference_monthly_features(model, product_data, target_month_start):
+    """
+    The original per-product MonthlyModel.prepare_features loop, kept as the oracle
+    """
+    monthly_data = reference_monthly_aggregate(product_data)
+    target_month_start = pd.to_datetime(target_month_start).replace(day=1)
+
+    static_cat_features = model.feature_info.get('static_categorical_features', [])
+    monthly_latest = monthly_data.sort_values(by=['Product ID', 'MonthStart']).groupby('Product ID').last().reset_index()
+
+    def window(history, months):
+        return history[
+            (history['MonthStart'] >= (target_month_start - pd.DateOffset(months=months))) &
+            (history['MonthStart'] < target_month_start)
+        ]['Units Sold']
+
+    feature_rows = []
+    for _, row in monthly_latest.iterrows():
+        product_history = monthly_data[monthly_data['Product ID'] == row['Product ID']].sort_values('MonthStart')
+        feature_row = {}
+        for col in static_cat_features:
+            feature_row[col] = row[col] if col in row else 'Missing'
+        for i in range(1, 13):
+            lag_row = product_history[product_history['MonthStart'] == (target_month_start - pd.DateOffset(months=i)).replace(day=1)]
+            feature_row[f'UnitsSold_lag_{i}_month'] = lag_row['Units Sold'].iloc[0] if not lag_row.empty else 0
+        last_year_row = product_history[product_history['MonthStart'] == (target_month_start - pd.DateOffset(months=12)).replace(day=1)]
+        feature_row['UnitsSold_same_month_last_year'] = last_year_row['Units Sold'].iloc[0] if not last_year_row.empty else 0
+        three, six, twelve = window(product_history, 3), window(product_history, 6), window(product_history, 12)
+        feature_row['UnitsSold_roll_mean_3_month'] = three.mean() if not three.empty else 0
+        feature_row['UnitsSold_roll_std_3_month'] = three.std() if len(three) > 1 else 0
+        feature_row['UnitsSold_roll_mean_6_month'] = six.mean() if not six.empty else 0
+        feature_row['UnitsSold_roll_max_6_month'] = six.max() if not six.empty else 0
+        feature_row['UnitsSold_roll_mean_12_month'] = twelve.mean() if not twelve.empty else 0
+        sorted_history = product_history.sort_values('MonthStart', ascending=False)
+        if len(product_history) >= 2:
+            latest_val = sorted_history.iloc[0]['Units Sold']
+            prev_val = sorted_history.iloc[1]['Units Sold']
+            feature_row['UnitsSold_mom_change'] = (latest_val - prev_val) / prev_val if prev_val > 0 else 0
+            feature_row['UnitsSold_mom_change_lag1'] = sorted_history.iloc[1].get('UnitsSold_mom_change', 0)
+        else:
+            feature_row['UnitsSold_mom_change'] = 0
+            feature_row['UnitsSold_mom_change_lag1'] = 0
+        if len(product_history) >= 4:
+            latest_val = sorted_history.iloc[0]['Units Sold']
+            three_months_ago_val = sorted_history.iloc[3]['Units Sold']
+            feature_row['UnitsSold_qoq_change'] = (latest_val - three_months_ago_val) / three_months_ago_val if three_months_ago_val > 0 else 0
+        else:
+            feature_row['UnitsSold_qoq_change'] = 0
+        feature_row['Inventory_Level_current'] = row['Inventory Level']
+        feature_row['Inventory_to_Sales_Ratio'] = row['Inventory Level'] / row['Units Sold'] if row['Units Sold'] > 0 else 0
+        target_month = target_month_start.month
+        feature_row['next_month_Month'] = target_month
+        feature_row['next_month_Year'] = target_month_start.year
+        feature_row['next_month_Quarter'] = (target_month - 1) // 3 + 1
+        feature_row['next_month_IsHighSeason'] = 1 if target_month in [11, 12, 1, 7] else 0
+        for col_base in ['Demand Forecast', 'Price', 'Discount', 'Weather Condition', 'Holiday/Promotion', 'Seasonality']:
+            if col_base in row:
+                feature_row[f'{col_base}_next_month'] = row[col_base]
+        feature_rows.append(feature_row)
+
+    return encode_like_model(model, pd.DataFrame(feature_rows))
+
+
+class DailyFeatureBuilderTests(SimpleTestCase):
+    def assert_matches_reference(self, product_data, target_date):
+        expected = reference_daily_features(daily_model, product_data, target_date)
+        actual = daily_model.prepare_features(product_data, target_date)
+        assert_frame_equal(actual, expected, check_dtype=False)
+
+    def test_matches_reference_at_history_end(self):
+        self.assert_matches_reference(make_daily_history(), None)
+
+    def test_matches_reference_inside_history(self):
+        history = make_daily_history(seed=1)
+        for target_date in ['2025-06-10', '2025-06-15', '2025-05-01']:
+            with self.subTest(target_date=target_date):
+                self.assert_matches_reference(history, target_date)
+
+    def test_matches_reference_without_recent_sales(self):
+        history = make_daily_history(n_products=3, n_days=10, seed=2)
+        self.assert_matches_reference(history, '2025-09-01')
+
+
+class WeeklyFeatureBuilderTests(SimpleTestCase):
+    def test_aggregate_matches_reference(self):
+        history = make_daily_history(n_days=60)
+        history.loc[history.index % 3 == 0, 'Weather Condition'] = 'Rainy'
+        history.loc[history.index % 5 == 0, 'Seasonality'] = 'Winter'
+        expected = reference_weekly_aggregate(history)
+        actual = weekly_model.aggregate_to_weekly(history)
+        assert_frame_equal(actual, expected[actual.columns], check_dtype=False)
+
+    def test_matches_reference(self):
+        history = make_daily_history(n_days=60, seed=3)
+        for target in ['2025-06-23', '2025-06-11', '2025-05-05', '2025-09-01']:
+            with self.subTest(target=target):
+                expected = reference_weekly_features(weekly_model, history, target)
+                actual = weekly_model.prepare_features(history, target)
+                assert_frame_equal(actual, expected, check_dtype=False)
+
+
+class MonthlyFeatureBuilderTests(SimpleTestCase):
+    def test_aggregate_matches_reference(self):
+        history = make_daily_history(n_days=120)
+        history.loc[history.index % 3 == 0, 'Weather Condition'] = 'Sunny'
+        expected = reference_monthly_aggregate(history)
+        actual = monthly_model.aggregate_to_monthly(history)
+        assert_frame_equal(actual, expected[actual.columns], check_dtype=False)
+
+    def test_matches_reference(self):
+        history = make_daily_history(n_days=500, seed=4)
+        for target in ['2025-07-01', '2025-03-15', '2024-11-01', '2026-09-01']:
+            with self.subTest(target=target):
+                expected = reference_monthly_features(monthly_model, history, target)
+                actual = monthly_model.prepare_features(history, target)
+                assert_frame_equal(actual, expected, check_dtype=False)
+
+
+class EncodingPlanTests(SimpleTestCase):
+    def test_matches_encoder_with_unknown_and_missing_values(self):
+        from types import SimpleNamespace
+        from sklearn.preprocessing import OneHotEncoder
+
+        encoder = OneHotEncoder(handle_unknown='ignore', sparse_output=False).fit(
+            pd.DataFrame({'Category': ['Toys', 'Groceries'], 'Promo': ['0.0', '1.0']})
+        )
+        columns = ['Price', 'Stock', 'Category_Toys', 'Promo_1.0', 'Promo_0.0', 'Absent']
+        model = SimpleNamespace(
+            feature_info={'categorical_columns': ['Category', 'Promo']}, encoder=encoder, processed_feature_columns=columns
+        )
+        features = {
+            'Category': np.array(['Toys', 'Unknown', None, 'Groceries'], dtype=object),
+            'Promo': np.array([1.0, 0.0, np.nan, 1.0]),
+            'Price': np.array([2.5, np.nan, 4.0, 1.0]),
+            'Stock': np.array([np.nan] * 4),
+            'Unused': np.arange(4),
+        }
+        plan = EncodingPlan.from_encoder(columns, encoder, ['Category', 'Promo'])
+        X = plan.encode(features, 4)
+        self.assertEqual(X.to_numpy().dtype, np.float32)
+        assert_frame_equal(X, encode_like_model(model, pd.DataFrame(features)), check_dtype=False)
+
+    def test_dummies_plan_matches_get_dummies(self):
+        columns = ['Units', 'Weather_t+1_Rainy', 'Weather_Sunny', 'Weather_t+1_Sunny']
+        features = {'Units': np.array([1, 2, 3]), 'Weather_t+1': np.array(['Sunny', 'Rainy', 'Hail'], dtype=object)}
+        X = EncodingPlan.from_dummies(columns, ['Weather', 'Weather_t+1']).encode(features, 3)
+        expected = pd.get_dummies(pd.DataFrame(features), columns=['Weather_t+1'], dtype=int)
+        assert_frame_equal(X, expected.reindex(columns=columns, fill_value=0), check_dtype=False)
+
+
+class RecursiveForecastTests(SimpleTestCase):
+    def test_each_step_sees_previous_predictions_as_lag_1(self):
+        history = synthetic_history(5, 30, end_date='2025-06-20')
+        # Products are shuffled on purpose: results must follow sorted Product ID order
+        history = history.sample(frac=1, random_state=0)
+        dates = predictor.forecast_dates(pd.Timestamp('2025-06-20'), 'daily', 4)
+
+        with mock.patch.object(daily_model, 'predict', side_effect=lambda X: X['UnitsSold_lag_1'].to_numpy() + 1.0):
+            product_ids, predictions = predictor.recursive_forecast('daily', history, dates)
+
+        last_units = history[history['Date'] == '2025-06-20'].set_index('Product ID')['Units Sold'].sort_index()
+        self.assertEqual(list(product_ids), list(last_units.index))
+        expected = last_units.to_numpy()[:, None] + np.arange(1, 5)[None, :]
+        np.testing.assert_allclose(predictions, expected)
+
+    def test_monthly_dates_follow_calendar_months(self):
+        dates = predictor.forecast_dates(pd.Timestamp('2025-01-31'), 'monthly', 3)
+        self.assertEqual([date.strftime('%Y-%m') for date in dates], ['2025-02', '2025-03', '2025-04'])
+
+
+class ForecastBatcherTests(SimpleTestCase):
+    def setUp(self):
+        self.history = synthetic_history(6, 40, end_date='2025-06-20')
+        self.product_ids = sorted(self.history['Product ID'].unique())
+        patcher = mock.patch.object(
+            predictor, 'get_product_data',
+            side_effect=lambda product_ids, **kwargs: self.history[self.history['Product ID'].isin(product_ids)]
+        )
+        self.get_product_data = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def blocked_batcher(self, **options):
+        """
+        A batcher whose first model call holds until the returned event is set,
+        so requests made meanwhile find another request in flight
+        """
+        release = threading.Event()
+        started = threading.Event()
+
+        def predict(**kwargs):
+            if not started.is_set():
+                started.set()
+                release.wait(30)
+            return predictor.forecast(**kwargs)
+
+        batcher = ForecastBatcher(predict, **options)
+        blocker = threading.Thread(
+            target=batcher.predict, args=(self.product_ids[:1], 'daily', 1), kwargs={'last_date': '2025-06-20'}
+        )
+        blocker.start()
+        started.wait(30)
+        self.addCleanup(blocker.join)
+        self.addCleanup(release.set)
+        return batcher, release
+
+    def test_concurrent_requests_share_one_model_call(self):
+        requests = [(self.product_ids[:2], 2), (self.product_ids[1:4], 4), (self.product_ids[4:], 1)]
+        expected = [
+            predictor.forecast(product_ids, 'daily', n_periods, last_date='2025-06-20')
+            for product_ids, n_periods in requests
+        ]
+        batcher, release = self.blocked_batcher(window=0.2)
+        self.get_product_data.reset_mock()
+        results = [None] * len(requests)
+
+        def run(index, product_ids, n_periods):
+            results[index] = batcher.predict(product_ids, 'daily', n_periods, last_date='2025-06-20')
+
+        threads = [threading.Thread(target=run, args=(i, *request)) for i, request in enumerate(requests)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.get_product_data.call_count, 1)
+        self.assertEqual(batcher.stats()['requests'], 3)
+        for result, reference in zip(results, expected):
+            assert_frame_equal(result.to_frame(), reference.to_frame())
+
+    def test_lone_request_runs_without_waiting_for_the_window(self):
+        batcher = ForecastBatcher(lambda **kwargs: predictor.forecast(**kwargs), window=60)
+        started = time.monotonic()
+        result = batcher.predict(self.product_ids[:2], 'daily', 1, last_date='2025-06-20')
+        self.assertLess(time.monotonic() - started, 30)
+        self.assertEqual(sorted(result.product_ids), self.product_ids[:2])
+
+    def test_full_batch_runs_without_waiting_for_the_window(self):
+        batcher, release = self.blocked_batcher(window=60, max_size=2)
+        started = time.monotonic()
+        result = batcher.predict(self.product_ids[:2], 'daily', 1, last_date='2025-06-20')
+        self.assertLess(time.monotonic() - started, 30)
+        self.assertEqual(sorted(result.product_ids), self.product_ids[:2])
+
+class ForecastResultTests(SimpleTestCase):
+    def setUp(self):
+        dates = pd.date_range('2025-06-21', periods=3)
+        predictions = [[1.4, 2.3, 0.2], [np.nan, 5.0, 5.5], [np.nan, np.nan, np.nan]]
+        self.result = ForecastResult('weekly', 'weekly-v1', [3, 7, 9], dates, predictions)
+
+    def test_summary_records_match_the_dataframe_summary(self):
+        expected = summarize_predictions(self.result.to_frame()).to_dict(orient='records')
+        self.assertEqual(self.result.summary_records(), expected)
+        self.assertEqual(
+            [(record['Product_ID'], record['Total_Predicted_Units_Sold'], record['Actual_Forecast_Days'])
+             for record in expected],
+            [(3, 4, 21), (7, 10, 14)]
+        )
+
+    def test_select_keeps_result_order_and_first_periods(self):
+        selected = self.result.select([9, 3], 2)
+        self.assertEqual(selected.product_ids.tolist(), [3, 9])
+        self.assertEqual(len(selected.dates), 2)
+        np.testing.assert_array_equal(selected.predictions, [[1.4, 2.3], [np.nan, np.nan]])
+
+
+class SlowModel:
+    instances = 0
+
+    def __init__(self):
+        time.sleep(0.05)
+        SlowModel.instances += 1
+        self.model = object()
+        self.model_version = f'daily-v{SlowModel.instances}'
+
+
+class ModelRegistryTests(SimpleTestCase):
+    def setUp(self):
+        SlowModel.instances = 0
+        self.registry = ModelRegistry({'daily': ('api.tests', 'SlowModel')})
+
+    def test_model_is_loaded_on_first_use_only(self):
+        self.assertIn('daily', self.registry)
+        self.assertFalse(self.registry.is_loaded('daily'))
+        self.assertIs(self.registry['daily'], self.registry.get('daily'))
+        self.assertEqual(SlowModel.instances, 1)
+        with self.assertRaises(KeyError):
+            self.registry.get('hourly')
+
+    def test_concurrent_first_use_loads_once(self):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.registry.get('daily'))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(SlowModel.instances, 1)
+        self.assertTrue(all(model is results[0] for model in results))
+
+    def test_reload_swaps_model_while_holders_keep_the_old_one(self):
+        in_flight = self.registry.get('daily')
+        self.assertEqual(self.registry.reload(), {'daily': 'daily-v2'})
+        self.assertEqual(in_flight.model_version, 'daily-v1')
+        self.assertIsNot(self.registry.get('daily'), in_flight)
+        self.assertEqual(self.registry.version('daily'), 'daily-v2')
+
+    def test_changed_model_files_are_picked_up(self):
+        with mock.patch('api.ml_models.registry.model_fingerprint', return_value=('manifest', 1, 10)):
+            self.registry.get('daily')
+            self.assertEqual(self.registry.check_for_updates(), [])
+        with mock.patch('api.ml_models.registry.model_fingerprint', return_value=('manifest', 2, 10)):
+            self.assertEqual(self.registry.check_for_updates(), ['daily'])
+        self.assertEqual(self.registry.version('daily'), 'daily-v2')
+
+
+    def test_reload_keeps_the_current_model_when_the_new_artifact_is_rejected(self):
+        self.registry.get('daily')
+        rejected = SlowModel()
+        rejected.artifact_error = 'checksum mismatch'
+        with mock.patch.object(self.registry, '_build', return_value=(rejected, ('manifest', 2, 10), 0.1)), \
+                self.assertLogs('api.ml_models.registry', level='WARNING'):
+            self.assertEqual(self.registry.reload(), {'daily': 'daily-v1'})
+
+class ModelArtifactTests(SimpleTestCase):
+    def setUp(self):
+        import xgboost
+        from sklearn.preprocessing import OneHotEncoder
+
+        self.model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.model_dir)
+        rng = np.random.default_rng(0)
+        self.X = pd.DataFrame(rng.uniform(0, 10, size=(200, 3)), columns=['a', 'b', 'c'])
+        self.model = xgboost.XGBRegressor(n_estimators=5, max_depth=3).fit(self.X, self.X['a'] * 2 + self.X['b'])
+        self.encoder = OneHotEncoder(handle_unknown='ignore', sparse_output=False, dtype=np.int32).fit(
+            pd.DataFrame({'Category': ['Toys', 'Groceries'], 'Seasonality': ['Winter', 'Summer']})
+        )
+        self.feature_info = {'processed_feature_columns_list': ['a', 'b', 'c']}
+
+    def test_round_trip_predicts_and_encodes_like_the_original(self):
+        manifest = save_artifact('weekly', 7, self.model, self.feature_info, self.encoder, model_dir=self.model_dir)
+        artifact = load_artifact('weekly', 7, model_dir=self.model_dir)
+
+        self.assertEqual(artifact.version, manifest['model_version'])
+        self.assertEqual(artifact.feature_info, self.feature_info)
+        np.testing.assert_array_equal(artifact.model.predict(self.X), self.model.predict(self.X))
+        sample = pd.DataFrame({'Category': ['Toys', 'Unknown'], 'Seasonality': ['Summer', 'Winter']})
+        np.testing.assert_array_equal(artifact.encoder.transform(sample), self.encoder.transform(sample))
+        self.assertIsNone(load_artifact('daily', 7, model_dir=self.model_dir))
+
+    def test_corrupted_booster_and_unknown_format_version_are_rejected(self):
+        manifest = save_artifact('daily', 7, self.model, self.feature_info, {'all_categorical_to_ohe': []},
+                                 model_dir=self.model_dir)
+        booster_path = f"{self.model_dir}/{manifest['booster']['file']}"
+        with open(booster_path, 'r+b') as f:
+            f.seek(100)
+            f.write(b'\x00\x01')
+        with self.assertRaisesRegex(ModelArtifactError, 'Checksum'):
+            load_artifact('daily', 7, model_dir=self.model_dir)
+
+        path = manifest_path('daily', 7, self.model_dir)
+        path.write_text(json.dumps(dict(manifest, format_version=99)))
+        with self.assertRaisesRegex(ModelArtifactError, 'format version'):
+            load_artifact('daily', 7, model_dir=self.model_dir)
+
+
+class TreeEngineTests(SimpleTestCase):
+    def test_matches_booster_with_missing_values_and_early_stopping(self):
+        import xgboost
+
+        rng = np.random.default_rng(0)
+        X = pd.DataFrame(rng.uniform(0, 10, size=(400, 4)), columns=['a', 'b', 'c', 'd'])
+        y = X['a'] * 3 - X['b'] + rng.normal(0, 1, 400)
+        X.iloc[::7, 1] = np.nan
+        model = xgboost.XGBRegressor(n_estimators=60, max_depth=5, early_stopping_rounds=3)
+        model.fit(X[:300], y[:300], eval_set=[(X[300:], y[300:])], verbose=False)
+
+        compiled = CompiledTreeEnsemble.from_model(model)
+        self.assertLessEqual(compiled.n_trees, 60)
+        np.testing.assert_allclose(compiled.predict(X[['d', 'c', 'b', 'a']]), model.predict(X), rtol=1e-5, atol=1e-3)
+
+    def test_production_models_match_native_predict(self):
+        history = synthetic_history(20, 60, end_date='2025-06-20')
+        for model in (daily_model, weekly_model, monthly_model):
+            X = model.prepare_features(history, pd.Timestamp('2025-06-21'))
+            with self.settings(ML_TREE_ENGINE='numpy'):
+                engine = predict_trees(model, X)
+            with self.settings(ML_TREE_ENGINE='xgboost'):
+                native = predict_trees(model, X)
+            np.testing.assert_allclose(engine, native, rtol=1e-5, atol=1e-2)
+
+
+class MovingAverageTests(TestCase):
+    def setUp(self):
+        self.products = create_catalog()
+        self.product_ids = [product.product_id for product in self.products]
+        self.predictor = MultiModelPredictor()
+        self.reference_date = timezone.now().date()
+
+    def test_batched_matches_single_product(self):
+        with self.assertNumQueries(1):
+            batched = self.predictor._calculate_moving_averages(self.product_ids, self.reference_date)
+        for product_id in self.product_ids:
+            self.assertEqual(
+                batched[product_id],
+                self.predictor._calculate_simple_moving_average(product_id, self.reference_date)
+            )
+        self.assertEqual(batched[self.product_ids[-1]], 0.0)
+
+    def test_history_frame_matches_query(self):
+        history = self.predictor.get_product_data(self.product_ids)
+        from_history = self.predictor._moving_averages_from_history(history, self.reference_date)
+        from_query = self.predictor._calculate_moving_averages(self.product_ids, self.reference_date)
+        for product_id in self.product_ids:
+            self.assertAlmostEqual(from_history.get(product_id, 0.0), from_query[product_id])
+
+    def test_get_product_data_query_count_is_constant(self):
+        with self.assertNumQueries(2):
+            history = self.predictor.get_product_data(self.product_ids, time_horizon='weekly')
+        self.assertEqual(set(history['Product ID']), set(self.product_ids))
+        self.assertTrue((history['Demand Forecast'] >= 0).all())
+
+
+    def test_history_and_forecast_dates_follow_the_project_date(self):
+        today = timezone.localdate() + timedelta(days=3)
+        with mock.patch('django.utils.timezone.localdate', return_value=today):
+            history = self.predictor.get_product_data(self.product_ids)
+            result = self.predictor.forecast(self.product_ids, 'daily', 2)
+        self.assertEqual(history['Date'].max(), pd.Timestamp(today))
+        self.assertEqual(result.dates, [pd.Timestamp(today + timedelta(days=1)), pd.Timestamp(today + timedelta(days=2))])
+
+class ForecastCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        forecast_cache.reset_stats()
+        self.products = create_catalog()
+        self.product_ids = [product.product_id for product in self.products]
+
+    def forecast(self, product_ids):
+        with mock.patch.object(predictor, 'forecast', wraps=predictor.forecast) as predict:
+            results = get_product_sales_prediction(product_ids, time_horizon='daily', periods=3)
+        computed = predict.call_args.kwargs['product_ids'] if predict.called else []
+        return results, sorted(computed)
+
+    def test_overlapping_request_only_computes_missing_products(self):
+        first, computed = self.forecast(self.product_ids[:2])
+        self.assertEqual(computed, self.product_ids[:2])
+
+        second, computed = self.forecast(self.product_ids[:3])
+        self.assertEqual(computed, self.product_ids[2:3])
+        self.assertEqual(second[:2], first)
+        self.assertEqual([record['Product_ID'] for record in second], self.product_ids[:3])
+
+        stats = forecast_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 3))
+
+    def test_new_sale_invalidates_only_that_product(self):
+        self.forecast(self.product_ids[:2])
+        SalesRecords.objects.create(
+            transaction_date=timezone.now(), product=self.products[0],
+            quantity_sold=5, unit_price_at_sale=10.0
+        )
+        _, computed = self.forecast(self.product_ids[:2])
+        self.assertEqual(computed, self.product_ids[:1])
+
+    def test_stock_change_invalidates_but_rename_does_not(self):
+        self.forecast(self.product_ids[:1])
+        product = Products.objects.get(product_id=self.product_ids[0])
+        product.product_name = 'Renamed'
+        product.save()
+        _, computed = self.forecast(self.product_ids[:1])
+        self.assertEqual(computed, [])
+
+        product.current_stock += 1
+        product.save()
+        _, computed = self.forecast(self.product_ids[:1])
+        self.assertEqual(computed, self.product_ids[:1])
+
+    def test_forecasts_carry_model_version_and_reload_recomputes(self):
+        results, _ = self.forecast(self.product_ids[:2])
+        self.assertEqual({record['Model_Version'] for record in results}, {daily_model.model_version})
+
+        with mock.patch.object(predictor.models, 'version', return_value='daily-retrained'):
+            _, computed = self.forecast(self.product_ids[:2])
+        self.assertEqual(computed, self.product_ids[:2])
+
+
+class ForecastSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = create_catalog()
+        self.product_ids = [product.product_id for product in self.products]
+        call_command('precompute_forecasts', horizons=['daily'], periods=3, batch_size=2, workers=1, stdout=StringIO())
+
+    def test_command_writes_one_snapshot_per_product(self):
+        snapshots = ForecastSnapshot.objects.filter(time_horizon='daily', periods=3)
+        self.assertEqual(sorted(snapshots.values_list('product_id', flat=True)), self.product_ids)
+
+    def test_fresh_snapshots_are_served_without_inference(self):
+        with mock.patch.object(predictor, 'forecast') as predict:
+            records, source = get_forecasts(self.product_ids, 'daily', 3)
+        predict.assert_not_called()
+        self.assertEqual(source, 'snapshot')
+        self.assertEqual([record['Product_ID'] for record in records], self.product_ids)
+
+    def test_new_sale_drops_snapshot_and_falls_back_to_live(self):
+        SalesRecords.objects.create(
+            transaction_date=timezone.now(), product=self.products[0],
+            quantity_sold=5, unit_price_at_sale=10.0
+        )
+        self.assertFalse(ForecastSnapshot.objects.filter(product=self.products[0]).exists())
+        records, source = get_forecasts(self.product_ids, 'daily', 3)
+        self.assertEqual(source, 'mixed')
+        self.assertEqual([record['Product_ID'] for record in records], self.product_ids)
+
+
+    def test_sale_during_precompute_is_not_covered_by_a_stale_snapshot(self):
+        forecast = predictor.forecast
+
+        def forecast_with_sale(**kwargs):
+            result = forecast(**kwargs)
+            SalesRecords.objects.create(
+                transaction_date=timezone.now(), product=self.products[0],
+                quantity_sold=5, unit_price_at_sale=10.0
+            )
+            return result
+
+        before = timezone.now()
+        with mock.patch.object(predictor, 'forecast', side_effect=forecast_with_sale):
+            call_command('precompute_forecasts', horizons=['daily'], periods=3, batch_size=10, workers=1, stdout=StringIO())
+
+        snapshots = ForecastSnapshot.objects.filter(time_horizon='daily', periods=3)
+        self.assertEqual(sorted(snapshots.values_list('product_id', flat=True)), self.product_ids[1:])
+        sale = SalesRecords.objects.latest('created_at')
+        self.assertTrue(all(before <= snapshot.computed_at <= sale.created_at for snapshot in snapshots))
+
+class InferenceWorkerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.socket_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.socket_dir)
+        self.address = os.path.join(self.socket_dir, 'inference.sock')
+        self.products = create_catalog()
+        self.product_ids = [product.product_id for product in self.products]
+
+    def test_workers_answer_over_the_socket(self):
+        server = InferenceServer(address=self.address, workers=1)
+        server.start()
+        self.addCleanup(server.stop)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        client = InferenceClient(self.address, timeout=60)
+        self.addCleanup(client.close)
+        self.assertEqual(client.versions()['daily'], daily_model.model_version)
+
+    def test_unanswered_request_times_out(self):
+        from multiprocessing.connection import Listener
+
+        listener = Listener(self.address, authkey=inference_authkey())
+        self.addCleanup(listener.close)
+        accepted = []
+        threading.Thread(target=lambda: accepted.append(listener.accept()), daemon=True).start()
+
+        client = InferenceClient(self.address, timeout=0.2)
+        with self.assertRaises(InferenceTimeout):
+            client.versions()
+        self.assertIsNone(client._local.connection)
+
+    def test_forecasts_go_to_the_pool_and_fall_back_when_it_is_down(self):
+        with override_settings(ML_INFERENCE_ADDRESS=self.address):
+            remote = [{'Product_ID': self.product_ids[0], 'Model_Version': 'remote'}]
+            with mock.patch.object(InferenceClient, 'forecast', return_value=remote) as forecast:
+                self.assertEqual(get_product_sales_prediction(self.product_ids[:1], 'daily', 3), remote)
+            forecast.assert_called_once_with(self.product_ids[:1], 'daily', 3, None)
+
+            # Nothing listens at the address, so the forecast runs in this process
+            records = get_product_sales_prediction(self.product_ids[:2], 'daily', 3)
+            self.assertEqual([record['Product_ID'] for record in records], self.product_ids[:2])
+
+            with override_settings(ML_INFERENCE_FALLBACK=False):
+                self.assertIn('error', get_product_sales_prediction(self.product_ids[:2], 'daily', 3))
+
+    def test_pool_forecasts_are_cached_and_invalidated_in_the_web_process(self):
+        def remote(product_ids, time_horizon, periods, last_date=None):
+            return [{'Product_ID': product_id, 'Model_Version': daily_model.model_version} for product_id in product_ids]
+
+        with override_settings(ML_INFERENCE_ADDRESS=self.address), \
+                mock.patch.object(InferenceClient, 'model_version', return_value=daily_model.model_version), \
+                mock.patch.object(InferenceClient, 'forecast', side_effect=remote) as forecast:
+            get_product_sales_prediction(self.product_ids[:2], 'daily', 3)
+            get_product_sales_prediction(self.product_ids[:2], 'daily', 3)
+            SalesRecords.objects.create(
+                transaction_date=timezone.now(), product=self.products[1],
+                quantity_sold=5, unit_price_at_sale=10.0
+            )
+            get_product_sales_prediction(self.product_ids[:2], 'daily', 3)
+
+        self.assertEqual([call.args[0] for call in forecast.call_args_list], [self.product_ids[:2], self.product_ids[1:2]])
+
+    def test_address_setting_is_parsed_like_the_command_option(self):
+        with override_settings(ML_INFERENCE_ADDRESS='127.0.0.1:6000'):
+            self.assertEqual(inference_address(), ('127.0.0.1', 6000))
+        with override_settings(ML_INFERENCE_ADDRESS=['10.0.0.5', 7000]):
+            self.assertEqual(inference_address(), ('10.0.0.5', 7000))
+        with override_settings(ML_INFERENCE_ADDRESS='/run/forecast/inference.sock'):
+            self.assertEqual(inference_address(), '/run/forecast/inference.sock')
+
+
+class DailyProductSalesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = create_catalog()
+        self.product_ids = [product.product_id for product in self.products]
+
+    def daily_rows(self):
+        return sorted(DailyProductSales.objects.values_list(
+            'product_id', 'date', 'units_sold', 'revenue', 'discount', 'transactions', 'promotion'
+        ))
+
+    def test_sales_keep_the_table_equal_to_a_backfill(self):
+        sale = SalesRecords.objects.create(
+            transaction_date=timezone.now() - timedelta(days=100), product=self.products[-1],
+            quantity_sold=4, unit_price_at_sale=2.5, discount_applied=1.0, promotion_marker=True
+        )
+        sale.transaction_date = timezone.now() - timedelta(days=3)
+        sale.quantity_sold = 6
+        sale.save()
+        SalesRecords.objects.filter(product=self.products[0]).order_by('transaction_date').first().delete()
+
+        maintained = self.daily_rows()
+        self.assertEqual(backfill_daily_sales(), len(maintained))
+        self.assertEqual(self.daily_rows(), maintained)
+        self.assertFalse(DailyProductSales.objects.filter(
+            product=self.products[-1], date=timezone.localdate(timezone.now() - timedelta(days=100))
+        ).exists())
+
+    def test_refresh_updates_an_existing_day_in_place(self):
+        day = timezone.localdate()
+        SalesRecords.objects.create(
+            transaction_date=timezone.now(), product=self.products[0],
+            quantity_sold=5, unit_price_at_sale=10.0
+        )
+        row = DailyProductSales.objects.get(product=self.products[0], date=day)
+        SalesRecords.objects.filter(product=self.products[0], transaction_date__date=day).update(quantity_sold=7)
+
+        refresh_daily_sales([(self.product_ids[0], day), (self.product_ids[0], day)])
+        refresh_daily_sales([(self.product_ids[0], day)])
+        updated = DailyProductSales.objects.get(product=self.products[0], date=day)
+        self.assertEqual(updated.pk, row.pk)
+        self.assertEqual(updated.units_sold, sum(SalesRecords.objects.filter(
+            product=self.products[0], transaction_date__date=day
+        ).values_list('quantity_sold', flat=True)))
+
+    def test_history_has_the_daily_totals_of_the_transactions(self):
+        with self.settings(SALES_HISTORY_SOURCE='transactions'):
+            transactions = predictor.get_product_data(self.product_ids)
+        with self.assertNumQueries(2):
+            daily = predictor.get_product_data(self.product_ids)
+
+        per_day = transactions.groupby(['Product ID', 'Date'])['Units Sold'].sum()
+        self.assertEqual(per_day.to_dict(), daily.set_index(['Product ID', 'Date'])['Units Sold'].to_dict())
+        np.testing.assert_allclose(
+            daily.groupby('Product ID')['Demand Forecast'].first(),
+            transactions.groupby('Product ID')['Demand Forecast'].first()
+        )
+
+    def test_dashboard_totals_match_the_transactions(self):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('owner', password='x'))
+        year = timezone.now().year
+        url = f'/api/dashboard-summary/?year={year}&include_breakdown=true'
+        daily = client.get(url).json()
+        cache.clear()
+        with self.settings(SALES_HISTORY_SOURCE='transactions'):
+            transactions = client.get(url).json()
+        self.assertEqual(daily, transactions)
+
+
+class TrainModelsTests(TestCase):
+    def setUp(self):
+        create_catalog(n_days=60)
+        self.model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.model_dir)
+
+    def test_trains_from_the_daily_table_and_writes_artifacts_with_metrics(self):
+        out = StringIO()
+        call_command(
+            'train_models', horizons=['daily', 'weekly'], days=35, end_date=timezone.localdate(),
+            n_estimators=20, early_stopping_rounds=5, threads=2, output_dir=self.model_dir, force=True,
+            stdout=out
+        )
+        self.assertIn('wrote 2 model(s)', out.getvalue())
+
+        for time_horizon, wrapper in (('daily', daily_model), ('weekly', weekly_model)):
+            artifact = load_artifact(time_horizon, 1, model_dir=self.model_dir)
+            training = artifact.manifest['training']
+            self.assertEqual(artifact.feature_info, wrapper.feature_info)
+            self.assertGreater(training['train_rows'], 0)
+            self.assertGreater(training['validation_rows'], 0)
+            self.assertLessEqual(training['best_iteration'], 20)
+            self.assertIsNotNone(training['validation']['mae'])
+            self.assertIn('fit_seconds', training['timings'])
+
+
+def create_purchase_orders(products, n_orders=12, seed=1):
+    """
+    Purchase orders for all but the last product over the last 80 days
+    """
+    from .models import PurchaseOrderItems, PurchaseOrders
+
+    today = timezone.localdate()
+    rng = np.random.default_rng(seed)
+    for i in range(n_orders):
+        order = PurchaseOrders.objects.create(po_id=f'PO{i}', order_date=today - timedelta(days=int(rng.integers(0, 80))))
+        for product in products[:-1]:
+            PurchaseOrderItems.objects.create(
+                purchase_order=order, product=product, ordered_quantity=int(rng.integers(1, 50))
+            )
+
+
+def reference_units_ordered(product, date):
+    """
+    The original per-row DataPreparation._get_units_ordered lookup, kept as the oracle
+    """
+    from .models import PurchaseOrderItems
+
+    po_items = PurchaseOrderItems.objects.filter(
+        product=product,
+        purchase_order__order_date__gte=date - timedelta(days=30),
+        purchase_order__order_date__lte=date
+    )
+    return sum(item.ordered_quantity for item in po_items)
+
+
+class UnitsOrderedTests(TestCase):
+    def setUp(self):
+        self.products = create_catalog()
+        create_purchase_orders(self.products)
+
+    def test_matches_the_per_row_lookup_with_a_constant_number_of_queries(self):
+        from .ml_models.data_preparation import DataPreparation
+
+        preparation = DataPreparation()
+        start_date = timezone.localdate() - timedelta(days=40)
+        for source in ('daily', 'transactions'):
+            with self.settings(SALES_HISTORY_SOURCE=source), self.assertNumQueries(4 if source == 'daily' else 3):
+                df = preparation.collect_sales_data(start_date)
+            products = {product.product_id: product for product in self.products}
+            expected = [reference_units_ordered(products[row.Product_ID], row.Date) for row in df.itertuples()]
+            self.assertEqual(df['Units_Ordered'].tolist(), expected)
+            self.assertGreater(df['Units_Ordered'].sum(), 0)
+
+
+class TrainingDataFileTests(TestCase):
+    def setUp(self):
+        create_catalog()
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+
+    def test_chunked_files_hold_the_collected_rows(self):
+        from .ml_models.data_preparation import DataPreparation, load_training_data
+
+        preparation = DataPreparation()
+        start_date = timezone.localdate() - timedelta(days=40)
+        expected = preparation.collect_sales_data(start_date)
+        expected['Date'] = pd.to_datetime(expected['Date'])
+
+        for name in ('training.parquet', 'training.arrow', 'training.csv'):
+            path = os.path.join(self.output_dir, name)
+            summary = preparation.write_training_data(path, start_date, chunk_size=7)
+            self.assertEqual(summary['rows'], len(expected))
+            self.assertEqual(pd.Timestamp(summary['last_date']), expected['Date'].max())
+
+            loaded = load_training_data(path)
+            if not name.endswith('.csv'):
+                self.assertEqual(loaded['Product_ID'].dtype.name, 'category')
+                self.assertEqual(loaded['Units_Sold'].dtype, np.int64)
+            loaded[['Product_ID', 'Category']] = loaded[['Product_ID', 'Category']].astype(object)
+            assert_frame_equal(loaded, expected, check_dtype=False)
+
+
+class TrainingDatasetTests(TestCase):
+    def setUp(self):
+        self.products = create_catalog()
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+
+    def assert_matches_full_extraction(self, dataset, start_date, end_date):
+        from .ml_models.data_preparation import DataPreparation
+
+        expected = DataPreparation().collect_sales_data(start_date, end_date).drop(columns='Demand Forecast')
+        expected['Date'] = pd.to_datetime(expected['Date'])
+        loaded = dataset.load().drop(columns='Demand Forecast')
+        loaded[['Product_ID', 'Category']] = loaded[['Product_ID', 'Category']].astype(object)
+        assert_frame_equal(loaded, expected, check_dtype=False)
+
+    def test_refresh_appends_new_days_and_re_extracts_changed_ones(self):
+        from .ml_models.training_dataset import TrainingDataset
+
+        dataset = TrainingDataset(self.output_dir)
+        today = timezone.localdate()
+        summary = dataset.refresh(today - timedelta(days=1), days=30)
+        self.assertEqual((summary['appended_days'], summary['re_extracted_days']), (30, 0))
+        self.assert_matches_full_extraction(dataset, today - timedelta(days=30), today - timedelta(days=1))
+
+        summary = dataset.refresh(today - timedelta(days=1), days=30)
+        self.assertEqual((summary['appended_days'], summary['re_extracted_days']), (0, 0))
+
+        old_sales = SalesRecords.objects.filter(transaction_date__date=today - timedelta(days=10))
+        old_sales.order_by('pk').first().delete()
+        # An update that does not touch updated_at, like a raw SQL fix, is caught by the day totals
+        SalesRecords.objects.filter(pk=old_sales.order_by('pk').last().pk).update(quantity_sold=99)
+        backfill_daily_sales(today - timedelta(days=10), today - timedelta(days=10))
+        sale = SalesRecords.objects.filter(transaction_date__date=today - timedelta(days=5)).first()
+        sale.quantity_sold += 1
+        sale.save()
+
+        summary = dataset.refresh(today, days=30)
+        self.assertEqual(summary, dict(summary, appended_days=1, re_extracted_days=2, dropped_days=1))
+        self.assert_matches_full_extraction(dataset, today - timedelta(days=29), today)
+
+
+class LatestProductDataTests(TestCase):
+    def setUp(self):
+        self.products = create_catalog(n_products=6)
+        create_purchase_orders(self.products)
+
+    def test_bulk_rows_match_the_latest_sale_of_each_product(self):
+        from .ml_models.data_preparation import DataPreparation
+
+        preparation = DataPreparation()
+        today = timezone.localdate()
+        averages = predictor._calculate_moving_averages(None, today)
+        for source in ('daily', 'transactions'):
+            with self.settings(SALES_HISTORY_SOURCE=source), self.assertNumQueries(3):
+                df = preparation.get_latest_product_data()
+            self.assertEqual(len(df), len(self.products))
+
+            # The latest individual sale under either source, not the day's DailyProductSales totals
+            for row in df.to_dict('records'):
+                product = Products.objects.get(product_id=row['Product_ID'])
+                latest = SalesRecords.objects.filter(product=product).order_by('-transaction_date').first()
+                units, promotion = (latest.quantity_sold, latest.promotion_marker) if latest else (0, False)
+                discount = latest.discount_applied if latest else 0.0
+                self.assertEqual(row['Date'], datetime.now().date())
+                self.assertEqual(row['Price'], product.unit_price)
+                self.assertEqual(row['Units_Sold'], units)
+                self.assertEqual(row['Discount'], discount)
+                self.assertEqual(row['Holiday/Promotion'], int(promotion))
+                self.assertEqual(row['Units_Ordered'], reference_units_ordered(product, today))
+                self.assertEqual(row['Demand Forecast'], averages.get(product.product_id, 0.0))
+
+
+class BacktestTests(SimpleTestCase):
+    def test_replays_the_last_cutoffs_through_the_serving_models(self):
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        output = os.path.join(output_dir, 'backtest.json')
+
+        call_command(
+            'backtest_forecasts', products=[20], history_days=150, cutoffs=3, horizons=['daily', 'weekly'],
+            output=output, stdout=StringIO()
+        )
+        with open(output) as f:
+            results = {result['time_horizon']: result for result in json.load(f)}
+
+        self.assertEqual(set(results), {'daily', 'weekly'})
+        for result in results.values():
+            self.assertEqual((result['cutoffs'], result['predictions']), (3, 60))
+            self.assertGreaterEqual(result['mae'], 0)
+            self.assertIsNotNone(result['feature_ms']['p95'])
+        # Cutoffs are the most recent complete periods
+        self.assertEqual(pd.Timestamp(results['weekly']['last_cutoff']).dayofweek, 0)
+        self.assertLessEqual(
+            pd.Timestamp(results['daily']['last_cutoff']), pd.Timestamp.now().normalize()
+        )
+
+
+class ForecastTimingTests(TestCase):
+    def setUp(self):
+        from .ml_models.timing import stage_histograms
+
+        cache.clear()
+        stage_histograms.clear()
+        self.addCleanup(stage_histograms.clear)
+        create_catalog()
+
+    def test_forecast_stages_are_reported_and_aggregated(self):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+
+        client = APIClient()
+        response = client.get('/api/products/?forecast=true&model=daily&periods=3')
+        self.assertEqual(response.status_code, 200)
+        stages = [entry.split(';')[0] for entry in response['Server-Timing'].split(', ')]
+        self.assertEqual(
+            stages, ['fetch', 'moving_average', 'features', 'predict', 'summarize', 'serialize', 'total']
+        )
+        self.assertNotIn('Server-Timing', client.get('/api/categories/'))
+
+        self.assertIn(client.get('/api/forecast-timing/stats/').status_code, (401, 403))
+        client.force_authenticate(User.objects.create_user('owner', password='x'))
+        stats = client.get('/api/forecast-timing/stats/').json()
+        self.assertEqual(stats['requests'], 1)
+        self.assertEqual(stats['stages']['predict']['samples'], 1)
+        self.assertLessEqual(stats['stages']['predict']['p50_ms'], stats['stages']['total']['p99_ms'])
+
+
+class ForecastStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = create_catalog(n_products=5)
+
+    @override_settings(FORECAST_STREAM_BATCH_SIZE=2)
+    def test_stream_sends_list_objects_one_batch_per_chunk(self):
+        from rest_framework.test import APIClient
+
+        client = APIClient()
+        expected = client.get('/api/products/?forecast=true&model=daily&periods=3').json()
+
+        with mock.patch('api.views.get_forecasts', wraps=get_forecasts) as forecasts:
+            response = client.get('/api/products/forecast-stream/?model=daily&periods=3')
+            self.assertTrue(response.streaming)
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+            chunks = [chunk.decode() for chunk in response.streaming_content]
+
+        self.assertEqual([len(call.kwargs['product_ids']) for call in forecasts.call_args_list], [2, 2, 1])
+        self.assertEqual(len(chunks), 3)
+        lines = ''.join(chunks).splitlines()
+        self.assertEqual([json.loads(line) for line in lines], expected)
+
+    def test_invalid_parameters_are_rejected_before_streaming(self):
+        from rest_framework.test import APIClient
+
+        response = APIClient().get('/api/products/forecast-stream/?model=hourly')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.streaming)
+
+
+@override_settings(FORECAST_JOB_WORKERS=0, FORECAST_JOB_BATCH_SIZE=2)
+class ForecastJobTests(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+
+        cache.clear()
+        self.products = create_catalog()
+        self.product_ids = [product.product_id for product in self.products]
+        self.client = APIClient()
+
+    def submit(self, **data):
+        return self.client.post('/api/forecast-jobs/', dict({'model': 'daily', 'periods': 3}, **data), format='json')
+
+    def test_job_runs_and_serves_paginated_results(self):
+        response = self.submit(category_name='grocer')
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual((job['status'], job['product_count'], job['completed_products']), ('done', 4, 4))
+        self.assertEqual(response['Location'], f"/api/forecast-jobs/{job['job_id']}/")
+
+        expected, _ = get_forecasts(self.product_ids, 'daily', 3)
+        page = self.client.get(f"/api/forecast-jobs/{job['job_id']}/?page_size=3").json()['results']
+        self.assertEqual((page['count'], page['total_pages']), (4, 2))
+        last_page = self.client.get(f"/api/forecast-jobs/{job['job_id']}/?page_size=3&page=2").json()['results']
+        self.assertEqual(page['results'] + last_page['results'], expected)
+
+    def test_repeat_request_reuses_the_job_until_it_expires(self):
+        first = self.submit(product_ids=self.product_ids[:2]).json()
+        with mock.patch('api.ml_models.forecast_jobs.get_forecasts') as forecasts:
+            repeat = self.submit(product_ids=self.product_ids[1::-1])
+        forecasts.assert_not_called()
+        self.assertEqual((repeat.status_code, repeat.json()['job_id']), (200, first['job_id']))
+        self.assertEqual(self.submit(product_ids=self.product_ids[:2], periods=4).status_code, 202)
+
+        ForecastJob.objects.filter(job_id=first['job_id']).update(expires_at=timezone.now())
+        self.assertEqual(self.client.get(f"/api/forecast-jobs/{first['job_id']}/").status_code, 404)
+        renewed = self.submit(product_ids=self.product_ids[:2])
+        self.assertEqual(renewed.status_code, 202)
+        self.assertNotEqual(renewed.json()['job_id'], first['job_id'])
+
+    def test_failed_forecasts_are_reported(self):
+        with mock.patch('api.ml_models.forecast_jobs.get_forecasts', return_value=({'error': 'model missing'}, 'live')):
+            job = self.submit().json()
+        self.assertEqual((job['status'], job['error']), ('failed', 'model missing'))
+        self.assertNotIn('results', self.client.get(f"/api/forecast-jobs/{job['job_id']}/").json())
+        self.assertEqual(self.submit(model='hourly').status_code, 400)
@@ -18,4 +18,9 @@ urlpatterns = [
     path('user-info/', UserInfoView.as_view(), name='user-info'),
     path('employees/', EmployeeListView.as_view(), name='employee-list'),
     path('employees/<int:pk>/', EmployeeDetailView.as_view(), name='employee-detail'),
+    path('forecast-cache/stats/', ForecastCacheStatsView.as_view(), name='forecast-cache-stats'),
+    path('forecast-timing/stats/', ForecastTimingStatsView.as_view(), name='forecast-timing-stats'),
+    path('forecast-jobs/', ForecastJobsView.as_view(), name='forecast-jobs'),
+    path('forecast-jobs/<str:job_id>/', ForecastJobDetailView.as_view(), name='forecast-job-detail'),
+    path('models/reload/', ModelReloadView.as_view(), name='model-reload'),
 ]
\ No newline at end of file
@@ -2,19 +2,27 @@ from .models import *
 from .serializers import *
 from rest_framework import viewsets, status
 from rest_framework.response import Response
-from rest_framework.decorators import api_view
+from rest_framework.decorators import action, api_view
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.permissions import AllowAny
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.db import transaction
 from django.shortcuts import get_object_or_404
-from .ml_models import get_product_sales_prediction
-from .ml_models.data_preparation import generate_training_data, get_current_product_data
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from .ml_models.batching import forecast_batcher
+from .ml_models.daily_sales import SOURCE_DAILY, history_source
+from .ml_models.forecast_cache import forecast_cache
+from .ml_models.forecast_jobs import forecast_jobs
+from .ml_models.forecast_snapshots import get_forecasts
+from .ml_models.registry import model_registry
+from .ml_models.timing import stage, stage_histograms
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.pagination import PageNumberPagination, LimitOffsetPagination
 import django_filters
-from django.db.models import Sum, Count, Avg, F
+from django.db.models import Sum, Count, F
 from django.db.models.functions import TruncMonth, Extract
 from django.utils import timezone
 from django.core.cache import cache
@@ -28,6 +36,70 @@ from rest_framework.permissions import IsAuthenticated
 import hashlib
 import hashlib
 import calendar
+import json
+
+def forecast_headers(forecast_results, forecast_source):
+    """
+    Response headers naming where forecasts came from and which model versions made them
+    """
+    versions = sorted({forecast.get('Model_Version') for forecast in forecast_results if forecast.get('Model_Version')})
+    headers = {'X-Forecast-Source': forecast_source}
+    if versions:
+        headers['X-Model-Version'] = ','.join(versions)
+    return headers
+
+def forecast_params(params):
+    """
+    Forecast parameters of a products list, stream or forecast job request
+
+    Args:
+        params: Query parameters or request body
+
+    Returns:
+        tuple: ((time_horizon, periods, last_date), None), or (None, error Response)
+    """
+    try:
+        # Get time horizon - daily, weekly or monthly
+        time_horizon = str(params.get('model', 'daily')).lower()
+        if time_horizon not in ['daily', 'weekly', 'monthly']:
+            return None, Response(
+                {"error": "Model must be either 'daily', 'weekly', or 'monthly'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Get number of periods (days, weeks, months)
+        default_periods = {
+            'daily': 7,
+            'weekly': 4,
+            'monthly': 3
+        }
+        periods = int(params.get('periods', default_periods.get(time_horizon, 7)))
+        if periods < 1 or periods > 90:  # Allow more generous upper limit
+            return None, Response(
+                {"error": f"Periods must be between 1 and 90 for {time_horizon} forecasts"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+            
+        # For backward compatibility with the 'days' parameter
+        if 'days' in params:
+            days = int(params.get('days'))
+            if days > 0:
+                if time_horizon == 'daily':
+                    periods = days
+                elif time_horizon == 'weekly':
+                    periods = (days + 6) // 7  # Round up to nearest week
+                else:
+                    periods = (days + 29) // 30  # Round up to nearest month
+                    
+    except (TypeError, ValueError):
+        return None, Response(
+            {"error": "Periods parameter must be a valid integer"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # Get last date parameter
+    last_date = params.get('last_date', None)
+    return (time_horizon, periods, last_date), None
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 10
@@ -107,6 +179,56 @@ class ProductsViewSet(viewsets.ModelViewSet):
             
         return qs
         
+    def forecast_product_ids(self, request):
+        """
+        IDs of the products a list or stream request forecasts
+        """
+        if 'id' in request.query_params:
+            # If specific product ID is provided in URL
+            return [request.query_params['id']]
+        # Otherwise forecast all products in the queryset (may be filtered by category)
+        return list(self.filter_queryset(self.get_queryset()).values_list('product_id', flat=True))
+    
+    def serialize_with_forecasts(self, products, forecast_results, forecast_source):
+        """
+        Serialized products, each with its forecast (or None) under 'forecast'
+        """
+        with stage("serialize"):
+            product_data = []
+            
+            # Create a mapping of forecast data for the serializer
+            forecast_mapping = {}
+            forecasts_by_product = {}
+            for forecast in forecast_results:
+                forecast_mapping[forecast['Product_ID']] = {
+                    'total_predicted_units': forecast['Total_Predicted_Units_Sold'],
+                    'forecast_days': forecast['Actual_Forecast_Days']
+                }
+                forecasts_by_product[forecast['Product_ID']] = forecast
+            
+            for product in products:
+                # Find matching forecast for this product
+                product_forecast = forecasts_by_product.get(product.product_id)
+                
+                # Serialize product with forecast data available
+                serializer = self.get_serializer(product)
+                serializer._forecast_data = forecast_mapping  # Pass forecast data to serializer
+                product_serialized = serializer.data
+                
+                # Add forecast data if available
+                if product_forecast:
+                    product_serialized['forecast'] = {
+                        'total_predicted_units': product_forecast['Total_Predicted_Units_Sold'],
+                        'forecast_days': product_forecast['Actual_Forecast_Days'],
+                        'source': forecast_source,
+                        'model_version': product_forecast.get('Model_Version'),
+                    }
+                else:
+                    product_serialized['forecast'] = None
+                
+                product_data.append(product_serialized)
+            return product_data
+        
     def list(self, request, *args, **kwargs):
         # Check if forecast is requested
         forecast = request.query_params.get('forecast', '').lower() == 'true'
@@ -116,61 +238,17 @@ class ProductsViewSet(viewsets.ModelViewSet):
             return super().list(request, *args, **kwargs)
         
         # For forecast requests, disable pagination to maintain existing behavior
+        # (GET products/forecast-stream/ streams large catalogs instead)
         self.pagination_class = None
         
-        # Get forecast parameters
-        try:
-            # Get time horizon - daily, weekly or monthly
-            time_horizon = request.query_params.get('model', 'daily').lower()
-            if time_horizon not in ['daily', 'weekly', 'monthly']:
-                return Response(
-                    {"error": "Model must be either 'daily', 'weekly', or 'monthly'"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Get number of periods (days, weeks, months)
-            default_periods = {
-                'daily': 7,
-                'weekly': 4,
-                'monthly': 3
-            }
-            periods = int(request.query_params.get('periods', default_periods.get(time_horizon, 7)))
-            if periods < 1 or periods > 90:  # Allow more generous upper limit
-                return Response(
-                    {"error": f"Periods must be between 1 and 90 for {time_horizon} forecasts"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-                
-            # For backward compatibility with the 'days' parameter
-            if 'days' in request.query_params:
-                days = int(request.query_params.get('days'))
-                if days > 0:
-                    if time_horizon == 'daily':
-                        periods = days
-                    elif time_horizon == 'weekly':
-                        periods = (days + 6) // 7  # Round up to nearest week
-                    else:
-                        periods = (days + 29) // 30  # Round up to nearest month
-                        
-        except ValueError:
-            return Response(
-                {"error": "Periods parameter must be a valid integer"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Get last date parameter
-        last_date = request.query_params.get('last_date', None)
+        params, error = forecast_params(request.query_params)
+        if error:
+            return error
+        time_horizon, periods, last_date = params
         
         # Get queryset (may be filtered by category)
         queryset = self.filter_queryset(self.get_queryset())
-        
-        # Get product IDs from queryset
-        if 'id' in request.query_params:
-            # If specific product ID is provided in URL
-            product_ids = [request.query_params['id']]
-        else:
-            # Otherwise forecast all products in queryset
-            product_ids = list(queryset.values_list('product_id', flat=True))
+        product_ids = self.forecast_product_ids(request)
         
         if not product_ids:
             return Response(
@@ -178,9 +256,9 @@ class ProductsViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Get predictions
+        # Get predictions (precomputed snapshots first, live inference for the rest)
         try:
-            forecast_results = get_product_sales_prediction(
+            forecast_results, forecast_source = get_forecasts(
                 product_ids=product_ids,
                 time_horizon=time_horizon,
                 periods=periods,
@@ -193,46 +271,77 @@ class ProductsViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
                 
-            # Get product details and add forecast data
-            product_data = []
-            
-            # Create a mapping of forecast data for the serializer
-            forecast_mapping = {}
-            for forecast in forecast_results:
-                forecast_mapping[forecast['Product_ID']] = {
-                    'total_predicted_units': forecast['Total_Predicted_Units_Sold'],
-                    'forecast_days': forecast['Actual_Forecast_Days']
-                }
-            
-            for product in queryset:
-                # Find matching forecast for this product
-                product_forecast = next(
-                    (f for f in forecast_results if f['Product_ID'] == product.product_id), 
-                    None
-                )
-                
-                # Serialize product with forecast data available
-                serializer = self.get_serializer(product)
-                serializer._forecast_data = forecast_mapping  # Pass forecast data to serializer
-                product_serialized = serializer.data
-                
-                # Add forecast data if available
-                if product_forecast:
-                    product_serialized['forecast'] = {
-                        'total_predicted_units': product_forecast['Total_Predicted_Units_Sold'],
-                        'forecast_days': product_forecast['Actual_Forecast_Days'],
-                    }
-                else:
-                    product_serialized['forecast'] = None
-                    
-                product_data.append(product_serialized)            
-            return Response(product_data)
+            product_data = self.serialize_with_forecasts(queryset, forecast_results, forecast_source)
+            return Response(product_data, headers=forecast_headers(forecast_results, forecast_source))
             
         except Exception as e:
             return Response(
                 {"error": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+    
+    @action(detail=False, methods=['get'], url_path='forecast-stream')
+    def forecast_stream(self, request):
+        """
+        Forecasts of the whole (filtered) catalog as newline-delimited JSON
+
+        Takes the parameters of list(?forecast=true) and writes the same
+        product objects, one per line, in the queryset's order. Products are
+        forecast FORECAST_STREAM_BATCH_SIZE at a time - history, features,
+        prediction and serialization of one batch - and each batch is sent
+        as soon as it is done, so the first lines arrive after one batch and
+        memory does not grow with the catalog. A failure after the response
+        has started ends the stream with an {"error": ...} line.
+        """
+        params, error = forecast_params(request.query_params)
+        if error:
+            return error
+        
+        product_ids = self.forecast_product_ids(request)
+        if not product_ids:
+            return Response(
+                {"error": "No products found to forecast"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        batch_size = max(1, getattr(settings, 'FORECAST_STREAM_BATCH_SIZE', 200))
+        response = StreamingHttpResponse(
+            self.stream_forecasts(product_ids, batch_size, *params),
+            content_type='application/x-ndjson'
+        )
+        # Keep reverse proxies from buffering the whole stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    def stream_forecasts(self, product_ids, batch_size, time_horizon, periods, last_date):
+        """
+        NDJSON chunks of serialized products with forecasts, one chunk per batch of products
+        """
+        for start in range(0, len(product_ids), batch_size):
+            batch_ids = product_ids[start:start + batch_size]
+            try:
+                forecast_results, forecast_source = get_forecasts(
+                    product_ids=batch_ids,
+                    time_horizon=time_horizon,
+                    periods=periods,
+                    last_date=last_date
+                )
+                if isinstance(forecast_results, dict) and "error" in forecast_results:
+                    yield json.dumps(forecast_results) + '\n'
+                    return
+                
+                # in_bulk loses the queryset's order
+                position = {str(product_id): index for index, product_id in enumerate(batch_ids)}
+                products = sorted(
+                    self.get_queryset().in_bulk(batch_ids).values(),
+                    key=lambda product: position[str(product.product_id)]
+                )
+                product_data = self.serialize_with_forecasts(products, forecast_results, forecast_source)
+            except Exception as e:
+                yield json.dumps({"error": str(e)}) + '\n'
+                return
+            
+            yield ''.join(json.dumps(product, cls=JSONEncoder) + '\n' for product in product_data)
             
     def retrieve(self, request, *args, **kwargs):
         # Check if forecast is requested
@@ -292,9 +401,9 @@ class ProductsViewSet(viewsets.ModelViewSet):
             
         last_date = request.query_params.get('last_date', None)
         
-        # Get prediction for this product
+        # Get prediction for this product (precomputed snapshot first, live inference otherwise)
         try:
-            forecast_results = get_product_sales_prediction(
+            forecast_results, forecast_source = get_forecasts(
                 product_ids=[instance.product_id],
                 time_horizon=time_horizon,
                 periods=periods,
@@ -307,31 +416,34 @@ class ProductsViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
                 
-            # Serialize product
-            serializer = self.get_serializer(instance)
+            with stage("serialize"):
+                # Serialize product
+                serializer = self.get_serializer(instance)
             
-            # Add forecast data for stock status calculation
-            if forecast_results and len(forecast_results) > 0:
-                forecast_mapping = {
-                    instance.product_id: {
-                        'total_predicted_units': forecast_results[0]['Total_Predicted_Units_Sold'],
-                        'forecast_days': forecast_results[0]['Actual_Forecast_Days']
+                # Add forecast data for stock status calculation
+                if forecast_results and len(forecast_results) > 0:
+                    forecast_mapping = {
+                        instance.product_id: {
+                            'total_predicted_units': forecast_results[0]['Total_Predicted_Units_Sold'],
+                            'forecast_days': forecast_results[0]['Actual_Forecast_Days']
+                        }
                     }
-                }
-                serializer._forecast_data = forecast_mapping
+                    serializer._forecast_data = forecast_mapping
             
-            product_serialized = serializer.data
+                product_serialized = serializer.data
             
-            # Add forecast data
-            if forecast_results and len(forecast_results) > 0:
-                product_serialized['forecast'] = {
-                    'total_predicted_units': forecast_results[0]['Total_Predicted_Units_Sold'],
-                    'forecast_days': forecast_results[0]['Actual_Forecast_Days'],
-                }
-            else:
-                product_serialized['forecast'] = None
+                # Add forecast data
+                if forecast_results and len(forecast_results) > 0:
+                    product_serialized['forecast'] = {
+                        'total_predicted_units': forecast_results[0]['Total_Predicted_Units_Sold'],
+                        'forecast_days': forecast_results[0]['Actual_Forecast_Days'],
+                        'source': forecast_source,
+                        'model_version': forecast_results[0].get('Model_Version'),
+                    }
+                else:
+                    product_serialized['forecast'] = None
                 
-            return Response(product_serialized)
+            return Response(product_serialized, headers=forecast_headers(forecast_results, forecast_source))
             
         except Exception as e:
             return Response(
@@ -407,6 +519,37 @@ class SalesRecordsViewSet(viewsets.ModelViewSet):
             output_serializer = self.get_serializer(sales_record)
             return Response(output_serializer.data, status=status.HTTP_201_CREATED)
 
+def dashboard_sales(start_date, end_date):
+    """
+    Sales rows of a date range and the aggregates the dashboard needs over them
+
+    Reads the per product and day DailyProductSales table unless
+    SALES_HISTORY_SOURCE is "transactions", in which case every SalesRecords
+    row is aggregated.
+
+    Returns:
+        tuple: (queryset, dict of aggregate expressions, month expression)
+    """
+    if history_source() == SOURCE_DAILY:
+        rows = DailyProductSales.objects.filter(date__gte=start_date, date__lte=end_date)
+        return rows, {
+            'sales_volume': Sum('units_sold'),
+            'revenue': Sum('revenue'),
+            'discount': Sum('discount'),
+            'transactions': Sum('transactions'),
+        }, Extract('date', 'month')
+
+    rows = SalesRecords.objects.filter(
+        transaction_date__date__gte=start_date,
+        transaction_date__date__lte=end_date
+    )
+    return rows, {
+        'sales_volume': Sum('quantity_sold'),
+        'revenue': Sum(F('quantity_sold') * F('unit_price_at_sale')),
+        'discount': Sum('discount_applied'),
+        'transactions': Count('sales_record_id'),
+    }, Extract('transaction_date', 'month')
+
 @api_view(['GET'])
 def dashboard_summary(request):
     """
@@ -443,22 +586,19 @@ def dashboard_summary(request):
         return Response(cached_data)
     
     try:
-        sales_aggregation = SalesRecords.objects.filter(
-            transaction_date__date__gte=start_date,
-            transaction_date__date__lte=end_date
-        ).aggregate(
-            total_sales_volume=Sum('quantity_sold'),
-            total_revenue=Sum(F('quantity_sold') * F('unit_price_at_sale')),
-            total_discount_given=Sum('discount_applied'),
-            total_transactions=Count('sales_record_id'),
-            average_transaction_value=Avg(F('quantity_sold') * F('unit_price_at_sale'))
+        sales, measures, month = dashboard_sales(start_date, end_date)
+        sales_aggregation = sales.aggregate(
+            total_sales_volume=measures['sales_volume'],
+            total_revenue=measures['revenue'],
+            total_discount_given=measures['discount'],
+            total_transactions=measures['transactions']
         )
         
         total_sales_volume = sales_aggregation['total_sales_volume'] or 0
         total_revenue = float(sales_aggregation['total_revenue'] or 0)
         total_discount_given = float(sales_aggregation['total_discount_given'] or 0)
         total_transactions = sales_aggregation['total_transactions'] or 0
-        average_transaction_value = float(sales_aggregation['average_transaction_value'] or 0)
+        average_transaction_value = total_revenue / total_transactions if total_transactions else 0.0
         
         net_revenue = total_revenue - total_discount_given
         
@@ -474,16 +614,13 @@ def dashboard_summary(request):
         }
         
         if include_monthly_chart:
-            monthly_data = SalesRecords.objects.filter(
-                transaction_date__date__gte=start_date,
-                transaction_date__date__lte=end_date
-            ).annotate(
-                month=Extract('transaction_date', 'month')
+            monthly_data = sales.annotate(
+                month=month
             ).values('month').annotate(
-                monthly_revenue=Sum(F('quantity_sold') * F('unit_price_at_sale')),
-                monthly_sales_volume=Sum('quantity_sold'),
-                monthly_transactions=Count('sales_record_id'),
-                monthly_discount=Sum('discount_applied')
+                monthly_revenue=measures['revenue'],
+                monthly_sales_volume=measures['sales_volume'],
+                monthly_transactions=measures['transactions'],
+                monthly_discount=measures['discount']
             ).order_by('month')
             
             monthly_chart_data = []
@@ -511,16 +648,13 @@ def dashboard_summary(request):
             summary_data['monthly_chart_data'] = monthly_chart_data
         
         if include_breakdown:
-            top_products = SalesRecords.objects.filter(
-                transaction_date__date__gte=start_date,
-                transaction_date__date__lte=end_date
-            ).values(
+            top_products = sales.values(
                 'product__product_id',
                 'product__product_name'
             ).annotate(
-                product_revenue=Sum(F('quantity_sold') * F('unit_price_at_sale')),
-                product_sales_volume=Sum('quantity_sold'),
-                product_transactions=Count('sales_record_id')
+                product_revenue=measures['revenue'],
+                product_sales_volume=measures['sales_volume'],
+                product_transactions=measures['transactions']
             ).order_by('-product_revenue')[:10]
             
             summary_data['top_products'] = [
@@ -534,15 +668,12 @@ def dashboard_summary(request):
                 for item in top_products
             ]
             
-            category_breakdown = SalesRecords.objects.filter(
-                transaction_date__date__gte=start_date,
-                transaction_date__date__lte=end_date
-            ).values(
+            category_breakdown = sales.values(
                 'product__category__name'
             ).annotate(
-                category_revenue=Sum(F('quantity_sold') * F('unit_price_at_sale')),
-                category_sales_volume=Sum('quantity_sold'),
-                category_transactions=Count('sales_record_id')
+                category_revenue=measures['revenue'],
+                category_sales_volume=measures['sales_volume'],
+                category_transactions=measures['transactions']
             ).order_by('-category_revenue')
             
             summary_data['category_breakdown'] = {
@@ -600,6 +731,119 @@ class UserInfoView(APIView):
             "groups": [g.name for g in user.groups.all()],
         })
 
+class ForecastCacheStatsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(dict(forecast_cache.stats(), batching=forecast_batcher.stats()))
+
+class ForecastTimingStatsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(stage_histograms.stats())
+
+    def delete(self, request):
+        stage_histograms.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+def forecast_job_status(job):
+    """
+    Status fields of a forecast job, without its results
+    """
+    return {
+        'job_id': job.job_id,
+        'status': job.status,
+        'model': job.time_horizon,
+        'periods': job.periods,
+        'last_date': job.last_date.isoformat() if job.last_date else None,
+        'product_count': len(job.product_ids),
+        'completed_products': job.completed_products,
+        'source': job.source or None,
+        'error': job.error or None,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at,
+        'expires_at': job.expires_at,
+    }
+
+class ForecastJobsView(APIView):
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        # Forecasts run in the background; the client polls the job's URL for
+        # progress and, once done, the paginated results. Identical requests
+        # within FORECAST_JOB_TTL get the existing job back (200 instead of 202).
+        params, error = forecast_params(request.data)
+        if error:
+            return error
+        time_horizon, periods, last_date = params
+        if last_date:
+            try:
+                last_date = date.fromisoformat(str(last_date))
+            except ValueError:
+                return Response(
+                    {"error": "last_date must be a date in YYYY-MM-DD format"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        # Products: an explicit list, or the products list filters
+        if 'product_ids' in request.data:
+            product_ids = [str(product_id) for product_id in request.data['product_ids'] or []]
+            product_ids = list(Products.objects.filter(product_id__in=product_ids).values_list('product_id', flat=True))
+        else:
+            filterset = ProductFilter(request.data, queryset=Products.objects.all())
+            if not filterset.is_valid():
+                return Response({"error": filterset.errors}, status=status.HTTP_400_BAD_REQUEST)
+            product_ids = list(filterset.qs.values_list('product_id', flat=True))
+        
+        if not product_ids:
+            return Response(
+                {"error": "No products found to forecast"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        job, created = forecast_jobs.submit(sorted(product_ids), time_horizon, periods, last_date)
+        return Response(
+            forecast_job_status(job),
+            status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK,
+            headers={'Location': f'/api/forecast-jobs/{job.job_id}/'}
+        )
+
+class ForecastJobDetailView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request, job_id):
+        job = ForecastJob.objects.filter(job_id=job_id, expires_at__gt=timezone.now()).first()
+        if job is None:
+            return Response({"error": "Forecast job not found or expired"}, status=status.HTTP_404_NOT_FOUND)
+        
+        data = forecast_job_status(job)
+        if job.status == 'done':
+            paginator = StandardResultsSetPagination()
+            page = paginator.paginate_queryset(job.results, request, view=self)
+            data['results'] = paginator.get_paginated_response(page).data
+        return Response(data)
+
+class ModelReloadView(APIView):
+    permission_classes = [IsAuthenticated, IsOwner]
+
+    def get(self, request):
+        return Response(model_registry.status())
+
+    def post(self, request):
+        # Loads the new models next to the current ones and swaps them in; requests
+        # already running keep the model they started with. Other server processes
+        # pick up changed model files within ML_MODELS_RELOAD_INTERVAL.
+        horizons = request.data.get('horizons') or list(model_registry)
+        unknown = [horizon for horizon in horizons if horizon not in model_registry]
+        if unknown:
+            return Response(
+                {"error": f"Unknown model(s): {', '.join(map(str, unknown))}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        model_registry.reload(horizons)
+        return Response(model_registry.status())
+
 class EmployeeListView(APIView):
     permission_classes = [IsAuthenticated, IsOwner]
 
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.ServerTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -150,6 +152,73 @@ REST_FRAMEWORK = {
 }
 
 
+# Forecast result cache (api.ml_models.forecast_cache). Entries are invalidated
+# per product when its sales, stock or price change; use a shared cache backend
+# (Redis/Memcached) when running several server processes.
+FORECAST_CACHE_ENABLED = True
+FORECAST_CACHE_TIMEOUT = 60 * 60
+
+# Forecasts precomputed by `manage.py precompute_forecasts` are served while
+# younger than this many seconds; older or missing ones fall back to live inference.
+FORECAST_SNAPSHOT_MAX_AGE = 6 * 60 * 60
+
+# Forecast models are loaded on first use (api.ml_models.registry). Set to True to
+# load them when the WSGI application starts, so the first forecast request is fast.
+ML_MODELS_PRELOAD = False
+
+# Every server process checks the model files at most this often (seconds) and
+# swaps in retrained models without a restart; None disables the check.
+ML_MODELS_RELOAD_INTERVAL = 60
+
+# Forecasts run in a pool of inference worker processes started with
+# `manage.py run_inference_workers` when this is set to a Unix socket path or a
+# (host, port) pair ("host:port" in the environment variable); None runs them inside the web process. Requests wait at most
+# ML_INFERENCE_TIMEOUT seconds, and while the pool is unreachable they run
+# in-process if ML_INFERENCE_FALLBACK is set. The forecast cache stays in the
+# web process; the workers only compute the products it misses.
+ML_INFERENCE_ADDRESS = os.environ.get('ML_INFERENCE_ADDRESS') or None
+ML_INFERENCE_WORKERS = None
+ML_INFERENCE_TIMEOUT = 30
+ML_INFERENCE_FALLBACK = True
+
+# Concurrent forecast requests for the same horizon arriving within this many
+# seconds share one feature build and model call (None or 0 disables batching).
+# Only requests arriving while another is in flight wait; a lone request runs
+# at once. A batch is closed early once it holds FORECAST_BATCH_MAX_SIZE products.
+FORECAST_BATCH_WINDOW = 0.005
+FORECAST_BATCH_MAX_SIZE = 256
+
+# Engine that evaluates the boosted trees: "xgboost" (native predict), "numpy"
+# (api.ml_models.tree_engine) or "auto", which uses the NumPy engine for batches
+# of at most ML_TREE_ENGINE_MAX_ROWS rows, where XGBoost's per-call overhead
+# dominates. `manage.py benchmark_tree_engine` shows the crossover on this machine.
+ML_TREE_ENGINE = 'auto'
+ML_TREE_ENGINE_MAX_ROWS = 128
+
+# Forecast history, training data and the dashboard read sales from the
+# DailyProductSales table (one row per product and day, kept up to date on every
+# sale and rebuilt with `manage.py backfill_daily_sales`). Set to "transactions"
+# to aggregate the raw SalesRecords instead.
+SALES_HISTORY_SOURCE = 'daily'
+
+# Forecast requests report per-stage durations in a Server-Timing header; the
+# last FORECAST_TIMING_WINDOW durations of each stage feed the percentiles at
+# /api/forecast-timing/stats/.
+FORECAST_TIMING_WINDOW = 1000
+
+# GET /api/products/forecast-stream/ forecasts and sends the catalog this many
+# products at a time, as newline-delimited JSON.
+FORECAST_STREAM_BATCH_SIZE = 200
+
+# POST /api/forecast-jobs/ runs forecasts on FORECAST_JOB_WORKERS background
+# threads of the server process (0 runs them inside the request),
+# FORECAST_JOB_BATCH_SIZE products at a time. Finished jobs and their results
+# are kept, and reused by identical requests, for FORECAST_JOB_TTL seconds.
+FORECAST_JOB_WORKERS = 2
+FORECAST_JOB_BATCH_SIZE = 500
+FORECAST_JOB_TTL = 60 * 60
+
+
 CORS_ALLOW_ALL_ORIGINS = True
 
 CORS_ALLOWED_ORIGINS = [
@@ -199,6 +268,13 @@ CSRF_TRUSTED_ORIGINS = [
 
 CORS_PREFLIGHT_MAX_AGE = 86400
 
+# Response headers the frontend may read
+CORS_EXPOSE_HEADERS = [
+    'X-Forecast-Source',
+    'X-Model-Version',
+    'Server-Timing',
+]
+
 CSRF_COOKIE_SECURE = False
 CSRF_COOKIE_HTTPONLY = False
 CSRF_COOKIE_SAMESITE = 'Lax'